@@ -0,0 +1,187 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from models import FbrefPlayerStats, PlayerSeason, Session
+
+# Covariate table for the current stats index, rebuilt together with it
+_covariates = None
+
+
+class CovariateTable:
+    """
+    Covariates for every row of the stats index: PlayerSeason stats, age and the fbref
+    playing time / shooting stats of the same player and season year (NaN when missing).
+    """
+
+    def __init__(self, index, matrix, columns):
+        self.index = index
+        self.matrix = matrix
+        self.columns = columns
+
+    @classmethod
+    def build(cls, index):
+        ages = index.attributes['age'].astype(np.float64)
+        ages[ages < 0] = np.nan
+
+        # One averaged fbref vector per (player id, season), from the cached parsed stats
+        seasons, seen = {}, set()
+        for stats in Session.query(FbrefPlayerStats).order_by(FbrefPlayerStats.id):
+            parsed = stats.parsed()
+            for table, prefix in (('shooting_stats', 'shooting'), ('playing_time_stats', 'playing_time')):
+                matrix, columns = parsed.matrices[table]
+                for season, positions in parsed.positions[table].items():
+                    # Only the first FbrefPlayerStats row of a player counts
+                    if (stats.player_id, season, prefix) in seen:
+                        continue
+                    seen.add((stats.player_id, season, prefix))
+                    cells = seasons.setdefault((stats.player_id, season), {})
+                    present = ~np.isnan(matrix[positions])
+                    totals = np.where(present, matrix[positions], 0.0).sum(axis=0)
+                    counts = present.sum(axis=0)
+                    means = np.divide(totals, counts, out=np.full(len(columns), np.nan), where=counts > 0)
+                    cells.update(
+                        (f"{prefix}.{column}", mean) for column, mean in zip(columns, means)
+                    )
+
+        keys = list(seasons)
+        fbref_columns = sorted({column for cells in seasons.values() for column in cells})
+        column_positions = {column: position for position, column in enumerate(fbref_columns)}
+        vectors = np.full((len(keys) + 1, len(fbref_columns)), np.nan)  # last row: no fbref stats
+        for row, key in enumerate(keys):
+            for column, mean in seasons[key].items():
+                vectors[row, column_positions[column]] = mean
+
+        key_positions = {key: row for row, key in enumerate(keys)}
+        rows = [
+            key_positions.get((player_id, str(year)), len(keys))
+            for player_id, year in zip(index.player_ids.tolist(), index.attributes['year'].tolist())
+        ]
+        fbref = vectors[rows]
+
+        # Keep fbref columns with a value somewhere in the pool
+        numeric = ~np.isnan(fbref).all(axis=0)
+        matrix = np.column_stack([index.matrix, ages, fbref[:, numeric]])
+        columns = list(index.columns) + ['age'] + [key for key, keep in zip(fbref_columns, numeric) if keep]
+        return cls(index, matrix, columns)
+
+    @classmethod
+    def current(cls):
+        """Covariates for the current DB state, cached alongside the stats index."""
+        global _covariates
+        index = PlayerSeason.stats_index()
+        if _covariates is None or _covariates.index is not index:
+            _covariates = cls.build(index)
+        return _covariates
+
+    def matched_sets(self, matches):
+        """
+        Treated and control row positions plus weights for a {target id: [(control id, distance), ...]} mapping.
+
+        Controls of a target matched 1:k each get weight 1/k; targets without controls are dropped.
+        """
+        matched = [(target_id, pairs) for target_id, pairs in matches.items() if pairs]
+        treated = self.index.positions([target_id for target_id, _ in matched])
+        control = self.index.positions([control_id for _, pairs in matched for control_id, _ in pairs])
+        control_weights = np.concatenate([np.full(len(pairs), 1.0 / len(pairs)) for _, pairs in matched]) \
+            if matched else np.zeros(0)
+        return treated, control, np.ones(len(treated)), control_weights
+
+
+def _weighted_moments(values, weights):
+    """Column-wise weighted mean and variance, skipping NaNs."""
+    weights = np.where(np.isnan(values), 0.0, weights[:, None])
+    values = np.nan_to_num(values)
+    totals = weights.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (weights * values).sum(axis=0) / totals
+        variances = (weights * (values - means) ** 2).sum(axis=0) / totals
+    return means, variances, totals
+
+
+def _ecdf_distances(treated, control, treated_weights, control_weights):
+    """Mean and max distance between the two groups' eCDFs, for every column at once."""
+    values = np.vstack([treated, control])
+    missing = np.isnan(values)
+    weights_t = np.where(missing, 0.0, np.concatenate([treated_weights, np.zeros(len(control))])[:, None])
+    weights_c = np.where(missing, 0.0, np.concatenate([np.zeros(len(treated)), control_weights])[:, None])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weights_t /= weights_t.sum(axis=0)
+        weights_c /= weights_c.sum(axis=0)
+
+    # Sort every column (NaNs last) and walk both cumulative distributions together
+    order = np.argsort(values, axis=0, kind='stable')
+    values = np.take_along_axis(values, order, axis=0)
+    gaps = np.abs(
+        np.cumsum(np.take_along_axis(weights_t, order, axis=0), axis=0)
+        - np.cumsum(np.take_along_axis(weights_c, order, axis=0), axis=0)
+    )
+
+    # Only evaluate the eCDFs at the last occurrence of each distinct value
+    distinct = np.ones(values.shape, dtype=bool)
+    distinct[:-1] = values[:-1] != values[1:]
+    distinct &= ~np.isnan(values)
+
+    counts = distinct.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ecdf_mean = np.where(distinct, gaps, 0.0).sum(axis=0) / counts
+    ecdf_max = np.where(distinct, gaps, -np.inf).max(axis=0, initial=-np.inf)
+    ecdf_max[counts == 0] = np.nan
+    return ecdf_mean, ecdf_max
+
+
+def balance_statistics(treated, control, columns, treated_weights=None, control_weights=None):
+    """
+    Balance diagnostics for every covariate in one array pass.
+
+    :param treated: (n_treated, n_covariates) covariate matrix of the injured seasons.
+    :param control: (n_control, n_covariates) covariate matrix of the matched control seasons.
+    :return: DataFrame indexed by covariate with means, standardized mean difference,
+        variance ratio and mean / max eCDF distance.
+    """
+    treated_weights = np.ones(len(treated)) if treated_weights is None else np.asarray(treated_weights, float)
+    control_weights = np.ones(len(control)) if control_weights is None else np.asarray(control_weights, float)
+
+    mean_t, var_t, n_t = _weighted_moments(treated, treated_weights)
+    mean_c, var_c, n_c = _weighted_moments(control, control_weights)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        smd = (mean_t - mean_c) / np.sqrt((var_t + var_c) / 2)
+        variance_ratio = var_t / var_c
+    ecdf_mean, ecdf_max = _ecdf_distances(treated, control, treated_weights, control_weights)
+
+    return pd.DataFrame({
+        'mean_treated': mean_t,
+        'mean_control': mean_c,
+        'smd': smd,
+        'variance_ratio': variance_ratio,
+        'ecdf_mean': ecdf_mean,
+        'ecdf_max': ecdf_max,
+        'weight_treated': n_t,
+        'weight_control': n_c,
+    }, index=pd.Index(columns, name='covariate'))
+
+
+def balance_table(matches, covariates=None):
+    """Balance diagnostics for the matched pairs produced by a matcher."""
+    covariates = covariates or CovariateTable.current()
+    treated, control, treated_weights, control_weights = covariates.matched_sets(matches)
+    return balance_statistics(
+        covariates.matrix[treated], covariates.matrix[control], covariates.columns,
+        treated_weights=treated_weights, control_weights=control_weights,
+    )
+
+
+def balance_sweep(target_seasons, matchers):
+    """
+    Run every matcher on the same targets and stack their balance tables.
+
+    Covariates are built once, so each extra matcher only costs its own matching plus one array pass.
+    """
+    covariates = CovariateTable.current()
+    tables = []
+    for matcher in matchers:
+        table = balance_table(matcher.match(target_seasons), covariates=covariates)
+        table.insert(0, 'matcher', json.dumps(matcher.config(), sort_keys=True))
+        tables.append(table.reset_index())
+    return pd.concat(tables, ignore_index=True)
@@ -0,0 +1,90 @@
+import numpy as np
+
+
+def position_group(pos):
+    """Primary position of a fbref position string, e.g. 'FWMF' -> 'FW'."""
+    return pos[:2] if pos else ''
+
+
+class CandidateBlocks:
+    """
+    Partition of the stats index rows into blocks.
+
+    ``codes`` holds the block code of every index row; ``members(code)`` is an O(1) lookup
+    of the row positions in that block.
+    """
+
+    def __init__(self, codes, labels):
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.labels = labels
+
+        # Group row positions by code once, so candidate generation never scans the pool
+        order = np.argsort(self.codes, kind='stable')
+        boundaries = np.flatnonzero(np.diff(self.codes[order])) + 1
+        self._members = np.split(order, boundaries) if len(order) else []
+
+    def __len__(self):
+        return len(self.labels)
+
+    def members(self, code):
+        return self._members[code]
+
+    def label(self, code):
+        return self.labels[code]
+
+
+class BlockingScheme:
+    """
+    Configurable blocking keys for control matching.
+
+    Supported keys: 'year' (season year), 'position' (position group), 'age_band'
+    (age bucketed by ``age_band_width`` years) and 'comp' (Season.comp).
+    """
+
+    KEYS = ('year', 'position', 'age_band', 'comp')
+
+    def __init__(self, keys=('year', 'position'), age_band_width=3):
+        unknown = [key for key in keys if key not in self.KEYS]
+        if unknown:
+            raise ValueError(f"Unknown blocking keys {unknown}. Expected any of {self.KEYS}.")
+        self.keys = tuple(keys)
+        self.age_band_width = age_band_width
+
+    @property
+    def key(self):
+        """Hashable identity of the scheme, used to cache its blocks on the index."""
+        return self.keys, self.age_band_width
+
+    def __repr__(self):
+        return f"BlockingScheme(keys={self.keys}, age_band_width={self.age_band_width})"
+
+    def key_values(self, index, key):
+        attributes = index.attributes
+        if key == 'year':
+            return attributes['year']
+        if key == 'comp':
+            return attributes['comp']
+        if key == 'position':
+            return np.array([position_group(pos) for pos in attributes['pos']], dtype=object)
+        # age_band; unknown ages (-1) get a band of their own
+        ages = attributes['age']
+        return np.where(ages >= 0, ages // self.age_band_width * self.age_band_width, -1)
+
+    def partition(self, index):
+        """Compute the block code of every row in the index."""
+        if not self.keys or not len(index):
+            return CandidateBlocks(np.zeros(len(index), dtype=np.int64), [()])
+
+        uniques, inverses = [], []
+        for key in self.keys:
+            values, inverse = np.unique(self.key_values(index, key), return_inverse=True)
+            uniques.append(values.tolist())
+            inverses.append(inverse)
+
+        # Rows sharing every key value share a block
+        combos, codes = np.unique(np.column_stack(inverses), axis=0, return_inverse=True)
+        labels = [
+            tuple(values[code] for values, code in zip(uniques, combo))
+            for combo in combos
+        ]
+        return CandidateBlocks(codes.ravel(), labels)
@@ -0,0 +1,171 @@
+"""
+Declarative cohort definitions, compiled to a single SQL query over players, injuries and seasons.
+
+A spec is a dict (or a YAML / JSON file) with up to four sections:
+
+    players:            # conditions on the Player row
+      nation: {in: [USA, CAN]}
+    injuries:           # the player has an injury meeting all of these (true: any injury, false: none)
+      mechanism: 0
+      injury_surface: {in: [Turf, turf]}
+    seasons:            # the player has a season meeting all of these (PlayerSeason or Season columns)
+      year: {gte: 2016}
+      pos: {like: 'FW%'}
+    exclude:            # a nested spec; players matching it are left out
+      injuries: {activity_type: 3}
+
+A plain value means equality, a list means ``in`` and null means IS NULL; otherwise use one of
+the OPERATORS, e.g. ``{gte: 2016, lte: 2019}``.
+"""
+import json
+
+from sqlalchemy import and_, exists, not_, select, true
+
+from models import Player, PlayerInjury, PlayerSeason, Season, Session
+
+OPERATORS = {
+    'eq': lambda column, value: column.is_(None) if value is None else column == value,
+    'ne': lambda column, value: column.isnot(None) if value is None else column != value,
+    'in': lambda column, value: column.in_(list(value)),
+    'not_in': lambda column, value: column.notin_(list(value)),
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+    'between': lambda column, value: column.between(*value),
+    'like': lambda column, value: column.like(value),
+    'not_like': lambda column, value: column.notlike(value),
+    'is_null': lambda column, value: column.is_(None) if value else column.isnot(None),
+}
+
+SECTIONS = ('players', 'injuries', 'seasons', 'exclude')
+
+# Compiled id lists, newest data versions only: {spec key: (data versions, [player id, ...])}
+_cohort_ids = {}
+
+
+def _column(models, name):
+    for model in models:
+        if name in model.__table__.columns:
+            return getattr(model, name)
+    known = sorted({column for model in models for column in model.__table__.columns.keys()})
+    raise ValueError(f"Unknown cohort field '{name}'. Expected one of {known}.")
+
+
+def _conditions(models, filters):
+    """SQL conditions for a {field: value or {operator: value}} mapping."""
+    conditions = []
+    for name, condition in filters.items():
+        column = _column(models, name)
+        if not isinstance(condition, dict):
+            condition = {'in': condition} if isinstance(condition, (list, tuple)) else {'eq': condition}
+        for operator, value in condition.items():
+            if operator not in OPERATORS:
+                raise ValueError(f"Unknown operator '{operator}' for '{name}'. Expected one of {sorted(OPERATORS)}.")
+            conditions.append(OPERATORS[operator](column, value))
+    return conditions
+
+
+def _related(filters, subquery, models):
+    """EXISTS / NOT EXISTS over a related table; ``filters`` is True, False or a dict of conditions."""
+    if filters is False:
+        return not_(exists(subquery))
+    if filters is True or not filters:
+        return exists(subquery)
+    return exists(subquery.where(and_(*_conditions(models, filters))))
+
+
+class Cohort:
+    """A set of players defined by a spec (see the module docstring)."""
+
+    def __init__(self, spec=None, name=None):
+        spec = dict(spec or {})
+        self.name = name or spec.pop('name', None)
+        unknown = set(spec) - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown cohort sections {sorted(unknown)}. Expected {list(SECTIONS)}.")
+        self.spec = spec
+        self.criterion()  # fail on bad fields / operators now rather than at load time
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a spec from a .yaml / .yml (needs PyYAML) or .json file."""
+        with open(path) as file:
+            if path.endswith(('.yaml', '.yml')):
+                try:
+                    import yaml
+                except ImportError as e:
+                    raise ImportError("Reading YAML cohort specs needs PyYAML (pip install pyyaml).") from e
+                return cls(yaml.safe_load(file))
+            return cls(json.load(file))
+
+    def refine(self, name=None, **sections):
+        """
+        A sub-cohort with extra conditions merged into each section, e.g.
+        cohort.refine(injuries={'mechanism': 0}) for the non-contact injuries of a cohort.
+        """
+        spec = {key: dict(value) if isinstance(value, dict) else value for key, value in self.spec.items()}
+        for section, filters in sections.items():
+            if isinstance(filters, dict) and isinstance(spec.get(section), dict):
+                spec[section].update(filters)
+            else:
+                spec[section] = filters
+        return Cohort(spec, name=name)
+
+    def key(self):
+        return json.dumps(self.spec, sort_keys=True, default=str)
+
+    def criterion(self, spec=None):
+        """The spec as one boolean SQL expression on Player."""
+        spec = self.spec if spec is None else spec
+        conditions = _conditions([Player], spec.get('players') or {})
+
+        if 'injuries' in spec:
+            subquery = select(PlayerInjury.id).where(PlayerInjury.player_id == Player.id)
+            conditions.append(_related(spec['injuries'], subquery, [PlayerInjury]))
+
+        if 'seasons' in spec:
+            subquery = (
+                select(PlayerSeason.id)
+                .join(Season, PlayerSeason.season_id == Season.id)
+                .where(PlayerSeason.player_id == Player.id)
+            )
+            conditions.append(_related(spec['seasons'], subquery, [PlayerSeason, Season]))
+
+        if spec.get('exclude'):
+            conditions.append(not_(self.criterion(spec['exclude'])))
+
+        return and_(*conditions) if conditions else true()
+
+    def _tables(self, spec=None):
+        spec = self.spec if spec is None else spec
+        models = [Player]
+        if 'injuries' in spec:
+            models.append(PlayerInjury)
+        if 'seasons' in spec:
+            models += [PlayerSeason, Season]
+        for model in self._tables(spec['exclude']) if spec.get('exclude') else []:
+            if model not in models:
+                models.append(model)
+        return models
+
+    def ids(self):
+        """Player ids in the cohort, sorted; cached until a table the spec reads changes."""
+        key = self.key()
+        versions = tuple(model.current_data_version() for model in self._tables())
+        cached = _cohort_ids.get(key)
+        if cached is None or cached[0] != versions:
+            query = Session.query(Player.id).filter(self.criterion()).order_by(Player.id)
+            cached = _cohort_ids[key] = (versions, [player_id for player_id, in query])
+        return cached[1]
+
+    def load(self):
+        """The cohort's players with their injuries, seasons and fbref stats eagerly loaded."""
+        return Player.load_cohort(player_ids=self.ids())
+
+    def __len__(self):
+        return len(self.ids())
+
+
+# Every player with at least one recorded injury
+INJURED = Cohort({'injuries': True}, name='injured')
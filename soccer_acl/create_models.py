@@ -1,28 +1,23 @@
 import pdb  # Standard import at the top
-from models import Player, Session, Season, PlayerSeason, PlayerInjury  # Import all required classes
-from helpers import flexible_name_search
-
-# Create a new session
-session = Session()
-Player.where(name='Megan Rapinoe')[0].seasons[0].find_control_matches()
-
-
-
-# Commit the session to save the data
+from models import Player, Session, Season, PlayerSeason, PlayerInjury, unit_of_work  # Import all required classes
+from name_resolver import NameResolver
 
 def add_link(control_players):
+    # Resolve every name in one pass, then write all the links in one transaction
+    resolution = NameResolver.from_db().resolve_all(player_name for player_name, _ in control_players)
+    resolution.report()
+
+    updates = {}
     for player_name, fbref_link in control_players:
-        try:
-            found_control_player = flexible_name_search(session, Player, player_name)
-            print(found_control_player.name, fbref_link)
-            Player.update(found_control_player.id, fbref_link=fbref_link)
-        except Exception as e:
-            print(e)
+        player_id = resolution.matches.get(player_name)
+        if player_id is not None:
+            print(player_name, fbref_link)
+            updates[player_id] = {'id': player_id, 'fbref_link': fbref_link}
 
+    with unit_of_work():
+        Player.bulk_update_by_id(updates.values())
 
-        
 
-# Close the session
 control_players = [
     ["Savannah Demelo","https://fbref.com/en/players/add26dda/Savannah-Demelo#all_stats_standard"],
     ["Jodie Taylor","https://fbref.com/en/players/dc02c40a/Jodie-Taylor#all_stats_standard"],
@@ -63,16 +58,18 @@ control_players = [
     ["Sarah Clark","https://fbref.com/en/players/0074594d/Sarah-Clark#all_stats_standard"],
 ]
 
-add_link(control_players)
-
-session.commit()
 
-# Query the database
-# players = session.query(Player).all()
-# for player in players:
-#     print(player.name, player.nation)
+if __name__ == '__main__':
+    session = Session()
+    Player.where(name='Megan Rapinoe')[0].seasons[0].find_control_matches()
 
+    add_link(control_players)
 
+    session.commit()
 
+    # Query the database
+    # players = session.query(Player).all()
+    # for player in players:
+    #     print(player.name, player.nation)
 
-session.close()
+    session.close()
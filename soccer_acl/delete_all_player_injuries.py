@@ -12,4 +12,5 @@ def delete_all_player_injuries():
         Session.close()
 
 
-delete_all_player_injuries()
\ No newline at end of file
+if __name__ == '__main__':
+    delete_all_player_injuries()
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Injured vs. control difference-in-differences for every stat and every mode in one call.
+
+The four groups are passed as aligned arrays (one column per stat, in GROUPS order). Each
+mode compares post minus pre changes:
+
+    diff_in_diff    injured change - control change
+    injured         injured change only
+    control         control change only
+
+Every mode is normalized by the combined standard error of all four groups and tested
+against a t distribution with (total sample size - 4) degrees of freedom.
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats as scipy_stats
+
+GROUPS = ('injured_pre', 'injured_post', 'control_pre', 'control_post')
+
+# Mode name: the alt_diff value the plots use for it
+MODES = {'diff_in_diff': None, 'injured': 'injured', 'control': 'control'}
+
+
+def align(injured_pre, injured_post, control_pre, control_post):
+    """
+    (stats, means, stds, sizes) arrays from four aggregates with ``aggregated_stats``,
+    ``std_dev_stats`` and ``sample_size``, over the stats present in all four.
+    Missing standard deviations become NaN.
+    """
+    groups = (injured_pre, injured_post, control_pre, control_post)
+    stats = [
+        stat for stat in injured_pre.aggregated_stats
+        if all(stat in group.aggregated_stats for group in groups[1:])
+    ]
+    means = np.array([[group.aggregated_stats[stat] for stat in stats] for group in groups], dtype=np.float64)
+    stds = np.array(
+        [[np.nan if group.std_dev_stats.get(stat) is None else group.std_dev_stats[stat] for stat in stats]
+         for group in groups],
+        dtype=np.float64,
+    )
+    sizes = np.array([group.sample_size for group in groups], dtype=np.float64)
+    return stats, means, stds, sizes
+
+
+def diff_in_diff(stats, means, stds, sizes):
+    """
+    :param stats: stat names, one per column.
+    :param means: (4, n_stats) group means, rows in GROUPS order.
+    :param stds: (4, n_stats) group standard deviations.
+    :param sizes: (4,) group sample sizes.
+    :return: tidy DataFrame with one row per (mode, stat): raw and normalized difference,
+        standard error, t statistic, p-value and degrees of freedom. Where the standard error
+        is zero or unknown the normalized difference, t and p are NaN.
+    """
+    means = np.asarray(means, dtype=np.float64)
+    stds = np.asarray(stds, dtype=np.float64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+
+    injured_change = means[1] - means[0]
+    control_change = means[3] - means[2]
+    raw = np.stack([injured_change - control_change, injured_change, control_change])  # MODES order
+
+    # Same standard error for every mode
+    se = np.sqrt((stds ** 2 / sizes[:, None]).sum(axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized = np.where(se > 0, raw / se, np.nan)
+    df = sizes.sum() - 4
+    p_values = 2 * scipy_stats.t.sf(np.abs(normalized), df)
+
+    n_modes, n_stats = raw.shape
+    return pd.DataFrame({
+        'mode': np.repeat(list(MODES), n_stats),
+        'stat': np.tile(np.asarray(stats, dtype=object), n_modes),
+        'raw': raw.ravel(),
+        'normalized': normalized.ravel(),
+        'se': np.tile(se, n_modes),
+        't_stat': normalized.ravel(),
+        'p_value': p_values.ravel(),
+        'df': df,
+    })
@@ -0,0 +1,166 @@
+"""
+Event-time panel of matched injured / control pairs, season by season.
+
+For every pair, each member's fbref seasons are placed relative to their anchor season (the
+injured player's last pre-injury season and the matched control season) and stacked into one
+(pairs, member, relative season, stat) array. Paired tests, event-study coefficients and
+trajectories are reductions over that array.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import stats as scipy_stats
+from models import FbrefSeasonStat, Session
+from models.fbref_season_stat import TABLE_STATS
+
+MEMBERS = ('injured', 'control')
+
+# Every fbref stat column, in a fixed order
+FBREF_STATS = list(dict.fromkeys(stat for stats in TABLE_STATS.values() for stat in stats))
+
+
+def _nanmean(values, axis):
+    """np.nanmean without the warning for all-NaN slices (they stay NaN)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(values, axis=axis)
+
+
+def _paired_t(differences):
+    """One-sample t test of (pairs, stats) differences against 0, ignoring NaN: (mean, se, t, p, n)."""
+    present = ~np.isnan(differences)
+    n = present.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(present, differences, 0.0).sum(axis=0) / n
+        variance = np.where(present, (differences - mean) ** 2, 0.0).sum(axis=0) / (n - 1)
+        se = np.sqrt(variance / n)
+        t_stat = np.where(se > 0, mean / se, np.nan)
+        p_value = 2 * scipy_stats.t.sf(np.abs(t_stat), n - 1)
+    mean, se = np.where(n > 0, mean, np.nan), np.where(n > 1, se, np.nan)
+    return mean, se, t_stat, np.where(n > 1, p_value, np.nan), n
+
+
+class EventPanel:
+    """
+    ``values[pair, member, offset, stat]`` is the member's average of ``stat`` in season
+    ``anchor + relative[offset]`` (NaN when missing); ``mask[pair, member, offset]`` is True
+    where the member has any fbref row for that season. Members are in MEMBERS order.
+    """
+
+    def __init__(self, pairs, anchors, relative, stats, values, mask):
+        self.pairs = pairs
+        self.anchors = anchors
+        self.relative = relative
+        self.stats = stats
+        self.values = values
+        self.mask = mask
+
+    @classmethod
+    def build(cls, pairs, window=3, stats=None):
+        """
+        Build the panel with one query over FbrefSeasonStat.
+
+        :param pairs: [(injured player id, injured anchor year, control player id, control anchor year), ...]
+        :param window: seasons kept on each side of the anchor (relative seasons -window..+window).
+        :param stats: FbrefSeasonStat columns to include (default: every playing time and shooting stat).
+        """
+        stats = list(stats or FBREF_STATS)
+        relative = np.arange(-window, window + 1)
+        player_ids = np.array([[pair[0], pair[2]] for pair in pairs], dtype=np.int64).reshape(len(pairs), 2)
+        anchors = np.array([[pair[1], pair[3]] for pair in pairs], dtype=np.int64).reshape(len(pairs), 2)
+
+        # Only each player's first FbrefPlayerStats record counts, as everywhere else
+        rows = (
+            Session.query(FbrefSeasonStat.player_id, FbrefSeasonStat.year, *[getattr(FbrefSeasonStat, stat) for stat in stats])
+            .filter(
+                FbrefSeasonStat.player_id.in_(np.unique(player_ids).tolist()),
+                FbrefSeasonStat.fbref_player_stats_id.in_(FbrefSeasonStat.first_records()),
+                FbrefSeasonStat.year.isnot(None),
+            )
+            .order_by(FbrefSeasonStat.player_id, FbrefSeasonStat.year)
+            .all()
+        )
+        if pairs and not rows:
+            raise ValueError(
+                "fbref_season_stats has no rows for these players; "
+                "run migrations.py (migration 9 back-fills it from fbref_player_stats)."
+            )
+        row_players = np.array([row[0] for row in rows], dtype=np.int64)
+        row_years = np.array([row[1] for row in rows], dtype=np.int64)
+        row_values = np.array(
+            [[np.nan if value is None else value for value in row[2:]] for row in rows], dtype=np.float64
+        ).reshape(len(rows), len(stats))
+
+        # Rows are sorted by player: each (pair, member) takes the slice of its player's rows
+        members = player_ids.ravel()
+        starts = np.searchsorted(row_players, members, side='left')
+        counts = np.searchsorted(row_players, members, side='right') - starts
+        cells = np.repeat(np.arange(len(members)), counts)
+        positions = np.repeat(starts - np.cumsum(np.r_[0, counts[:-1]]), counts) + np.arange(counts.sum())
+        offsets = row_years[positions] - anchors.ravel()[cells] + window
+        keep = (offsets >= 0) & (offsets < len(relative))
+        cells, positions, offsets = cells[keep], positions[keep], offsets[keep]
+
+        # Average the rows landing in each (pair, member, season) cell, e.g. one per team and table
+        flat = cells * len(relative) + offsets
+        size = len(members) * len(relative)
+        present = ~np.isnan(row_values[positions])
+        sums = np.zeros((size, len(stats)))
+        totals = np.zeros((size, len(stats)))
+        np.add.at(sums, flat, np.where(present, row_values[positions], 0.0))
+        np.add.at(totals, flat, present)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = np.where(totals > 0, sums / totals, np.nan)
+        mask = np.bincount(flat, minlength=size) > 0
+
+        shape = (len(pairs), len(MEMBERS), len(relative))
+        return cls(list(pairs), anchors, relative, stats, values.reshape(*shape, len(stats)), mask.reshape(shape))
+
+    def _offsets(self, seasons):
+        return np.flatnonzero(np.isin(self.relative, list(seasons)))
+
+    def window_means(self, seasons):
+        """(pairs, member, stat) average over the given relative seasons, NaN where none are observed."""
+        return _nanmean(self.values[:, :, self._offsets(seasons)], axis=2)
+
+    def paired_test(self, pre=None, post=None):
+        """
+        Paired t test per stat of the injured player's post - pre change against their matched
+        control's (by default pre is every season before the anchor, post every season after it).
+        """
+        pre = self.relative[self.relative < 0] if pre is None else pre
+        post = self.relative[self.relative > 0] if post is None else post
+        changes = self.window_means(post) - self.window_means(pre)
+        mean, se, t_stat, p_value, n = _paired_t(changes[:, 0] - changes[:, 1])
+        return pd.DataFrame({
+            'stat': self.stats,
+            'injured_change': _nanmean(changes[:, 0], axis=0),
+            'control_change': _nanmean(changes[:, 1], axis=0),
+            'diff_in_diff': mean, 'se': se, 't_stat': t_stat, 'p_value': p_value, 'pairs': n,
+        })
+
+    def event_study(self, reference=0):
+        """
+        Coefficient of every relative season: the mean over pairs of the injured - control gap in
+        that season minus the gap in the ``reference`` season (the anchor by default), with paired
+        standard errors. One row per (relative season, stat).
+        """
+        gaps = self.values[:, 0] - self.values[:, 1]  # (pairs, relative, stat)
+        effects = gaps - gaps[:, self._offsets([reference])]
+        mean, se, t_stat, p_value, n = _paired_t(effects.reshape(len(effects), len(self.relative) * len(self.stats)))
+        return pd.DataFrame({
+            'relative_season': np.repeat(self.relative, len(self.stats)),
+            'stat': np.tile(np.asarray(self.stats, dtype=object), len(self.relative)),
+            'coefficient': mean, 'se': se, 't_stat': t_stat, 'p_value': p_value, 'pairs': n,
+        })
+
+    def trajectories(self):
+        """Mean, std and count of every stat per member and relative season, one row per combination."""
+        present = ~np.isnan(self.values)
+        count = present.sum(axis=0)  # (member, relative, stat)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(present, self.values, 0.0).sum(axis=0) / count
+            std = np.sqrt(np.where(present, (self.values - mean) ** 2, 0.0).sum(axis=0) / count)
+        index = pd.MultiIndex.from_product([MEMBERS, self.relative, self.stats], names=['member', 'relative_season', 'stat'])
+        return pd.DataFrame({'mean': mean.ravel(), 'std': std.ravel(), 'count': count.ravel()}, index=index).reset_index()
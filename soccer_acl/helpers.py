@@ -1,5 +1,5 @@
 import datetime
-import pandas as pd
+import numpy as np
 from sqlalchemy.orm.exc import NoResultFound
 
 def parse_date(date_str):
@@ -8,7 +8,49 @@ def parse_date(date_str):
     except ValueError:
         return None
 
+def parse_stat(value):
+    """
+    Parse an fbref stat cell ('1,936', '+0.88', '-7', '') into a float.
+    Returns None for blanks and non-numeric cells such as team names.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value.replace(',', ''))
+    except ValueError:
+        return None
+
+def stat_matrix(rows, columns=None):
+    """
+    Coerce a list of stat rows (dicts of fbref cells) into a float matrix, once.
+
+    Columns follow first appearance in ``rows`` unless given. Cells are parsed with
+    parse_stat; blanks, missing keys and non-numeric cells are NaN.
+    Returns (matrix, columns).
+    """
+    if columns is None:
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+    matrix = np.array(
+        [[parse_stat(row.get(column)) for column in columns] for row in rows],
+        dtype=np.float64,
+    ).reshape(len(rows), len(columns))
+    return matrix, columns
+
+def average_stats(matrix, columns, fill_value=0.0):
+    """
+    Column means of a stat matrix as a {column: mean} dict.
+    Missing cells count as ``fill_value`` (0 by default, as the per-season averages always have).
+    """
+    if not len(matrix):
+        return {}
+    means = np.where(np.isnan(matrix), fill_value, matrix).mean(axis=0)
+    return dict(zip(columns, means.tolist()))
+
 def aggregate_stats(seasons):
+    import pandas as pd
+
     # Convert seasons to a DataFrame
     data = [
         {
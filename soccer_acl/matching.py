@@ -0,0 +1,325 @@
+import json
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial.distance import cdist
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from models import ControlMatch, PlayerInjury, PlayerSeason, Session
+
+# Cost given to forbidden target/candidate pairs so the solver never picks them when it has a choice
+FORBIDDEN_COST = 1e12
+
+
+def assign_without_replacement(costs, forbidden, ratio=1):
+    """
+    Solve a 1:ratio assignment of targets (rows) to candidates (columns) minimising total cost.
+
+    Each candidate is used at most once across the whole cohort.
+    Returns a list, per target row, of (column, cost) pairs sorted by cost.
+    """
+    n_targets = costs.shape[0]
+    costs = np.where(forbidden, FORBIDDEN_COST, costs)
+
+    # 1:k matching is a 1:1 assignment with each target row repeated k times
+    expanded = np.repeat(costs, ratio, axis=0)
+    rows, cols = linear_sum_assignment(expanded)
+    targets = rows // ratio
+
+    # Drop forced assignments (pool smaller than cohort * ratio, or every candidate forbidden)
+    valid = ~forbidden[targets, cols]
+    targets, cols = targets[valid], cols[valid]
+    assigned_costs = costs[targets, cols]
+
+    assignments = [[] for _ in range(n_targets)]
+    for position in np.lexsort((assigned_costs, targets)):
+        assignments[targets[position]].append((int(cols[position]), float(assigned_costs[position])))
+    return assignments
+
+
+def nearest_by_score(target_scores, candidate_scores, ratio=1, caliper=None):
+    """
+    Greedy 1:ratio nearest-neighbour matching on a one-dimensional score, without replacement.
+
+    Candidates are sorted once and each target's neighbours are found by binary search, so the
+    whole cohort costs O(n log n). Pairs further apart than ``caliper`` are never matched.
+    Returns a list, per target, of (candidate position, distance) pairs sorted by distance.
+    """
+    order = np.argsort(candidate_scores, kind='stable')
+    sorted_scores = candidate_scores[order]
+    n_candidates = len(sorted_scores)
+
+    assignments = [[] for _ in range(len(target_scores))]
+    used = np.zeros(n_candidates, dtype=bool)
+    pending = np.arange(len(target_scores))
+    window = ratio
+
+    while len(pending) and n_candidates:
+        # The nearest neighbours of a score sit within `window` slots either side of its insertion point
+        inserts = np.searchsorted(sorted_scores, target_scores[pending])
+        slots = np.clip(inserts[:, None] + np.arange(-window, window)[None, :], 0, n_candidates - 1)
+        rows = np.repeat(pending, slots.shape[1])
+        slots = slots.ravel()
+        distances = np.abs(sorted_scores[slots] - target_scores[rows])
+
+        keep = ~used[slots]
+        if caliper is not None:
+            keep &= distances <= caliper
+        rows, slots, distances = rows[keep], slots[keep], distances[keep]
+
+        # Closest pairs across the whole cohort are served first
+        for position in np.argsort(distances, kind='stable'):
+            row, slot = rows[position], slots[position]
+            if used[slot] or len(assignments[row]) >= ratio:
+                continue
+            used[slot] = True
+            assignments[row].append((int(order[slot]), float(distances[position])))
+
+        if window >= n_candidates:
+            break
+        pending = np.array([row for row in pending if len(assignments[row]) < ratio], dtype=np.int64)
+        window *= 2
+
+    return [sorted(assigned, key=lambda pair: pair[1]) for assigned in assignments]
+
+
+def _target_positions(index, target_seasons):
+    target_ids = np.array([season.id for season in target_seasons], dtype=np.int64)
+    target_positions = index.positions(target_ids)
+    if (target_positions < 0).any():
+        missing = target_ids[target_positions < 0].tolist()
+        raise ValueError(f"Target seasons {missing} are not in the stats index.")
+    return target_ids, target_positions
+
+
+def _block_groups(index, target_positions, blocking):
+    """Split targets by block: a list of (target rows, candidate positions) pairs."""
+    if blocking is None:
+        return [(np.arange(len(target_positions)), np.arange(len(index)))]
+
+    blocks = index.blocks(blocking)
+    target_codes = blocks.codes[target_positions]
+    return [
+        (np.flatnonzero(target_codes == code), blocks.members(code))
+        for code in np.unique(target_codes)
+    ]
+
+
+def _block_versions(index, target_positions, blocking):
+    """Fingerprint of each target's candidate block (the whole pool when unblocked)."""
+    if blocking is None:
+        return [index.fingerprint()] * len(target_positions)
+
+    blocks = index.blocks(blocking)
+    versions = {}
+    for code in blocks.codes[target_positions]:
+        if code not in versions:
+            versions[code] = index.fingerprint(blocks.members(code))
+    return [versions[code] for code in blocks.codes[target_positions]]
+
+
+def _blocking_config(blocking):
+    return None if blocking is None else {'keys': list(blocking.keys), 'age_band_width': blocking.age_band_width}
+
+
+class EuclideanMatcher:
+    """Match target seasons to controls by Euclidean distance over PlayerSeason.stats_columns."""
+
+    name = 'euclidean'
+
+    def __init__(self, ratio=1, blocking=None):
+        self.ratio = ratio
+        # Optional BlockingScheme; targets are then only matched inside their own block
+        self.blocking = blocking
+
+    def config(self):
+        return {'matcher': self.name, 'ratio': self.ratio, 'blocking': _blocking_config(self.blocking)}
+
+    def target_versions(self, index, target_positions):
+        """A target's match only depends on the seasons in its candidate block."""
+        return _block_versions(index, target_positions, self.blocking)
+
+    def match(self, target_seasons, exclude_ids=()):
+        """
+        Match every target season in one call, without reusing controls.
+
+        Returns {target season id: [(control season id, distance), ...]} with controls sorted by distance.
+        Targets with no eligible control map to an empty list.
+        """
+        index = PlayerSeason.stats_index()
+        target_ids, target_positions = _target_positions(index, target_seasons)
+
+        excluded = np.isin(index.season_ids, list(exclude_ids))
+        matches = {}
+        for rows, candidates in _block_groups(index, target_positions, self.blocking):
+            positions = target_positions[rows]
+
+            # One target x candidate distance matrix per block (the whole pool when unblocked)
+            distances = cdist(index.matrix[positions], index.matrix[candidates])
+
+            # Never match a player against their own seasons
+            forbidden = index.player_uids[positions][:, None] == index.player_uids[candidates][None, :]
+            forbidden |= excluded[candidates][None, :]
+
+            assignments = assign_without_replacement(distances, forbidden, ratio=self.ratio)
+            for target_id, assigned in zip(target_ids[rows], assignments):
+                matches[int(target_id)] = [
+                    (int(index.season_ids[candidates[col]]), distance) for col, distance in assigned
+                ]
+
+        return {int(target_id): matches[int(target_id)] for target_id in target_ids}
+
+
+class PropensityMatcher:
+    """
+    Match target seasons to controls on the propensity score of being an injured player's season.
+
+    A single logistic model is fitted over the whole pool of PlayerSeason covariates and every
+    season is scored in one pass; targets are then matched to seasons of never-injured players
+    by binary search on the sorted logit scores. ``caliper`` is in standard deviations of the logit.
+    """
+
+    name = 'propensity'
+
+    def __init__(self, ratio=1, caliper=None, blocking=None):
+        self.ratio = ratio
+        self.caliper = caliper
+        self.blocking = blocking
+        self._fitted = None
+
+    def config(self):
+        return {
+            'matcher': self.name,
+            'ratio': self.ratio,
+            'caliper': self.caliper,
+            'blocking': _blocking_config(self.blocking),
+        }
+
+    def target_versions(self, index, target_positions):
+        """The model is fitted on the whole pool, so any change to it (or to the injuries) invalidates every match."""
+        version = f"{index.fingerprint()}:{PlayerInjury.current_data_version()}"
+        return [version] * len(target_positions)
+
+    @staticmethod
+    def covariates(index):
+        """Stats columns plus age, with unknown ages imputed by the median."""
+        ages = index.attributes['age'].astype(np.float64)
+        known = ages >= 0
+        ages[~known] = np.median(ages[known]) if known.any() else 0.0
+        return np.column_stack([index.matrix, ages])
+
+    def fit(self, index):
+        """Fit the propensity model and score the pool, once per index and injury table state."""
+        version = (index.version, PlayerInjury.current_data_version())
+        if self._fitted is not None and self._fitted[0] == version:
+            return self._fitted[1:]
+
+        injured_player_ids = [player_id for player_id, in Session.query(PlayerInjury.player_id).distinct()]
+        treated = np.isin(index.player_ids, injured_player_ids)
+        if treated.all() or not treated.any():
+            raise ValueError("Propensity matching needs both injured and never-injured player seasons.")
+
+        covariates = self.covariates(index)
+        model = make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000))
+        model.fit(covariates, treated)
+
+        # Match on the logit of the propensity score
+        scores = model.decision_function(covariates)
+        self._fitted = (version, scores, treated)
+        return scores, treated
+
+    def match(self, target_seasons, exclude_ids=()):
+        """
+        Match every target season in one call, without reusing controls.
+
+        Returns {target season id: [(control season id, score distance), ...]} like EuclideanMatcher.
+        """
+        index = PlayerSeason.stats_index()
+        target_ids, target_positions = _target_positions(index, target_seasons)
+        scores, treated = self.fit(index)
+        caliper = self.caliper * scores.std() if self.caliper is not None else None
+
+        eligible = ~treated & ~np.isin(index.season_ids, list(exclude_ids))
+        matches = {}
+        for rows, candidates in _block_groups(index, target_positions, self.blocking):
+            candidates = candidates[eligible[candidates]]
+            assignments = nearest_by_score(
+                scores[target_positions[rows]], scores[candidates], ratio=self.ratio, caliper=caliper
+            )
+            for target_id, assigned in zip(target_ids[rows], assignments):
+                matches[int(target_id)] = [
+                    (int(index.season_ids[candidates[col]]), distance) for col, distance in assigned
+                ]
+
+        return {int(target_id): matches[int(target_id)] for target_id in target_ids}
+
+
+class MaterializedMatcher:
+    """
+    Wrap a matcher so its results are persisted in the control_matches table.
+
+    Stored matches are reused while the target's candidate block is unchanged; only targets whose
+    block gained, lost or changed a PlayerSeason (or that were never matched) are recomputed, and
+    those never take a control already held by a reused match.
+    """
+
+    def __init__(self, matcher, force=False):
+        self.matcher = matcher
+        self.force = force
+        self.recomputed = []
+
+    @property
+    def name(self):
+        return self.matcher.name
+
+    def config(self):
+        return self.matcher.config()
+
+    def match(self, target_seasons, exclude_ids=()):
+        index = PlayerSeason.stats_index()
+        target_ids, target_positions = _target_positions(index, target_seasons)
+        config = json.dumps(self.config(), sort_keys=True)
+        versions = dict(zip(target_ids.tolist(), self.matcher.target_versions(index, target_positions)))
+
+        stored = {} if self.force else ControlMatch.for_targets(target_ids.tolist(), config)
+        exclude_ids = set(exclude_ids)
+        matches = {
+            target_id: pairs
+            for target_id, (version, pairs) in stored.items()
+            if version == versions[target_id] and not exclude_ids.intersection(control_id for control_id, _ in pairs)
+        }
+
+        stale = [season for season in target_seasons if season.id not in matches]
+        self.recomputed = [season.id for season in stale]
+        if stale:
+            held = {control_id for pairs in matches.values() for control_id, _ in pairs}
+            computed = self.matcher.match(stale, exclude_ids=exclude_ids | held)
+            ControlMatch.store(computed, versions, config)
+            matches.update(computed)
+
+        return {int(target_id): matches[int(target_id)] for target_id in target_ids}
+
+
+MATCHERS = {
+    EuclideanMatcher.name: EuclideanMatcher,
+    PropensityMatcher.name: PropensityMatcher,
+}
+
+
+def make_matcher(name='euclidean', **options):
+    """Build a matcher by name, e.g. make_matcher('propensity', caliper=0.2)."""
+    if name not in MATCHERS:
+        raise ValueError(f"Unknown matcher '{name}'. Expected one of {sorted(MATCHERS)}.")
+    return MATCHERS[name](**options)
+
+
+def load_matches(matches):
+    """Turn a {target id: [(control id, distance), ...]} mapping into {target id: [PlayerSeason, ...]} in one query."""
+    control_ids = {control_id for assigned in matches.values() for control_id, _ in assigned}
+    by_id = {season.id: season for season in PlayerSeason.find_all(*control_ids)}
+    return {
+        target_id: [by_id[control_id] for control_id, _ in assigned]
+        for target_id, assigned in matches.items()
+    }
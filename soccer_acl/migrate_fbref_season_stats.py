@@ -0,0 +1,18 @@
+from models import FbrefSeasonStat, get_engine
+
+
+def migrate_fbref_season_stats():
+    """
+    Create the fbref_season_stats table and back-fill it from the JSON blobs in fbref_player_stats.
+    Migration 9 in migrations.py does the same; this re-runs it on demand (e.g. after new fetches).
+    """
+    try:
+        with get_engine().begin() as connection:
+            FbrefSeasonStat.__table__.create(connection, checkfirst=True)
+            total = FbrefSeasonStat.backfill(connection)
+        print(f"Back-filled {total} fbref season stat rows.")
+    except Exception as e:
+        print(f"An error occurred while migrating fbref stats: {str(e)}")
+
+if __name__ == '__main__':
+    migrate_fbref_season_stats()
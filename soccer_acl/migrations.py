@@ -0,0 +1,157 @@
+"""
+Versioned schema migrations for the soccer_acl database.
+
+Each migration runs once, in its own transaction, and its version is recorded in the
+schema_migrations table. Migrations are written to be safe to re-run as well, so a database
+that was set up by the old one-off scripts (add_stats_to_player.py, create_database.py...)
+just gets them recorded as applied.
+
+    python migrations.py
+"""
+from sqlalchemy import inspect, text
+
+from models import Base, FbrefSeasonStat, PlayerSeasonFeature, create_search_indexes, get_engine
+
+
+def _add_column(connection, table, column, column_type):
+    if column not in {c['name'] for c in inspect(connection).get_columns(table)}:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+
+
+def create_tables(connection):
+    """Create every ORM table that doesn't exist yet."""
+    Base.metadata.create_all(connection)
+
+
+def add_player_link_columns(connection):
+    """players.stats_link and players.fbref_link, previously added by add_stats_to_player.py / add_fbref_link_to_player.py."""
+    _add_column(connection, 'players', 'stats_link', 'VARCHAR')
+    _add_column(connection, 'players', 'fbref_link', 'VARCHAR')
+
+
+def drop_legacy_tables(connection):
+    """Drop the CamelCase Player / Season / PlayerSeason tables from create_database.py, unless they hold data."""
+    existing = set(inspect(connection).get_table_names())
+    for table in ('PlayerSeason', 'Season', 'Player'):
+        if table in existing and not connection.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{table}")')).scalar():
+            connection.execute(text(f'DROP TABLE "{table}"'))
+
+
+# Indexes for the joins and lookups the models run (the models declare them too; see also migration 7)
+LOOKUP_INDEXES = [
+    ('ix_player_seasons_player_id', 'player_seasons', ['player_id']),
+    ('ix_player_seasons_season_id', 'player_seasons', ['season_id']),
+    ('ix_seasons_year_team_comp', 'seasons', ['year', 'team', 'comp']),
+    ('ix_players_name', 'players', ['name']),
+    ('ix_player_injuries_player_id', 'player_injuries', ['player_id']),
+    ('ix_fbref_player_stats_player_id', 'fbref_player_stats', ['player_id']),
+]
+
+
+def add_lookup_indexes(connection):
+    for name, table, columns in LOOKUP_INDEXES:
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})'))
+    connection.execute(text('ANALYZE'))
+
+
+def enable_wal(connection):
+    """Write-ahead logging lets readers run alongside a writer; it is stored in the database file."""
+    connection.execute(text('PRAGMA journal_mode=WAL'))
+
+
+def add_search_indexes(connection):
+    """FTS5 indexes (with sync triggers) for models that declare search_columns: players.name, injury notes..."""
+    create_search_indexes(connection)
+
+
+# Integer columns the old CSV loader sometimes filled with '' instead of NULL
+PLAYER_SEASON_STATS = ['age', 'gls', 'mp', 'min', 'starts', 'subs', 'unsub', 'ast', 'g_a', 'g_pk', 'pk', 'pk_att', 'pk_m']
+
+
+def dedupe_player_seasons(connection):
+    """
+    Collapse the player_seasons rows that re-running populate_data duplicated and make
+    (player_id, season_id) unique, so the loader can upsert on it.
+
+    Duplicates only differ in '' vs NULL cells, so blanks are normalized to NULL first and the
+    oldest row of each pair is kept. Cached control matches pointing at dropped rows are removed.
+    """
+    for column in PLAYER_SEASON_STATS:
+        connection.execute(text(f"UPDATE player_seasons SET {column} = NULL WHERE {column} = ''"))
+    connection.execute(text(
+        'DELETE FROM player_seasons WHERE id NOT IN '
+        '(SELECT MIN(id) FROM player_seasons GROUP BY player_id, season_id)'
+    ))
+    if 'control_matches' in inspect(connection).get_table_names():
+        connection.execute(text(
+            'DELETE FROM control_matches WHERE target_season_id NOT IN (SELECT id FROM player_seasons) '
+            'OR control_season_id NOT IN (SELECT id FROM player_seasons)'
+        ))
+    connection.execute(text('DROP INDEX IF EXISTS ix_player_seasons_player_id'))
+    connection.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_player_seasons_player_season ON player_seasons (player_id, season_id)'
+    ))
+
+    # Seasons are looked up (and upserted) by year, team and comp
+    connection.execute(text('DROP INDEX IF EXISTS ix_seasons_year_team_comp'))
+    connection.execute(text('CREATE UNIQUE INDEX ix_seasons_year_team_comp ON seasons (year, team, comp)'))
+
+
+def add_player_season_features(connection):
+    """Table of materialized per-90 / percentile / z-score features; filled on first read by PlayerSeasonFeature.refresh()."""
+    PlayerSeasonFeature.__table__.create(connection, checkfirst=True)
+
+
+def backfill_fbref_season_stats(connection):
+    """Fill the typed fbref_season_stats rows from the fbref_player_stats blobs (was migrate_fbref_season_stats.py)."""
+    FbrefSeasonStat.__table__.create(connection, checkfirst=True)
+    FbrefSeasonStat.backfill(connection)
+
+
+# (version, name, migration) in the order they are applied; never renumber or edit applied ones
+MIGRATIONS = [
+    (1, 'create_tables', create_tables),
+    (2, 'add_player_link_columns', add_player_link_columns),
+    (3, 'drop_legacy_tables', drop_legacy_tables),
+    (4, 'add_lookup_indexes', add_lookup_indexes),
+    (5, 'enable_wal', enable_wal),
+    (6, 'add_search_indexes', add_search_indexes),
+    (7, 'dedupe_player_seasons', dedupe_player_seasons),
+    (8, 'add_player_season_features', add_player_season_features),
+    (9, 'backfill_fbref_season_stats', backfill_fbref_season_stats),
+]
+
+
+def applied_versions(bind=None):
+    with (bind or get_engine()).begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migrations ('
+            'version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)'
+        ))
+        return {version for version, in connection.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def migrate(bind=None, verbose=True):
+    """Apply every pending migration in order. Returns the versions applied by this call."""
+    bind = bind or get_engine()
+    applied = applied_versions(bind)
+    newly_applied = []
+    for version, name, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        with bind.begin() as connection:
+            migration(connection)
+            connection.execute(
+                text('INSERT INTO schema_migrations (version, name) VALUES (:version, :name)'),
+                {'version': version, 'name': name},
+            )
+        newly_applied.append(version)
+        if verbose:
+            print(f"Applied migration {version}: {name}")
+    if verbose and not newly_applied:
+        print("Database schema is up to date.")
+    return newly_applied
+
+
+if __name__ == '__main__':
+    migrate()
@@ -1,35 +1,199 @@
-from operator import and_
+from contextlib import contextmanager
+import hashlib
 import os
-from sqlalchemy import create_engine, Column, Integer, String
+import re
+import threading
+from sqlalchemy import and_, create_engine, event, func, select, text, Column, Integer, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import sessionmaker, scoped_session, selectinload
 
 # Define the base class for models
 Base = declarative_base()
 
-# Define the DATABASE_URL with the absolute path
+# Database used unless init_db() is given a URL: $SOCCER_ACL_DATABASE_URL, else data/soccer_acl.db
+DATABASE_URL_ENV = 'SOCCER_ACL_DATABASE_URL'
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 db_dir = os.path.join(BASE_DIR, '../data')  # Adjusted to be relative to the soccer_acl folder
+DEFAULT_DATABASE_URL = f'sqlite:///{os.path.join(db_dir, "soccer_acl.db")}'
 
-# Ensure the data directory exists
-if not os.path.exists(db_dir):
-    os.makedirs(db_dir)
+# Created on first use by get_engine(), or explicitly by init_db()
+_engine = None
 
-DATABASE_URL = f'sqlite:///{os.path.join(db_dir, "soccer_acl.db")}'
 
-# Create the engine
-engine = create_engine(DATABASE_URL)
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Per-connection settings; WAL journaling is persistent and set once by migrations.py
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA synchronous=NORMAL')  # safe with WAL, one fsync per checkpoint
+    cursor.execute('PRAGMA cache_size=-65536')  # 64 MB page cache
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
 
-# Create a configured "Session" class
-Session = scoped_session(sessionmaker(bind=engine))
 
-# Ensure that the models create the necessary tables in the database
-Base.metadata.create_all(engine)
+# Change detection for the caches keyed on data_version(), without scanning any table:
+# every write statement or rollback this process sends through the engine bumps _writes, and
+# PRAGMA data_version on a dedicated connection moves when any other connection commits.
+_writes = 0
+_watchers = threading.local()  # sqlite connections can't be shared across threads
+
+# {table name: (change token, data_version())}
+_data_versions = {}
+
+
+def _count_writes(connection, cursor, statement, parameters, context, executemany):
+    global _writes
+    if statement.lstrip()[:6].upper() not in ('SELECT', 'PRAGMA'):
+        _writes += 1
+
+
+def _count_rollback(connection):
+    global _writes
+    _writes += 1
+
+
+def change_token():
+    """
+    A value that changes whenever the database may have changed since the last call: a write
+    or rollback in this process, or a commit from another connection or process (sqlite only;
+    other backends return None, meaning "unknown").
+    """
+    engine = get_engine()
+    if engine.dialect.name != 'sqlite':
+        return None
+    if getattr(_watchers, 'engine', None) is not engine:
+        _watchers.engine, _watchers.connection = engine, engine.raw_connection()
+    cursor = _watchers.connection.cursor()
+    try:
+        external = cursor.execute('PRAGMA data_version').fetchone()[0]
+    finally:
+        cursor.close()
+    return _writes, external
+
+
+def content_hash(rows):
+    """sha1 of an iterable of row tuples, e.g. the ordered rows of a query."""
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update(repr(tuple(row)).encode())
+    return digest.hexdigest()
+
+
+def init_db(url=None, create_tables=False, **engine_options):
+    """
+    (Re)bind the models to a database, e.g. init_db('sqlite://') for a throwaway in-memory one.
+
+    Without a URL, $SOCCER_ACL_DATABASE_URL or the bundled data/soccer_acl.db is used.
+    Tables are only created when ``create_tables`` is set; migrations.py manages the real database.
+    """
+    global _engine, _writes
+    url = url or os.environ.get(DATABASE_URL_ENV) or DEFAULT_DATABASE_URL
+    if url == DEFAULT_DATABASE_URL:
+        os.makedirs(db_dir, exist_ok=True)
+
+    Session.remove()
+    if _engine is not None:
+        if getattr(_watchers, 'engine', None) is _engine:
+            _watchers.connection.close()
+            _watchers.engine = _watchers.connection = None
+        _data_versions.clear()
+        _writes += 1  # a different database: no cached version carries over
+        _engine.dispose()
+        # Drop what was cached from the previous database
+        from .fbref_player_stats import _parsed
+        from .player_timeline import PlayerTimeline
+        PlayerTimeline.invalidate()
+        _parsed.clear()  # keyed by row id, which the next database reuses
+    _engine = create_engine(url, **engine_options)
+    if _engine.dialect.name == 'sqlite':
+        event.listen(_engine, 'connect', _set_sqlite_pragmas)
+    event.listen(_engine, 'after_cursor_execute', _count_writes)
+    event.listen(_engine, 'rollback', _count_rollback)
+    if create_tables:
+        Base.metadata.create_all(_engine)
+        with _engine.begin() as connection:
+            create_search_indexes(connection)
+    return _engine
+
+
+def get_engine():
+    return _engine if _engine is not None else init_db()
+
+
+def __getattr__(name):
+    # `from models import engine` keeps working without creating the engine at import time
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_search_indexes(connection):
+    """Create (and fill) the full-text index of every model that declares search_columns."""
+    for mapper in Base.registry.mappers:
+        if getattr(mapper.class_, 'search_columns', ()):
+            mapper.class_.create_search_index(connection)
+
+
+# Create a configured "Session" class; sessions bind to the engine lazily
+_session_factory = sessionmaker()
+Session = scoped_session(lambda: _session_factory(bind=get_engine()))
+
+@contextmanager
+def unit_of_work():
+    """
+    Defer every BaseModel commit made inside the block to one commit at the end.
+    Writes are only flushed until then, and everything is rolled back if the block raises.
+    Blocks can be nested; only the outermost one commits.
+    """
+    session = Session()
+    session.info['deferred_commits'] = session.info.get('deferred_commits', 0) + 1
+    try:
+        yield session
+    except Exception:
+        session.info['deferred_commits'] -= 1
+        if not session.info['deferred_commits']:
+            session.rollback()
+        raise
+    session.info['deferred_commits'] -= 1
+    if not session.info['deferred_commits']:
+        session.commit()
+
+
+class dual_method:
+    """
+    A method with a class-level and an instance-level implementation under one name,
+    e.g. ``Player.update(player_id, **kwargs)`` and ``player.update(**kwargs)``.
+    """
+
+    def __init__(self, class_func):
+        self.class_func = class_func
+        self.instance_func = None
+
+    def instance(self, instance_func):
+        self.instance_func = instance_func
+        return self
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self.class_func.__get__(owner, owner)
+        return self.instance_func.__get__(instance, owner)
+
 
 # BaseModel definition with Active Record-like methods
 class BaseModel(Base):
     __abstract__ = True
 
+    # Text columns indexed for full-text search(), e.g. ('name',); see create_search_index
+    search_columns = ()
+
+    @staticmethod
+    def _commit():
+        # Inside unit_of_work() only flush; the block commits once at the end
+        session = Session()
+        if session.info.get('deferred_commits'):
+            session.flush()
+        else:
+            session.commit()
+
     @classmethod
     def find(cls, record_id):
         return cls.query().filter_by(id=record_id).first()
@@ -38,6 +202,22 @@ class BaseModel(Base):
     def find_all(cls, *record_ids):
         return cls.query().filter(cls.id.in_(record_ids)).all()
 
+    @classmethod
+    def fetch(cls, *record_ids):
+        """
+        Like find_all, but keeps the given order and serves already-loaded records from the
+        session's identity map; only the missing ones are loaded, in one query.
+        """
+        session = Session()
+
+        def cached(record_id):
+            return session.identity_map.get(session.identity_key(cls, record_id))
+
+        # The identity map holds weak references, so keep the freshly loaded records alive until we return
+        missing = [record_id for record_id in set(record_ids) if cached(record_id) is None]
+        loaded = cls.find_all(*missing) if missing else []
+        return [record for record in map(cached, record_ids) if record is not None]
+
     @classmethod
     def all(cls):
         return cls.query().all()
@@ -50,19 +230,79 @@ class BaseModel(Base):
     def select(cls, *columns):
         return cls.query().with_entities(*[getattr(cls, col) for col in columns]).all()
 
-    @classmethod
+    @dual_method
     def update(cls, record_id, **kwargs):
         cls.query().filter_by(id=record_id).update(kwargs)
-        Session.commit()
+        cls._commit()
 
-    @classmethod
+    @dual_method
     def destroy(cls, record_id):
         instance = cls.find(record_id)
         if instance:
             Session.delete(instance)
-            Session.commit()
+            cls._commit()
             return True
         return False
+
+    @classmethod
+    def find_each(cls, batch_size=1000, query=None):
+        """
+        Iterate over records (optionally of ``query``) in id order, loading ``batch_size`` at a time.
+        Paging is keyed on id, so any ordering on ``query`` is replaced.
+        """
+        query = (query if query is not None else cls.query()).order_by(None)
+        last_id = None
+        while True:
+            batch_query = query if last_id is None else query.filter(cls.id > last_id)
+            batch = batch_query.order_by(cls.id).limit(batch_size).all()
+            if not batch:
+                return
+            yield from batch
+            last_id = batch[-1].id
+
+    @classmethod
+    def bulk_insert(cls, rows):
+        """Insert many rows (dicts with the same keys) in one executemany, bypassing the ORM."""
+        rows = list(rows)
+        if rows:
+            Session.execute(cls.__table__.insert(), rows)
+            cls._commit()
+        return len(rows)
+
+    @classmethod
+    def bulk_upsert(cls, rows, index_elements=('id',), update_columns=None):
+        """
+        Insert many rows, resolving collisions on ``index_elements`` with SQLite's ON CONFLICT.
+
+        Colliding rows get ``update_columns`` overwritten (by default every given column except the
+        conflict keys); pass ``update_columns=()`` to leave them untouched instead.
+        ``index_elements`` must be covered by a unique index.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        statement = sqlite_insert(cls.__table__)
+        if update_columns is None:
+            update_columns = [column for column in rows[0] if column not in index_elements]
+        if update_columns:
+            statement = statement.on_conflict_do_update(
+                index_elements=list(index_elements),
+                set_={column: statement.excluded[column] for column in update_columns},
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=list(index_elements))
+        Session.execute(statement, rows)
+        cls._commit()
+        return len(rows)
+
+    @classmethod
+    def bulk_update_by_id(cls, rows):
+        """Update many records from dicts that each carry an 'id', in one executemany."""
+        rows = list(rows)
+        if rows:
+            Session.bulk_update_mappings(cls, rows)
+            cls._commit()
+        return len(rows)
     
     @classmethod
     def where_like(cls, **kwargs):
@@ -72,9 +312,105 @@ class BaseModel(Base):
         else:
             return Session.query(cls).filter(and_(*filters)).all()
 
+    @classmethod
+    def search_table(cls):
+        return f"{cls.__tablename__}_fts"
+
+    @classmethod
+    def search_index_ddl(cls):
+        """
+        Statements creating an FTS5 index over ``search_columns`` that reads its text from the model's
+        own table (external content) and is kept in sync by insert / update / delete triggers.
+        Accents are folded, so 'Pikkujamsa' finds 'Pikkujämsä'.
+        """
+        table, fts, columns = cls.__tablename__, cls.search_table(), list(cls.search_columns)
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f"new.{column}" for column in columns)
+        old_values = ', '.join(f"old.{column}" for column in columns)
+        remove_old = f"INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+        add_new = f"INSERT INTO {fts} (rowid, {column_list}) VALUES (new.id, {new_values});"
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column_list}, content='{table}', "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {add_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {remove_old} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {column_list} ON {table} "
+            f"BEGIN {remove_old} {add_new} END",
+        ]
+
+    @classmethod
+    def create_search_index(cls, connection):
+        """Create the full-text index if needed and rebuild its contents from the table."""
+        for statement in cls.search_index_ddl():
+            connection.execute(text(statement))
+        fts = cls.search_table()
+        connection.execute(text(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')"))
+
+    @classmethod
+    def search_ids(cls, terms, columns=None, prefix=True, limit=20):
+        """
+        Full-text search over ``search_columns`` (or a subset given as ``columns``).
+
+        Every word of ``terms`` must match; with ``prefix`` each also matches as a word prefix,
+        so 'meg rap' finds 'Megan Rapinoe'. Returns [(id, score)] best first, scored by bm25
+        (lower is better).
+        """
+        words = re.findall(r'\w+', terms or '')
+        if not words:
+            return []
+        expression = ' '.join(f'"{word}"' + ('*' if prefix else '') for word in words)
+        if columns:
+            expression = f"{{{' '.join(columns)}}} : ({expression})"
+
+        fts = cls.search_table()
+        sql = f"SELECT rowid, bm25({fts}) AS score FROM {fts} WHERE {fts} MATCH :expression ORDER BY score"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [(row[0], row[1]) for row in Session.execute(text(sql), {'expression': expression})]
+
+    @classmethod
+    def search(cls, terms, columns=None, prefix=True, limit=20):
+        """Records matching a full-text search (see search_ids), best match first."""
+        return cls.fetch(*[record_id for record_id, _ in cls.search_ids(terms, columns, prefix, limit)])
+
     @classmethod
     def query(cls):
         return Session.query(cls)
+
+    @classmethod
+    def eager(cls, *paths):
+        """
+        Query with the given relationship paths (e.g. 'seasons.season') eagerly loaded.
+        Each relationship costs one extra SELECT for the whole result, however many rows it has.
+        """
+        options = []
+        for path in paths:
+            model, option = cls, None
+            for name in path.split('.'):
+                attribute = getattr(model, name)
+                option = selectinload(attribute) if option is None else option.selectinload(attribute)
+                model = attribute.property.mapper.class_
+            options.append(option)
+        return cls.query().options(*options)
+
+    @classmethod
+    def data_version(cls):
+        """
+        Content hash of the whole table (every row, in primary key order), so any edit changes it.
+        Used to tell when caches derived from the table need rebuilding; it reads every row, so
+        callers go through current_data_version().
+        """
+        table = cls.__table__
+        return content_hash(Session.execute(select(table).order_by(*table.primary_key.columns)))
+
+    @classmethod
+    def current_data_version(cls):
+        """data_version(), only recomputed (a full scan) when change_token() says the database may have changed."""
+        token = change_token()
+        cached = _data_versions.get(cls.__tablename__)
+        if token is None or cached is None or cached[0] != token:
+            cached = _data_versions[cls.__tablename__] = (token, cls.data_version())
+        return cached[1]
     
     def attrs(self):
         # Print each attribute of the instance on a new line
@@ -84,22 +420,28 @@ class BaseModel(Base):
     def save(self):
         """Save the current instance to the database."""
         Session.add(self)
-        Session.commit()
+        self._commit()
     
+    @update.instance
     def update(self, **kwargs):
         """Update the current instance with provided kwargs."""
         for attr, value in kwargs.items():
             setattr(self, attr, value)
         self.save()
 
+    @destroy.instance
     def destroy(self):
         """Delete the current instance from the database."""
         Session.delete(self)
-        Session.commit()
+        self._commit()
 
 # Import models to ensure they are registered properly with SQLAlchemy
 from .player import Player
 from .season import Season
 from .player_season import PlayerSeason
 from .player_injury import PlayerInjury
-from .fbref_player_stats import FbrefPlayerStats  
\ No newline at end of file
+from .fbref_player_stats import FbrefPlayerStats
+from .control_match import ControlMatch
+from .fbref_season_stat import FbrefSeasonStat
+from .player_season_feature import PlayerSeasonFeature
+  
\ No newline at end of file
@@ -0,0 +1,62 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from . import BaseModel, Session
+
+class ControlMatch(BaseModel):
+    """
+    Materialized control match: one row per (target season, rank) for a given matcher config.
+
+    ``data_version`` fingerprints the candidate block the match was computed from, so a row is
+    only recomputed when that block gains, loses or changes a PlayerSeason.
+    A row with no control season records that the target had no eligible control.
+    """
+    __tablename__ = 'control_matches'
+
+    id = Column(Integer, primary_key=True)
+    target_season_id = Column(Integer, ForeignKey('player_seasons.id'), nullable=False, index=True)
+    control_season_id = Column(Integer, ForeignKey('player_seasons.id'), nullable=True)
+    rank = Column(Integer, nullable=False)
+    distance = Column(Float)
+    matcher_config = Column(String, nullable=False)
+    data_version = Column(String, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    target_season = relationship('PlayerSeason', foreign_keys=[target_season_id])
+    control_season = relationship('PlayerSeason', foreign_keys=[control_season_id])
+
+    @classmethod
+    def for_targets(cls, target_ids, matcher_config):
+        """Stored matches as {target id: (data version, [(control id, distance), ...])}."""
+        stored = {}
+        rows = (
+            cls.query()
+            .filter(cls.target_season_id.in_(list(target_ids)), cls.matcher_config == matcher_config)
+            .order_by(cls.target_season_id, cls.rank)
+            .all()
+        )
+        for row in rows:
+            version, pairs = stored.setdefault(row.target_season_id, (row.data_version, []))
+            if row.control_season_id is not None:
+                pairs.append((row.control_season_id, row.distance))
+        return stored
+
+    @classmethod
+    def store(cls, matches, versions, matcher_config):
+        """Replace the stored matches of the given targets in a single transaction (or the enclosing unit_of_work)."""
+        Session.query(cls).filter(
+            cls.target_season_id.in_(list(matches)), cls.matcher_config == matcher_config
+        ).delete(synchronize_session=False)
+
+        for target_id, pairs in matches.items():
+            rows = pairs or [(None, None)]
+            for rank, (control_id, distance) in enumerate(rows):
+                Session.add(cls(
+                    target_season_id=target_id,
+                    control_season_id=control_id,
+                    rank=rank,
+                    distance=distance,
+                    matcher_config=matcher_config,
+                    data_version=versions[target_id],
+                ))
+        cls._commit()
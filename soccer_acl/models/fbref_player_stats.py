@@ -1,17 +1,92 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+import json
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, event
+from sqlalchemy.orm import relationship, Session as OrmSession
 from sqlalchemy.sql import func
+from helpers import average_stats, stat_matrix
 from . import BaseModel
+from .fbref_season_stat import TABLE_SOURCES, TABLE_STATS
+
+# {FbrefPlayerStats id: ParsedFbrefStats}
+_parsed = {}
+
+
+class ParsedFbrefStats:
+    """
+    Decoded stats blobs of one FbrefPlayerStats row, with the rows of each table grouped by season
+    and coerced once into a float matrix (see helpers.stat_matrix).
+
+    The matrices only hold the table's numeric stats (TABLE_STATS); cells like season, team or
+    age would otherwise average into meaningless zero "stats".
+    """
+
+    TABLES = ('shooting_stats', 'playing_time_stats')
+    STAT_COLUMNS = {TABLE_SOURCES[table]: set(stats) for table, stats in TABLE_STATS.items()}
+
+    def __init__(self, updated_at, shooting_stats, playing_time_stats):
+        self.updated_at = updated_at
+        self.rows = {'shooting_stats': shooting_stats, 'playing_time_stats': playing_time_stats}
+        self.by_season = {}
+        self.positions = {}
+        self.matrices = {}
+        for table, rows in self.rows.items():
+            seasons = self.by_season[table] = {}
+            positions = self.positions[table] = {}
+            for position, row in enumerate(rows):
+                seasons.setdefault(row.get('season'), []).append(row)
+                positions.setdefault(row.get('season'), []).append(position)
+            self.matrices[table] = stat_matrix(rows, self.stat_columns(rows, table))
+
+    @classmethod
+    def stat_columns(cls, rows, *tables):
+        """Numeric stat columns of ``tables`` present in ``rows``, in order of first appearance."""
+        numeric = set().union(*(cls.STAT_COLUMNS[table] for table in tables))
+        return [column for column in dict.fromkeys(key for row in rows for key in row) if column in numeric]
+
+    def season_rows(self, table, seasons):
+        """Rows of ``table`` for the given season strings, in season order."""
+        by_season = self.by_season[table]
+        return [row for season in seasons for row in by_season.get(season, [])]
+
+    def season_matrix(self, table, seasons):
+        """Numeric rows of ``table`` for the given season strings, as (matrix, columns)."""
+        matrix, columns = self.matrices[table]
+        positions = [position for season in seasons for position in self.positions[table].get(season, [])]
+        return matrix[positions], columns
+
+    def season_averages(self, table, seasons):
+        return average_stats(*self.season_matrix(table, seasons))
+
 
 class FbrefPlayerStats(BaseModel):
     __tablename__ = 'fbref_player_stats'
 
     id = Column(Integer, primary_key=True)
-    player_id = Column(Integer, ForeignKey('players.id'), nullable=False)
+    player_id = Column(Integer, ForeignKey('players.id'), nullable=False, index=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     playing_time_stats = Column(Text)  # JSON or stringified version of the playing_time_stats data
     shooting_stats = Column(Text)  # JSON or stringified version of the shooting_stats data
 
     # Relationship back to Player
-    player = relationship("Player", back_populates="fbref_stats")
\ No newline at end of file
+    player = relationship("Player", back_populates="fbref_stats")
+
+    def parsed(self):
+        """The decoded stats, parsed once per row and re-parsed when ``updated_at`` changes."""
+        cached = _parsed.get(self.id)
+        if cached is None or cached.updated_at != self.updated_at:
+            cached = ParsedFbrefStats(
+                self.updated_at,
+                json.loads(self.shooting_stats or '[]'),
+                json.loads(self.playing_time_stats or '[]'),
+            )
+            if self.id is not None:
+                _parsed[self.id] = cached
+        return cached
+
+
+@event.listens_for(OrmSession, 'after_flush')
+def _drop_parsed_on_flush(session, flush_context):
+    # updated_at only has second resolution, so also drop entries written through this process
+    for instance in list(session.dirty) + list(session.deleted):
+        if isinstance(instance, FbrefPlayerStats):
+            _parsed.pop(instance.id, None)
@@ -0,0 +1,213 @@
+import re
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, and_, case, func
+from sqlalchemy.orm import relationship, Session as OrmSession
+from helpers import parse_stat
+from . import BaseModel, Session
+
+# Numeric data-stat columns of each fbref table
+PLAYING_TIME_STATS = [
+    'games', 'minutes', 'minutes_per_game', 'minutes_pct', 'minutes_90s', 'games_starts',
+    'minutes_per_start', 'games_complete', 'games_subs', 'minutes_per_sub', 'unused_subs',
+    'points_per_game', 'on_goals_for', 'on_goals_against', 'plus_minus', 'plus_minus_per90',
+    'plus_minus_wowy', 'on_xg_for', 'on_xg_against', 'xg_plus_minus', 'xg_plus_minus_per90',
+    'xg_plus_minus_wowy',
+]
+SHOOTING_STATS = [
+    'minutes_90s', 'goals', 'shots', 'shots_on_target', 'shots_on_target_pct', 'shots_per90',
+    'shots_on_target_per90', 'goals_per_shot', 'goals_per_shot_on_target', 'average_shot_distance',
+    'shots_free_kicks', 'pens_made', 'pens_att', 'xg', 'npxg', 'npxg_per_shot', 'xg_net', 'npxg_net',
+]
+TABLE_STATS = {'playing_time': PLAYING_TIME_STATS, 'shooting': SHOOTING_STATS}
+
+# Blob attribute on FbrefPlayerStats for each table
+TABLE_SOURCES = {'playing_time': 'playing_time_stats', 'shooting': 'shooting_stats'}
+
+
+class FbrefSeasonStat(BaseModel):
+    """
+    One fbref table row for a player and season, with typed numeric columns.
+
+    Normalized from the JSON blobs in FbrefPlayerStats so stats can be filtered and
+    aggregated in SQL. Columns that don't belong to ``stats_table`` stay NULL.
+    """
+    __tablename__ = 'fbref_season_stats'
+    __table_args__ = (
+        Index('ix_fbref_season_stats_player_season', 'player_id', 'season'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    player_id = Column(Integer, ForeignKey('players.id'), nullable=False)
+    fbref_player_stats_id = Column(Integer, ForeignKey('fbref_player_stats.id'), nullable=False, index=True)
+    stats_table = Column(String, nullable=False)  # 'playing_time' or 'shooting'
+    row_number = Column(Integer, nullable=False)  # position in the source table; a season can span several teams
+    season = Column(String)  # as shown by fbref, e.g. '2017'
+    year = Column(Integer)  # first year of the season
+    age = Column(Integer)
+    team = Column(String)
+    country = Column(String)
+    comp_level = Column(String)
+    lg_finish = Column(String)
+
+    # Playing time
+    games = Column(Float)
+    minutes = Column(Float)
+    minutes_per_game = Column(Float)
+    minutes_pct = Column(Float)
+    minutes_90s = Column(Float)
+    games_starts = Column(Float)
+    minutes_per_start = Column(Float)
+    games_complete = Column(Float)
+    games_subs = Column(Float)
+    minutes_per_sub = Column(Float)
+    unused_subs = Column(Float)
+    points_per_game = Column(Float)
+    on_goals_for = Column(Float)
+    on_goals_against = Column(Float)
+    plus_minus = Column(Float)
+    plus_minus_per90 = Column(Float)
+    plus_minus_wowy = Column(Float)
+    on_xg_for = Column(Float)
+    on_xg_against = Column(Float)
+    xg_plus_minus = Column(Float)
+    xg_plus_minus_per90 = Column(Float)
+    xg_plus_minus_wowy = Column(Float)
+
+    # Shooting
+    goals = Column(Float)
+    shots = Column(Float)
+    shots_on_target = Column(Float)
+    shots_on_target_pct = Column(Float)
+    shots_per90 = Column(Float)
+    shots_on_target_per90 = Column(Float)
+    goals_per_shot = Column(Float)
+    goals_per_shot_on_target = Column(Float)
+    average_shot_distance = Column(Float)
+    shots_free_kicks = Column(Float)
+    pens_made = Column(Float)
+    pens_att = Column(Float)
+    xg = Column(Float)
+    npxg = Column(Float)
+    npxg_per_shot = Column(Float)
+    xg_net = Column(Float)
+    npxg_net = Column(Float)
+
+    player = relationship('Player')
+    fbref_player_stats = relationship('FbrefPlayerStats')
+
+    @staticmethod
+    def season_year(season):
+        match = re.match(r'\d{4}', season or '')
+        return int(match.group()) if match else None
+
+    @classmethod
+    def rows_from(cls, fbref_stats):
+        """Typed rows for every table row in an FbrefPlayerStats record (not added to the session)."""
+        parsed = fbref_stats.parsed()
+        rows = []
+        for stats_table, stats in TABLE_STATS.items():
+            for row_number, row in enumerate(parsed.rows[TABLE_SOURCES[stats_table]]):
+                age = parse_stat(row.get('age'))
+                rows.append(cls(
+                    player_id=fbref_stats.player_id,
+                    fbref_player_stats_id=fbref_stats.id,
+                    stats_table=stats_table,
+                    row_number=row_number,
+                    season=row.get('season'),
+                    year=cls.season_year(row.get('season')),
+                    age=int(age) if age is not None else None,
+                    team=row.get('team') or None,
+                    country=row.get('country') or None,
+                    comp_level=row.get('comp_level') or None,
+                    lg_finish=row.get('lg_finish') or None,
+                    **{stat: parse_stat(row.get(stat)) for stat in stats}
+                ))
+        return rows
+
+    @classmethod
+    def replace_for(cls, fbref_stats):
+        """Rewrite the typed rows of an FbrefPlayerStats record (the caller commits)."""
+        Session.query(cls).filter(cls.fbref_player_stats_id == fbref_stats.id).delete(synchronize_session=False)
+        rows = cls.rows_from(fbref_stats)
+        Session.add_all(rows)
+        return rows
+
+    @classmethod
+    def backfill(cls, connection):
+        """
+        Rewrite the whole table from the JSON blobs in fbref_player_stats, on ``connection``'s
+        transaction. Every row is rebuilt, so running it again is harmless. Returns the row count.
+        """
+        from .fbref_player_stats import FbrefPlayerStats
+
+        session = OrmSession(bind=connection)
+        try:
+            records = session.query(FbrefPlayerStats).order_by(FbrefPlayerStats.id).all()
+            columns = [column.key for column in cls.__table__.columns if column.key != 'id']
+            rows = [
+                {column: getattr(row, column) for column in columns}
+                for record in records for row in cls.rows_from(record)
+            ]
+        finally:
+            session.close()
+
+        connection.execute(cls.__table__.delete())
+        if rows:
+            connection.execute(cls.__table__.insert(), rows)
+        return len(rows)
+
+    @staticmethod
+    def first_records():
+        """Id of each player's first FbrefPlayerStats record, the one Player.fbref_stats[0] reads."""
+        from .fbref_player_stats import FbrefPlayerStats
+
+        return Session.query(func.min(FbrefPlayerStats.id)).group_by(FbrefPlayerStats.player_id)
+
+    @classmethod
+    def averages(cls, stats_table, player_ids=None, start_year=None, end_year=None):
+        """
+        Per-player averages of a table's stats over seasons in [start_year, end_year], computed in SQL
+        from each player's first FbrefPlayerStats record.
+
+        Blank cells are NULL and ignored by AVG, whereas ParsedFbrefStats.season_averages counts
+        them as 0, so a stat with blanks averages higher here.
+        Returns {player_id: {stat: average}}.
+        """
+        stats = TABLE_STATS[stats_table]
+        query = Session.query(cls.player_id, *[func.avg(getattr(cls, stat)) for stat in stats]) \
+            .filter(cls.stats_table == stats_table, cls.fbref_player_stats_id.in_(cls.first_records()))
+        if player_ids is not None:
+            query = query.filter(cls.player_id.in_(list(player_ids)))
+        if start_year is not None:
+            query = query.filter(cls.year >= start_year)
+        if end_year is not None:
+            query = query.filter(cls.year <= end_year)
+        return {row[0]: dict(zip(stats, row[1:])) for row in query.group_by(cls.player_id)}
+
+    @classmethod
+    def split_averages(cls, stats_table, split_years):
+        """
+        Pre/post averages around a per-player split year, in one grouped SQL query over each
+        player's first FbrefPlayerStats record. Blank cells are ignored, as in averages().
+
+        :param split_years: {player_id: year}; seasons before the year are 'pre', after it 'post'.
+        :return: {player_id: {'pre': {stat: average}, 'post': {stat: average}}}
+        """
+        if not split_years:
+            return {}
+        stats = TABLE_STATS[stats_table]
+        split_year = case(split_years, value=cls.player_id)
+        period = case((cls.year < split_year, 'pre'), (cls.year > split_year, 'post'))
+        query = (
+            Session.query(cls.player_id, period, *[func.avg(getattr(cls, stat)) for stat in stats])
+            .filter(and_(
+                cls.stats_table == stats_table,
+                cls.player_id.in_(list(split_years)),
+                cls.fbref_player_stats_id.in_(cls.first_records()),
+                period.isnot(None),
+            ))
+            .group_by(cls.player_id, period)
+        )
+        averages = {}
+        for row in query:
+            averages.setdefault(row[0], {})[row[1]] = dict(zip(stats, row[2:]))
+        return averages
@@ -1,11 +1,11 @@
 import json
-import requests
 from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm import relationship
-from helpers import parse_date
-from bs4 import BeautifulSoup
+from helpers import average_stats, parse_date, stat_matrix
 
-from models.fbref_player_stats import FbrefPlayerStats
+from models.fbref_player_stats import FbrefPlayerStats, ParsedFbrefStats
+from models.fbref_season_stat import FbrefSeasonStat
+from models.player_timeline import PlayerTimeline
 
 from . import BaseModel, Session
 
@@ -13,32 +13,58 @@ class Player(BaseModel):
     __tablename__ = 'players'
 
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     nation = Column(String)
     unique_id = Column(String, unique=True)
     fbref_link = Column(String)
 
+    search_columns = ('name',)
+
     # Relationship with PlayerInjury and PlayerSeason
         # Relationship with PlayerInjury and PlayerSeason
     injuries = relationship("PlayerInjury", backref="injured_player", cascade="all, delete-orphan")
     seasons = relationship("PlayerSeason", backref="season_player")  # Adjusted backref name
-    fbref_stats = relationship("FbrefPlayerStats", back_populates="player", cascade="all, delete-orphan")
+    fbref_stats = relationship("FbrefPlayerStats", back_populates="player", cascade="all, delete-orphan", order_by="FbrefPlayerStats.id")
+
+    # Relationships the analysis pipeline touches for every player
+    COHORT_PATHS = ('injuries', 'seasons.season', 'fbref_stats')
+
+    @classmethod
+    def load_cohort(cls, *criteria, player_ids=None):
+        """
+        Load players matching ``criteria`` (and/or ``player_ids``) with their injuries, seasons,
+        Season rows and fbref stats in a fixed number of queries, whatever the cohort size.
+        """
+        query = cls.eager(*cls.COHORT_PATHS).filter(*criteria)
+        if player_ids is not None:
+            query = query.filter(cls.id.in_(list(player_ids)))
+        return query.order_by(cls.id).all()
+
+    def timeline(self):
+        """Sorted season years, season ids and first injury year of this player (cached)."""
+        return PlayerTimeline.for_player(self.id)
+
+    def _seasons(self, season_ids):
+        from models.player_season import PlayerSeason
+        return PlayerSeason.fetch(*season_ids)
+
+    def season_year(self, player_season):
+        """Year of a PlayerSeason, e.g. an anchor season for event_panel.EventPanel.build."""
+        # Seasons of other players are not on this timeline
+        year = self.timeline().year_of(player_season.id)
+        return year if year is not None else player_season.season.year
 
     def pre_injury_seasons(self):
-        injury_dates = [injury.date_of_injury for injury in self.injuries if injury.date_of_injury]
-        if not injury_dates:
+        timeline = self.timeline()
+        if timeline.first_injury_year is None:
             return []
-        first_injury_date = min(injury_dates)
-        injury_year = first_injury_date.year
-        return [season for season in self.seasons if season.season.year < injury_year]
+        return self._seasons(timeline.before(timeline.first_injury_year))
 
     def post_injury_seasons(self):
-        injury_dates = [injury.date_of_injury for injury in self.injuries if injury.date_of_injury]
-        if not injury_dates:
+        timeline = self.timeline()
+        if timeline.first_injury_year is None:
             return []
-        first_injury_date = min(injury_dates)
-        injury_year = first_injury_date.year
-        return [season for season in self.seasons if season.season.year >= injury_year]
+        return self._seasons(timeline.after(timeline.first_injury_year, inclusive=True))
     
     def control_pre_seasons(self, player_season):
         """
@@ -47,11 +73,9 @@ class Player(BaseModel):
         if not player_season:
             return {}
 
-        # Get the year of the given player_season
-        target_year = player_season.season.year
-
-        # Get the seasons up to the target year
-        pre_seasons = [season for season in self.seasons if season.season.year < target_year]
+        # Get the seasons before the year of the given player_season
+        timeline = self.timeline()
+        pre_seasons = self._seasons(timeline.before(self.season_year(player_season)))
 
         # Collect and average the stats for these seasons
         if pre_seasons:
@@ -65,11 +89,9 @@ class Player(BaseModel):
         if not player_season:
             return {}
 
-        # Get the year of the given player_season
-        target_year = player_season.season.year
-
-        # Get the seasons following the target year
-        post_seasons = [season for season in self.seasons if season.season.year > target_year]
+        # Get the seasons following the year of the given player_season
+        timeline = self.timeline()
+        post_seasons = self._seasons(timeline.after(self.season_year(player_season)))
 
         # Collect and average the stats for these seasons
         if post_seasons:
@@ -80,72 +102,25 @@ class Player(BaseModel):
         """
         Collect and average stats for multiple seasons.
         """
-        shooting_stats = []
-        playing_time_stats = []
-
-        for season in player_seasons:
-            stats = self.collect_fbref_stats(season)
-            shooting_stats.extend(stats['shooting_stats'])  # extend the list instead of append
-            playing_time_stats.extend(stats['playing_time_stats'])  # extend the list instead of append
-
-        # Initialize empty dictionaries to store the sum of stats
-        summed_shooting_stats = {}
-        summed_playing_time_stats = {}
-
-        # Sum the stats across all seasons
-        for stats_list in shooting_stats:
-            for key, value in stats_list.items():
-                try:
-                    numeric_value = float(value) if value and value.replace('.', '', 1).isdigit() else 0
-                except ValueError:
-                    numeric_value = 0  # Handle the case where the value cannot be converted to a float
-
-                if key in summed_shooting_stats:
-                    summed_shooting_stats[key] += numeric_value
-                else:
-                    summed_shooting_stats[key] = numeric_value
-
-        for stats_list in playing_time_stats:
-            for key, value in stats_list.items():
-                try:
-                    numeric_value = float(value) if value and value.replace('.', '', 1).isdigit() else 0
-                except ValueError:
-                    numeric_value = 0  # Handle the case where the value cannot be converted to a float
-
-                if key in summed_playing_time_stats:
-                    summed_playing_time_stats[key] += numeric_value
-                else:
-                    summed_playing_time_stats[key] = numeric_value
-
-        # Average the stats
-        avg_shooting_stats = {key: summed_shooting_stats[key] / len(shooting_stats) for key in summed_shooting_stats}
-        avg_playing_time_stats = {key: summed_playing_time_stats[key] / len(playing_time_stats) for key in summed_playing_time_stats}
+        parsed = self.fbref_stats[0].parsed()
+        seasons = [str(self.season_year(season)) for season in player_seasons]
 
+        # Average the already-coerced stat rows of those seasons
         return {
-            'shooting_stats': avg_shooting_stats,
-            'playing_time_stats': avg_playing_time_stats
+            'shooting_stats': parsed.season_averages('shooting_stats', seasons),
+            'playing_time_stats': parsed.season_averages('playing_time_stats', seasons)
         }
 
 
     def collect_avg_fbref_stats(self, player_seasons=None):
-        shooting_stats = json.loads(self.fbref_stats[0].shooting_stats)
-        playing_time_stats = json.loads(self.fbref_stats[0].playing_time_stats)
+        parsed = self.fbref_stats[0].parsed()
 
         if player_seasons:
-            season_years = [str(season.season.year) for season in player_seasons]
-
-            # Filter and accumulate shooting stats
-            filtered_shooting_stats = [
-                stat for stat in shooting_stats if stat.get('season') in season_years
-            ]
-            # Filter and accumulate playing time stats
-            filtered_playing_time_stats = [
-                stat for stat in playing_time_stats if stat.get('season') in season_years
-            ]
+            season_years = sorted({str(self.season_year(season)) for season in player_seasons})
 
             # Calculate average stats
-            avg_shooting_stats = self.calculate_average_stats(filtered_shooting_stats)
-            avg_playing_time_stats = self.calculate_average_stats(filtered_playing_time_stats)
+            avg_shooting_stats = parsed.season_averages('shooting_stats', season_years)
+            avg_playing_time_stats = parsed.season_averages('playing_time_stats', season_years)
 
             return {
                 'avg_shooting_stats': avg_shooting_stats,
@@ -154,38 +129,20 @@ class Player(BaseModel):
 
         # If no specific player_seasons provided, return all stats
         return {
-            'shooting_stats': shooting_stats,
-            'playing_time_stats': playing_time_stats
+            'shooting_stats': list(parsed.rows['shooting_stats']),
+            'playing_time_stats': list(parsed.rows['playing_time_stats'])
         }
 
     def calculate_average_stats(self, stats_list):
-        if not stats_list:
-            return {}
-
-        # Initialize dictionaries to accumulate totals
-        totals = {}
-        count = len(stats_list)
-
-        # Accumulate totals for each stat
-        for stat in stats_list:
-            for key, value in stat.items():
-                # Convert numeric strings to floats for averaging
-                try:
-                    value = float(value.replace(',', '')) if value else 0.0
-                except ValueError:
-                    value = 0.0
-
-                if key in totals:
-                    totals[key] += value
-                else:
-                    totals[key] = value
-
-        # Calculate averages
-        averages = {key: total / count for key, total in totals.items()}
-
-        return averages
+        # Rows of either fbref table; only their numeric stats are averaged
+        columns = ParsedFbrefStats.stat_columns(stats_list, *ParsedFbrefStats.TABLES)
+        return average_stats(*stat_matrix(stats_list, columns))
     
     def fetch_player_data(self):
+        # Scraping dependencies are only needed here, so importing the models doesn't pull them in
+        import requests
+        from bs4 import BeautifulSoup
+
         url = self.fbref_link
         try:
             response = requests.get(url)
@@ -236,8 +193,10 @@ class Player(BaseModel):
                 shooting_stats=shooting_stats_json
             )
 
-            # Add and commit the new stats to the database
+            # Add the new stats and their typed per-season rows, then commit
             session.add(fbref_stats)
+            session.flush()
+            FbrefSeasonStat.replace_for(fbref_stats)
             session.commit()
             print(f"Fbref stats for {self.name} have been added.")
         else:
@@ -260,40 +219,19 @@ class Player(BaseModel):
         return fbref_link
     
     def collect_fbref_stats(self, player_season=None):
-        shooting_stats = json.loads(self.fbref_stats[0].shooting_stats)
-        playing_time_stats = json.loads(self.fbref_stats[0].playing_time_stats)
+        parsed = self.fbref_stats[0].parsed()
 
         # If player_season is provided, filter the stats for just those years
         if player_season:
-            season_year = player_season.season.year
-
-            # Filter shooting stats
-            shooting_stats_filtered = [
-                stat for stat in shooting_stats if stat.get('season') == str(season_year)
-            ]
-
-            # Filter playing time stats
-            playing_time_stats_filtered = [
-                stat for stat in playing_time_stats if stat.get('season') == str(season_year)
-            ]
+            season_year = str(self.season_year(player_season))
 
             return {
-                'shooting_stats': shooting_stats_filtered,
-                'playing_time_stats': playing_time_stats_filtered
+                'shooting_stats': parsed.season_rows('shooting_stats', [season_year]),
+                'playing_time_stats': parsed.season_rows('playing_time_stats', [season_year])
             }
 
         # If no player_season is provided, return all stats
         return {
-            'shooting_stats': shooting_stats,
-            'playing_time_stats': playing_time_stats
+            'shooting_stats': list(parsed.rows['shooting_stats']),
+            'playing_time_stats': list(parsed.rows['playing_time_stats'])
         }
-
-
-
-
-
-    
-        
-
-
-
@@ -6,7 +6,7 @@ class PlayerInjury(BaseModel):
     __tablename__ = 'player_injuries'
 
     id = Column(Integer, primary_key=True)
-    player_id = Column(Integer, ForeignKey('players.id'), nullable=False)
+    player_id = Column(Integer, ForeignKey('players.id'), nullable=False, index=True)
     date_of_injury = Column(Date, nullable=True)  # Nullable date of injury
     venue = Column(String, nullable=True)
     injury_surface = Column(String, nullable=True)
@@ -25,6 +25,8 @@ class PlayerInjury(BaseModel):
     notes = Column(String, nullable=True)
     return_date = Column(Date, nullable=True)
 
+    search_columns = ('notes', 'injury', 'venue')
+
     # Relationship with Player model
     player = relationship("Player", backref="player_injuries")
 
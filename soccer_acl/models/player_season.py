@@ -1,17 +1,25 @@
-from gettext import npgettext
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Index, Integer, String, Float, ForeignKey
 
 from models.player import Player
+from models.season import Season
+from models.stats_index import SeasonStatsIndex
 from . import Base, BaseModel, Session
-import np
+import numpy as np
 from sqlalchemy.orm import relationship
 
+# Cached stats index, rebuilt lazily whenever the underlying tables change
+_stats_index = None
+
 class PlayerSeason(BaseModel):
     __tablename__ = 'player_seasons'
+    __table_args__ = (
+        # One row per player and season; also serves player_id lookups
+        Index('ix_player_seasons_player_season', 'player_id', 'season_id', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     player_id = Column(Integer, ForeignKey('players.id'))
-    season_id = Column(Integer, ForeignKey('seasons.id'))
+    season_id = Column(Integer, ForeignKey('seasons.id'), index=True)
     age = Column(Integer)
     gls = Column(Integer)
     mp = Column(Integer)
@@ -35,39 +43,56 @@ class PlayerSeason(BaseModel):
 
 
 
-    def find_control_matches(self, top_n=5):
-        session = Session()
-        # Define the statistics to compare
-        stats_columns = ['gls', 'mp', 'min', 'n90s', 'starts', 'subs', 'ast', 'g_a', 'g_pk']
-
-        # Get the statistics for this player season, handling None or empty values
-        current_stats = np.array([
-            self.safe_convert(getattr(self, col), float, 0) for col in stats_columns
-        ], dtype=np.float64)
-
-        # Query to find potential control player seasons, excluding the same player
-        potential_controls = session.query(PlayerSeason).join(Player).filter(
-            PlayerSeason.id != self.id,
-            Player.unique_id != self.player.unique_id  # Exclude same player by unique_id
-        ).all()
-
-        distances = []
+    # Statistics compared when looking for control seasons
+    stats_columns = ['gls', 'mp', 'min', 'n90s', 'starts', 'subs', 'ast', 'g_a', 'g_pk']
 
-        for control in potential_controls:
-            control_stats = np.array([
-                self.safe_convert(getattr(control, col), float, 0) for col in stats_columns
-            ], dtype=np.float64)
+    @classmethod
+    def stats_index(cls):
+        """Return the stats index for the current DB state, rebuilding it if the tables changed."""
+        global _stats_index
+        version = (cls.current_data_version(), Player.current_data_version(), Season.current_data_version())
+        if _stats_index is None or _stats_index.version != version:
+            _stats_index = SeasonStatsIndex.from_db(Session(), cls.stats_columns, version=version)
+        return _stats_index
 
-            # Calculate Euclidean distance
-            distance = np.linalg.norm(current_stats - control_stats)
-
-            distances.append((control, distance))
-
-        # Sort by distance and return the top N matches
-        distances.sort(key=lambda x: x[1])
-        top_matches = [match for match, _ in distances[:top_n]]
+    @staticmethod
+    def use_stats_index(index):
+        """Use a prebuilt index (e.g. from a snapshot) for as long as its version matches the DB."""
+        global _stats_index
+        _stats_index = index
+
+    def stats_vector(self):
+        return np.array([
+            self.safe_convert(getattr(self, col), float, 0) for col in self.stats_columns
+        ], dtype=np.float64)
 
-        return top_matches
+    def find_control_matches(self, top_n=5, blocking=None):
+        index = self.stats_index()
+
+        # With a BlockingScheme, only seasons in this season's block are candidates
+        candidates = None
+        if blocking is not None:
+            blocks = index.blocks(blocking)
+            position = index.positions([self.id])[0]
+            candidates = blocks.members(blocks.codes[position]) if position >= 0 else []
+
+        # Nearest seasons by Euclidean distance, excluding this season and any other season of the same player
+        matches = index.nearest(
+            self.stats_vector(),
+            top_n=top_n,
+            exclude_uid=self.player.unique_id,
+            exclude_ids=[self.id],
+            candidates=candidates,
+        )
+
+        # Hydrate only the matches, keeping distance order
+        by_id = {season.id: season for season in PlayerSeason.find_all(*[season_id for season_id, _ in matches])}
+        return [by_id[season_id] for season_id, _ in matches]
+
+    def features(self):
+        """League-relative per-90 rates, percentiles and z-scores of this season's stats (see PlayerSeasonFeature)."""
+        from models.player_season_feature import PlayerSeasonFeature
+        return PlayerSeasonFeature.for_season(self.id)
 
     @staticmethod
     def safe_convert(value, target_type, default=0):
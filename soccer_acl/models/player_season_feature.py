@@ -0,0 +1,191 @@
+from itertools import groupby
+
+import numpy as np
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, cast, func, literal, select, union_all
+from sqlalchemy.orm import relationship
+
+from models.player_season import PlayerSeason
+from models.season import Season
+from . import BaseModel, Session, change_token, content_hash
+
+# change_token() when the features were last checked against the seasons
+_checked = None
+
+
+class PlayerSeasonFeature(BaseModel):
+    """
+    League-relative version of one PlayerSeason stat: the raw value, its per-90 rate, and its
+    percentile and z-score among the seasons of the same year, competition and position group.
+
+    Rows are materialized per year by refresh(); a year is only rebuilt when its seasons change.
+    """
+    __tablename__ = 'player_season_features'
+    __table_args__ = (
+        Index('ix_player_season_features_season_stat', 'player_season_id', 'stat', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    player_season_id = Column(Integer, ForeignKey('player_seasons.id'), nullable=False)
+    year = Column(Integer, nullable=False, index=True)
+    comp = Column(String)
+    position = Column(String)  # position group, e.g. 'FW' for 'FWMF'
+    stat = Column(String, nullable=False)
+    value = Column(Float)
+    per90 = Column(Float)
+    percentile = Column(Float)  # percent_rank of value in its (year, comp, position) group, 0 to 1
+    z_score = Column(Float)  # (value - group mean) / group population std
+    source_version = Column(String, nullable=False)  # fingerprint of the year's seasons when built
+
+    player_season = relationship('PlayerSeason')
+
+    # Feature kinds that can be read back with matrix()
+    KINDS = ('value', 'per90', 'percentile', 'z_score')
+
+    @staticmethod
+    def stats():
+        return list(PlayerSeason.stats_columns)
+
+    @classmethod
+    def source_versions(cls):
+        """Content hash of every year's player seasons (the columns a rebuild reads), from one query: {year: version}."""
+        stats = [getattr(PlayerSeason, stat) for stat in cls.stats()]
+        rows = (
+            Session.query(Season.year, PlayerSeason.id, PlayerSeason.player_id, Season.comp, PlayerSeason.pos, *stats)
+            .join(Season, PlayerSeason.season_id == Season.id)
+            .order_by(Season.year, PlayerSeason.id)
+        )
+        return {
+            year: content_hash(row[1:] for row in year_rows)
+            for year, year_rows in groupby(rows, key=lambda row: row[0])
+        }
+
+    @classmethod
+    def stored_versions(cls):
+        return dict(Session.query(cls.year, func.min(cls.source_version)).group_by(cls.year).all())
+
+    @classmethod
+    def refresh(cls, force=False):
+        """
+        Rebuild the years whose seasons changed since they were materialized. Returns the rebuilt years.
+        The fingerprint query is skipped while the database is untouched since the last check.
+        """
+        global _checked
+        if not force and _checked is not None and _checked == change_token():
+            return []
+        current, stored = cls.source_versions(), cls.stored_versions()
+        stale = sorted(year for year, version in current.items() if force or stored.get(year) != version)
+        removed = [year for year in stored if year not in current]
+        if not stale and not removed:
+            _checked = change_token()
+            return []
+
+        if removed:
+            Session.query(cls).filter(cls.year.in_(removed)).delete(synchronize_session=False)
+        for year in stale:
+            cls.rebuild_year(year, current[year])
+        cls._commit()
+        _checked = change_token()
+        return stale
+
+    @classmethod
+    def _year_query(cls, year):
+        """Every stat of the year's seasons in long form, with its percentile in its (comp, position) group."""
+        position = func.substr(func.coalesce(PlayerSeason.pos, ''), 1, 2)
+        long_form = union_all(*[
+            select(
+                PlayerSeason.id.label('player_season_id'),
+                Season.comp.label('comp'),
+                position.label('position'),
+                PlayerSeason.n90s.label('n90s'),
+                literal(stat).label('stat'),
+                cast(func.nullif(getattr(PlayerSeason, stat), ''), Float).label('value'),
+            )
+            .join_from(PlayerSeason, Season, PlayerSeason.season_id == Season.id)
+            .where(Season.year == year)
+            for stat in cls.stats()
+        ]).subquery()
+
+        value = long_form.c.value
+        group = [long_form.c.comp, long_form.c.position, long_form.c.stat]
+        return select(
+            long_form.c.player_season_id, long_form.c.comp, long_form.c.position, long_form.c.stat,
+            value, long_form.c.n90s,
+            # Missing values get their own partition so they don't take up ranks
+            func.percent_rank(type_=Float).over(partition_by=group + [value.is_(None)], order_by=value),
+        )
+
+    @classmethod
+    def rebuild_year(cls, year, source_version):
+        """Replace the year's features (the caller commits)."""
+        rows = Session.execute(cls._year_query(year)).all()
+        Session.query(cls).filter(cls.year == year).delete(synchronize_session=False)
+        if not rows:
+            return 0
+
+        columns = list(zip(*rows))
+        values = np.array(columns[4], dtype=np.float64)
+        n90s = np.array(columns[5], dtype=np.float64)
+
+        # Group mean, then the population variance from the deviations (not E[x^2] - E[x]^2,
+        # which cancels catastrophically for large values with little spread)
+        _, groups = np.unique(np.array([f"{row[1]}\x00{row[2]}\x00{row[3]}" for row in rows]), return_inverse=True)
+        present = ~np.isnan(values)
+        counts = np.bincount(groups, weights=present)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (np.bincount(groups, weights=np.where(present, values, 0.0)) / counts)[groups]
+            deviations = np.where(present, values - means, 0.0)
+            stds = np.sqrt(np.bincount(groups, weights=deviations ** 2) / counts)[groups]
+            per90 = np.where(n90s > 0, values / n90s, np.nan)
+            z_scores = np.where(stds > 0, (values - means) / stds, np.nan)
+
+        def nullable(array):
+            return [None if np.isnan(x) else x for x in array.tolist()]
+
+        per90, z_scores = nullable(per90), nullable(z_scores)
+        return cls.bulk_insert(
+            {
+                'player_season_id': row[0],
+                'year': year,
+                'comp': row[1],
+                'position': row[2],
+                'stat': row[3],
+                'value': row[4],
+                'per90': per90[position],
+                'percentile': row[6] if row[4] is not None else None,
+                'z_score': z_scores[position],
+                'source_version': source_version,
+            }
+            for position, row in enumerate(rows)
+        )
+
+    @classmethod
+    def matrix(cls, player_season_ids, kind='z_score', stats=None):
+        """
+        (len(player_season_ids), len(stats)) matrix of one feature kind, NaN where missing,
+        read from the materialized table (refreshed first if any year is stale).
+        """
+        if kind not in cls.KINDS:
+            raise ValueError(f"Unknown feature kind '{kind}'. Expected one of {list(cls.KINDS)}.")
+        stats = stats or cls.stats()
+        cls.refresh()
+
+        rows = {season_id: position for position, season_id in enumerate(player_season_ids)}
+        stat_columns = {stat: column for column, stat in enumerate(stats)}
+        matrix = np.full((len(player_season_ids), len(stats)), np.nan)
+        query = (
+            Session.query(cls.player_season_id, cls.stat, getattr(cls, kind))
+            .filter(cls.player_season_id.in_(list(rows)), cls.stat.in_(stats))
+        )
+        for season_id, stat, value in query:
+            if value is not None:
+                matrix[rows[season_id], stat_columns[stat]] = value
+        return matrix
+
+    @classmethod
+    def for_season(cls, player_season_id):
+        """{stat: {'value', 'per90', 'percentile', 'z_score'}} of one season."""
+        cls.refresh()
+        return {
+            feature.stat: {kind: getattr(feature, kind) for kind in cls.KINDS}
+            for feature in cls.query().filter(cls.player_season_id == player_season_id)
+        }
@@ -0,0 +1,116 @@
+import numpy as np
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session as OrmSession
+
+from . import Session, change_token
+
+# {player id: PlayerTimeline}, built for every player at once and dropped whenever seasons or injuries change
+_timelines = None
+
+# change_token() when _timelines was built; catches writes from other connections and processes
+_built_at = None
+
+# Tables whose changes invalidate the timelines
+_TRACKED_TABLES = {'player_seasons', 'seasons', 'player_injuries'}
+
+
+class PlayerTimeline:
+    """
+    A player's seasons sorted by (year, id), with the year of their first injury.
+
+    Pre/post windows are bisections on the sorted year array, so no relationship is traversed.
+    """
+
+    def __init__(self, player_id, years, season_ids, first_injury_year=None):
+        self.player_id = player_id
+        self.years = np.asarray(years, dtype=np.int64)
+        self.season_ids = np.asarray(season_ids, dtype=np.int64)
+        self.first_injury_year = first_injury_year
+        self._year_by_season = dict(zip(self.season_ids.tolist(), self.years.tolist()))
+
+    def year_of(self, season_id):
+        return self._year_by_season.get(season_id)
+
+    def before(self, year):
+        """Season ids with a year strictly before ``year``."""
+        return self.season_ids[:np.searchsorted(self.years, year, side='left')].tolist()
+
+    def after(self, year, inclusive=False):
+        """Season ids with a year after ``year`` (or equal to it when ``inclusive``)."""
+        side = 'left' if inclusive else 'right'
+        return self.season_ids[np.searchsorted(self.years, year, side=side):].tolist()
+
+    @classmethod
+    def build_all(cls):
+        """Build every player's timeline with two queries."""
+        from .player_injury import PlayerInjury
+        from .player_season import PlayerSeason
+        from .season import Season
+
+        rows = (
+            Session.query(PlayerSeason.player_id, PlayerSeason.id, Season.year)
+            .join(Season, PlayerSeason.season_id == Season.id)
+            .filter(PlayerSeason.player_id.isnot(None))
+            .order_by(PlayerSeason.player_id, Season.year, PlayerSeason.id)
+            .all()
+        )
+        first_injuries = dict(
+            Session.query(PlayerInjury.player_id, func.min(PlayerInjury.date_of_injury))
+            .filter(PlayerInjury.date_of_injury.isnot(None))
+            .group_by(PlayerInjury.player_id)
+            .all()
+        )
+
+        player_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        season_ids = np.array([row[1] for row in rows], dtype=np.int64)
+        years = np.array([row[2] for row in rows], dtype=np.int64)
+
+        # Rows are sorted by player, so each player's slice starts where the player id changes
+        starts = np.flatnonzero(np.r_[True, player_ids[1:] != player_ids[:-1]]) if len(rows) else []
+        ends = np.r_[starts[1:], len(rows)] if len(rows) else []
+
+        timelines = {}
+        for start, end in zip(starts, ends):
+            player_id = int(player_ids[start])
+            injury_date = first_injuries.get(player_id)
+            timelines[player_id] = cls(
+                player_id, years[start:end], season_ids[start:end],
+                injury_date.year if injury_date else None,
+            )
+
+        # Injured players without any season still get a timeline
+        for player_id, injury_date in first_injuries.items():
+            if player_id not in timelines:
+                timelines[player_id] = cls(player_id, [], [], injury_date.year if injury_date else None)
+        return timelines
+
+    @classmethod
+    def for_player(cls, player_id):
+        global _timelines, _built_at
+        token = change_token()
+        if _timelines is None or (token is not None and token != _built_at):
+            _timelines, _built_at = cls.build_all(), token
+        return _timelines.get(player_id) or cls(player_id, [], [])
+
+    @staticmethod
+    def invalidate():
+        """Drop the cached timelines (writes from other processes are picked up by for_player itself)."""
+        global _timelines
+        _timelines = None
+
+
+@event.listens_for(OrmSession, 'after_flush')
+def _invalidate_on_flush(session, flush_context):
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(getattr(instance, '__tablename__', None) in _TRACKED_TABLES for instance in changed):
+        PlayerTimeline.invalidate()
+
+
+@event.listens_for(OrmSession, 'do_orm_execute')
+def _invalidate_on_bulk_write(orm_execute_state):
+    # Query.update() / Query.delete() and Core bulk inserts / upserts skip the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        table = mapper.local_table if mapper is not None else getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and table.name in _TRACKED_TABLES:
+            PlayerTimeline.invalidate()
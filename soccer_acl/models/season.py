@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer, String
 from sqlalchemy.orm import relationship
 from . import BaseModel
 
 class Season(BaseModel):
     __tablename__ = 'seasons'
+    __table_args__ = (
+        Index('ix_seasons_year_team_comp', 'year', 'team', 'comp', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     year = Column(Integer, nullable=False)
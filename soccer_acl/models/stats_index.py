@@ -0,0 +1,139 @@
+import hashlib
+
+import numpy as np
+from sqlalchemy import Float, Integer, cast, func
+
+
+class SeasonStatsIndex:
+    """
+    Array-backed nearest-neighbour index over the PlayerSeason stats columns.
+
+    Holds one float row per player season (aligned with ``season_ids`` and ``player_uids``)
+    and a KD-tree over those rows, so control lookups never hydrate PlayerSeason objects.
+    """
+
+    def __init__(self, season_ids, player_ids, player_uids, matrix, columns, attributes=None, version=None):
+        self.season_ids = np.asarray(season_ids, dtype=np.int64)
+        self.player_ids = np.asarray(player_ids, dtype=np.int64)
+        self.player_uids = np.asarray(player_uids, dtype=object)
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.columns = list(columns)
+        # Per-row season year, competition, position and age, used for blocking
+        self.attributes = attributes or {}
+        self.version = version
+        self._tree = None
+        self._blocks = {}
+
+    @classmethod
+    def from_db(cls, session, columns, version=None):
+        """Load every player season's stats in a single query, ordered by id."""
+        from .player import Player
+        from .player_season import PlayerSeason
+        from .season import Season
+
+        # NULL or '' count as 0, same as PlayerSeason.safe_convert
+        stat_exprs = [
+            func.coalesce(cast(func.nullif(getattr(PlayerSeason, col), ''), Float), 0.0) for col in columns
+        ]
+        # Unknown years and ages become -1
+        year = func.coalesce(cast(func.nullif(Season.year, ''), Integer), -1)
+        age = func.coalesce(cast(func.nullif(PlayerSeason.age, ''), Integer), -1)
+        rows = (
+            session.query(
+                PlayerSeason.id, Player.id, Player.unique_id, year, Season.comp, PlayerSeason.pos, age,
+                *stat_exprs
+            )
+            .join(Player, PlayerSeason.player_id == Player.id)
+            .outerjoin(Season, PlayerSeason.season_id == Season.id)
+            .order_by(PlayerSeason.id)
+            .all()
+        )
+
+        season_ids = [row[0] for row in rows]
+        player_ids = [row[1] for row in rows]
+        player_uids = [row[2] for row in rows]
+        attributes = {
+            'year': np.array([row[3] for row in rows], dtype=np.int64),
+            'comp': np.array([row[4] or '' for row in rows], dtype=object),
+            'pos': np.array([row[5] or '' for row in rows], dtype=object),
+            'age': np.array([row[6] for row in rows], dtype=np.int64),
+        }
+        matrix = np.array([row[7:] for row in rows], dtype=np.float64).reshape(len(rows), len(columns))
+        return cls(season_ids, player_ids, player_uids, matrix, columns, attributes=attributes, version=version)
+
+    def __len__(self):
+        return len(self.season_ids)
+
+    @property
+    def tree(self):
+        # Built on first query only; most of the cost of the index is here
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+            self._tree = cKDTree(self.matrix)
+        return self._tree
+
+    def blocks(self, scheme):
+        """Candidate blocks for a blocking scheme, computed once per index and scheme."""
+        if scheme.key not in self._blocks:
+            self._blocks[scheme.key] = scheme.partition(self)
+        return self._blocks[scheme.key]
+
+    def fingerprint(self, positions=None):
+        """Content hash of the given rows (all rows by default): ids, owners, stats and block attributes."""
+        positions = np.arange(len(self)) if positions is None else np.asarray(positions, dtype=np.int64)
+        digest = hashlib.sha1()
+        digest.update(self.season_ids[positions].tobytes())
+        digest.update(self.player_ids[positions].tobytes())
+        digest.update(self.matrix[positions].tobytes())
+        for name in sorted(self.attributes):
+            digest.update(repr(self.attributes[name][positions].tolist()).encode())
+        return digest.hexdigest()
+
+    def positions(self, season_ids):
+        """Row positions of the given season ids (ids missing from the index map to -1)."""
+        season_ids = np.asarray(season_ids, dtype=np.int64)
+        if not len(self):
+            return np.full(season_ids.shape, -1)
+        positions = np.searchsorted(self.season_ids, season_ids).clip(max=len(self) - 1)
+        return np.where(self.season_ids[positions] == season_ids, positions, -1)
+
+    def vector(self, season_id):
+        position = self.positions([season_id])[0]
+        return self.matrix[position] if position >= 0 else None
+
+    def nearest(self, vector, top_n=5, exclude_uid=None, exclude_ids=(), candidates=None):
+        """
+        Return the ``top_n`` closest seasons as (season_id, distance) pairs.
+
+        Seasons belonging to ``exclude_uid`` or listed in ``exclude_ids`` are skipped.
+        ``candidates`` restricts the search to those row positions (e.g. one block).
+        """
+        if not len(self):
+            return []
+
+        if candidates is not None:
+            return self._nearest_within(vector, top_n, exclude_uid, exclude_ids, np.asarray(candidates))
+
+        excluded = np.isin(self.season_ids, list(exclude_ids))
+        if exclude_uid is not None:
+            excluded |= self.player_uids == exclude_uid
+
+        # Over-fetch by exactly the number of excluded rows so the filter can't leave us short
+        k = min(top_n + int(excluded.sum()), len(self))
+        distances, positions = self.tree.query(np.asarray(vector, dtype=np.float64), k=k)
+        distances, positions = np.atleast_1d(distances), np.atleast_1d(positions)
+
+        keep = ~excluded[positions]
+        distances, positions = distances[keep][:top_n], positions[keep][:top_n]
+        return list(zip(self.season_ids[positions].tolist(), distances.tolist()))
+
+    def _nearest_within(self, vector, top_n, exclude_uid, exclude_ids, candidates):
+        # Blocks are small, so a brute-force distance pass beats building a tree per block
+        keep = ~np.isin(self.season_ids[candidates], list(exclude_ids))
+        if exclude_uid is not None:
+            keep &= self.player_uids[candidates] != exclude_uid
+        candidates = candidates[keep]
+
+        distances = np.linalg.norm(self.matrix[candidates] - np.asarray(vector, dtype=np.float64), axis=1)
+        order = np.argsort(distances, kind='stable')[:top_n]
+        return list(zip(self.season_ids[candidates[order]].tolist(), distances[order].tolist()))
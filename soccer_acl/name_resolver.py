@@ -0,0 +1,123 @@
+import re
+import unicodedata
+
+from models import Player, Session
+
+# Encodings that UTF-8 text is commonly mis-decoded as ('Dagný' read as Mac Roman is 'Dagn√Ω')
+MOJIBAKE_ENCODINGS = ('mac_roman', 'cp1252')
+
+
+def repair_mojibake(name):
+    """Undo UTF-8 text that was decoded with the wrong codec, e.g. 'Dagn√Ω' -> 'Dagný'."""
+    if name.isascii():
+        return name
+    for encoding in MOJIBAKE_ENCODINGS:
+        try:
+            repaired = name.encode(encoding).decode('utf-8')
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            continue
+        if repaired != name:
+            return repaired
+    return name
+
+
+def normalize_name(name):
+    """
+    Comparable form of a name: mojibake repaired, accents folded, lower case, words separated by
+    single spaces ('Ana-Maria Crnogorčević' -> 'ana-maria crnogorcevic').
+    """
+    name = unicodedata.normalize('NFKD', repair_mojibake(name or ''))
+    name = ''.join(char for char in name if not unicodedata.combining(char)).casefold()
+    return ' '.join(re.findall(r"[^\W_]+(?:['-][^\W_]+)*", name))
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameResolution:
+    """Outcome of resolving a batch of names: {name: player id}, {name: [candidate ids]} and unmatched names."""
+
+    def __init__(self):
+        self.matches = {}
+        self.ambiguous = {}
+        self.unmatched = []
+
+    def players(self):
+        """{name: Player} for the matched names, loaded in one query."""
+        by_id = {player.id: player for player in Player.fetch(*set(self.matches.values()))}
+        return {name: by_id[player_id] for name, player_id in self.matches.items()}
+
+    def report(self):
+        for name, candidates in self.ambiguous.items():
+            print(f"Ambiguous match for {name}: player ids {candidates}. Skipping this entry.")
+        for name in self.unmatched:
+            print(f"No match found for {name}. Skipping this entry.")
+
+
+class NameResolver:
+    """
+    In-memory version of helpers.flexible_name_search for resolving many names at once.
+
+    Every player name is normalized once and indexed by trigram, so the substring lookups
+    flexible_name_search runs as LIKE scans only check the few names sharing the query's trigrams.
+    Resolution follows the same steps: exact name, then a unique player containing the first
+    name, then a unique player containing the first name and last-name initial.
+    """
+
+    def __init__(self, names):
+        """:param names: {player id: name}"""
+        self.names = {player_id: normalize_name(name) for player_id, name in names.items()}
+        self._exact = {}
+        self._trigrams = {}
+        for player_id, name in self.names.items():
+            self._exact.setdefault(name, []).append(player_id)
+            for trigram in trigrams(name):
+                self._trigrams.setdefault(trigram, set()).add(player_id)
+
+    @classmethod
+    def from_db(cls):
+        return cls(dict(Session.query(Player.id, Player.name)))
+
+    def containing(self, text):
+        """Ids of players whose normalized name contains ``text``, sorted."""
+        if len(text) < 3:
+            candidates = self.names
+        else:
+            postings = sorted((self._trigrams.get(trigram, set()) for trigram in trigrams(text)), key=len)
+            candidates = set.intersection(*postings)
+        return sorted(player_id for player_id in candidates if text in self.names[player_id])
+
+    def candidates(self, name):
+        """Player ids a name could refer to; exactly one id means it resolved."""
+        name = normalize_name(name)
+        if not name:
+            return []
+        if name in self._exact:
+            return self._exact[name]
+
+        words = name.split()
+        by_first_name = self.containing(words[0])
+        if len(by_first_name) == 1 or len(words) == 1:
+            return by_first_name
+
+        by_initial = self.containing(f"{words[0]} {words[1][0]}")
+        return by_initial if by_initial else by_first_name
+
+    def resolve(self, name):
+        """The player id of a name, or None when it is unmatched or ambiguous."""
+        candidates = self.candidates(name)
+        return candidates[0] if len(candidates) == 1 else None
+
+    def resolve_all(self, names):
+        """Resolve every name (duplicates once each) and collect the ambiguous and unmatched ones."""
+        resolution = NameResolution()
+        for name in dict.fromkeys(names):
+            candidates = self.candidates(name)
+            if len(candidates) == 1:
+                resolution.matches[name] = candidates[0]
+            elif candidates:
+                resolution.ambiguous[name] = candidates
+            else:
+                resolution.unmatched.append(name)
+        return resolution
@@ -5,9 +5,17 @@ from scipy.stats import norm
 import matplotlib.pyplot as plt
 from scipy.stats import t
 import pandas as pd
-import np
+import numpy as np
 from models import Player, Session
 from helpers import aggregate_stats
+from matching import MATCHERS, MaterializedMatcher, load_matches, make_matcher
+from blocking import BlockingScheme
+from cohort import INJURED, Cohort
+from balance import balance_table
+from diff_in_diff import MODES, align, diff_in_diff
+from stat_aggregator import StatAggregator
+from resampling import player_matrix, resampling_inference
+from event_panel import EventPanel
 import matplotlib.pyplot as plt
 from scipy.stats import ttest_rel
 from scipy.stats import ttest_ind
@@ -16,62 +24,22 @@ import seaborn as sns
 from models.player_injury import PlayerInjury
 
 
-class PlayerStats:
-    def __init__(self, aggregated_stats, std_dev_stats, sample_size):
-        self.aggregated_stats = aggregated_stats
-        self.std_dev_stats = std_dev_stats
-        self.sample_size = sample_size
-
-    @classmethod
-    def from_stats_dict(cls, stats_dict):
-        aggregate = {}
-        counts = {}
-        sum_of_squares = {}
-
-        for player_name, stats in stats_dict.items():
-            if 'shooting_stats' in stats and stats['shooting_stats']:
-                for key, value in stats['shooting_stats'].items():
-                    if key in aggregate:
-                        aggregate[key] += value
-                        counts[key] += 1
-                        sum_of_squares[key] += value**2
-                    else:
-                        aggregate[key] = value
-                        counts[key] = 1
-                        sum_of_squares[key] = value**2
-
-            if 'playing_time_stats' in stats and stats['playing_time_stats']:
-                for key, value in stats['playing_time_stats'].items():
-                    if key in aggregate:
-                        aggregate[key] += value
-                        counts[key] += 1
-                        sum_of_squares[key] += value**2
-                    else:
-                        aggregate[key] = value
-                        counts[key] = 1
-                        sum_of_squares[key] = value**2
-
-        # Calculate the average for each stat
-        for key in aggregate.keys():
-            aggregate[key] /= counts[key]
-
-        # Calculate the standard deviation for each stat
-        std_dev = {}
-        for key in aggregate.keys():
-            mean_square = sum_of_squares[key] / counts[key]
-            square_of_mean = aggregate[key]**2
-            std_dev[key] = (mean_square - square_of_mean)**0.5
-
-        non_empty_stats_keys = [key for key, stats in stats_dict.items() if stats]
-
-        return cls(aggregate, std_dev, len(non_empty_stats_keys))
-
-
-def main():
+def main(matcher=None, injured_cohort=None, resamples=0, processes=None, event_window=0):
+    """
+    Run the injured vs. control difference-in-differences analysis.
+
+    :param matcher: Matcher used to pick control seasons (see matching.MATCHERS); defaults to Euclidean,
+        with matches persisted in the control_matches table.
+    :param injured_cohort: cohort.Cohort of injured players to analyse; defaults to every injured player.
+    :param resamples: bootstrap and permutation replicates to draw (0 skips resampling inference).
+    :param processes: worker processes for the resampling (default: run in this process).
+    :param event_window: seasons on each side of the anchor for the event-time panel (0 skips it).
+    """
     session = Session()
+    matcher = matcher or MaterializedMatcher(make_matcher('euclidean'))
 
     # Step 1: Gather injured players and their pre/post injury seasons
-    injured_players = session.query(Player).filter(Player.injuries.any()).all()
+    injured_players = (injured_cohort or INJURED).load()
     injured_pre_stats = {}
     injured_post_stats = {}
     control_pre_stats = {}
@@ -85,7 +53,7 @@ def main():
         except Exception as e:
             print(f"Error storing fbref stats for {player.name}: {e}")
 
-    control_players = []
+    targets = []
     for player in injured_players:
         print("INJ", player.name)
         # Step 2: Ensure each player has only one set of fbref stats
@@ -116,8 +84,22 @@ def main():
             print(f"No pre-injury seasons found for {player.name}. Skipping player.")
             continue
 
-        # Step 5: Find the control player for the last pre-injury season
-        control_matches = last_pre_injury_season.find_control_matches()
+        targets.append((player, last_pre_injury_season, pre_injury_stats, post_injury_stats))
+
+    # Step 5: Match every last pre-injury season to a distinct control season in one pass
+    raw_matches = matcher.match([season for _, season, _, _ in targets])
+    matches = load_matches(raw_matches)
+
+    # Load injured and control players together (this also refreshes anything expired by a commit)
+    control_player_ids = {season.player_id for seasons in matches.values() for season in seasons}
+    cohort = Player.load_cohort(player_ids=control_player_ids | {player.id for player, _, _, _ in targets})
+
+    # Covariate balance of the matched cohort
+    print(balance_table(raw_matches)[['mean_treated', 'mean_control', 'smd', 'variance_ratio', 'ecdf_max']])
+
+    event_pairs = []  # (injured id, anchor year, control id, anchor year) of every analysed pair
+    for player, last_pre_injury_season, pre_injury_stats, post_injury_stats in targets:
+        control_matches = matches[last_pre_injury_season.id]
         if not control_matches:
             print(f"No control matches found for {player.name}. Skipping player.")
             continue
@@ -149,127 +131,40 @@ def main():
             continue
 
         # Aggregate the stats
+        event_pairs.append((
+            player.id, player.season_year(last_pre_injury_season),
+            control_player.id, control_player.season_year(control_season),
+        ))
         injured_pre_stats[player.name] = pre_injury_stats
         injured_post_stats[player.name] = post_injury_stats
         control_pre_stats[control_player.name] = pre_injury_control_stats
         control_post_stats[control_player.name] = post_injury_control_stats
 
-    # Step 7: Handle missing data and aggregate the stats
-    def aggregate_stats(stats_dict):
-        aggregate = {}
-        counts = {}
-        stat_sumsq = {}  # To calculate variance and standard deviation
-
-        for player_name, stats in stats_dict.items():
-            if 'shooting_stats' in stats and stats['shooting_stats']:
-                for key, value in stats['shooting_stats'].items():
-                    if key in aggregate:
-                        aggregate[key] += value
-                        counts[key] += 1
-                        stat_sumsq[key] += value ** 2
-                    else:
-                        aggregate[key] = value
-                        counts[key] = 1
-                        stat_sumsq[key] = value ** 2
-
-            if 'playing_time_stats' in stats and stats['playing_time_stats']:
-                for key, value in stats['playing_time_stats'].items():
-                    if key in aggregate:
-                        aggregate[key] += value
-                        counts[key] += 1
-                        stat_sumsq[key] += value ** 2
-                    else:
-                        aggregate[key] = value
-                        counts[key] = 1
-                        stat_sumsq[key] = value ** 2
-
-        # Calculate the average for each stat
-        for key in aggregate.keys():
-            aggregate[key] /= counts[key]
-
-        # Calculate the standard deviation for each stat
-        std_devs = {}
-        for key in aggregate.keys():
-            if counts[key] > 1:
-                mean_sumsq = stat_sumsq[key] / counts[key]
-                variance = mean_sumsq - (aggregate[key] ** 2)
-                std_devs[key] = (variance ** 0.5) if variance > 0 else 0.0
-            else:
-                std_devs[key] = None  # Not enough data to calculate standard deviation
-
-        non_empty_stats_keys = [key for key, stats in stats_dict.items() if stats]
-
-        return aggregate, std_devs, len(non_empty_stats_keys)
-
-
-    aggregated_injured_pre, std_dev_injured_pre, injured_pre_counts = aggregate_stats(injured_pre_stats)
-    aggregated_injured_post, std_dev_injured_post, injured_post_counts = aggregate_stats(injured_post_stats)
-    aggregated_control_pre, std_dev_control_pre, control_pre_counts = aggregate_stats(control_pre_stats)
-    aggregated_control_post, std_dev_control_post, control_post_counts = aggregate_stats(control_post_stats)
-
-    # Create PlayerStats objects directly
-    injured_pre_stats = PlayerStats(aggregated_injured_pre, std_dev_injured_pre, injured_pre_counts)
-    injured_post_stats = PlayerStats(aggregated_injured_post, std_dev_injured_post, injured_post_counts)
-    control_pre_stats = PlayerStats(aggregated_control_pre, std_dev_control_pre, control_pre_counts)
-    control_post_stats = PlayerStats(aggregated_control_post, std_dev_control_post, control_post_counts)
-
-    # Step 8: Analyze diff in diff.
-    def analyze_diff_in_diff(injured_pre_stats, injured_post_stats, control_pre_stats, control_post_stats, alt_diff=None):
-        norm_diff_diffs = {}
-        raw_diff_diffs = {}
-        p_values = {}
-        t_statistics = {}
-        
-        for stat in injured_pre_stats.aggregated_stats.keys():
-            if stat in injured_post_stats.aggregated_stats and stat in control_pre_stats.aggregated_stats and stat in control_post_stats.aggregated_stats:
-                # Calculate the differences
-
-                
-                diff_injured = injured_post_stats.aggregated_stats[stat] - injured_pre_stats.aggregated_stats[stat]
-                diff_control = control_post_stats.aggregated_stats[stat] - control_pre_stats.aggregated_stats[stat]
-
-                if alt_diff is 'injured':
-                    diff_in_diff = diff_injured
-                elif alt_diff is 'control':
-                    diff_in_diff = diff_control
-                else:
-                    diff_in_diff = diff_injured - diff_control
-
-                
-                # Store raw difference-in-differences
-                raw_diff_diffs[stat] = diff_in_diff
-                
-                # Calculate pooled standard error
-                se_injured = (injured_pre_stats.std_dev_stats[stat]**2 / injured_pre_stats.sample_size + 
-                            injured_post_stats.std_dev_stats[stat]**2 / injured_post_stats.sample_size)**0.5
-                se_control = (control_pre_stats.std_dev_stats[stat]**2 / control_pre_stats.sample_size + 
-                            control_post_stats.std_dev_stats[stat]**2 / control_post_stats.sample_size)**0.5
-                se_diff_in_diff = (se_injured**2 + se_control**2)**0.5
-                
-                # Normalize using the standard error
-                if se_diff_in_diff != 0:  # Avoid division by zero
-                    normalized_diff_in_diff = diff_in_diff / se_diff_in_diff
-                else:
-                    normalized_diff_in_diff = None  # Handle the case where standard error is zero
-                
-                if normalized_diff_in_diff is not None:
-                    norm_diff_diffs[stat] = normalized_diff_in_diff
-                    
-                    # Calculate degrees of freedom (approximation)
-                    df = (injured_pre_stats.sample_size + injured_post_stats.sample_size + 
-                        control_pre_stats.sample_size + control_post_stats.sample_size - 4)
-                    
-                    # Calculate t-statistic and p-value
-                    t_stat = normalized_diff_in_diff
-                    p_value = 2 * (1 - stats.t.cdf(abs(t_stat), df))
-                    
-                    t_statistics[stat] = t_stat
-                    p_values[stat] = p_value
-        
-        return norm_diff_diffs, raw_diff_diffs, t_statistics, p_values
+    # Step 7: Aggregate the stats of each group (mean, population std and sample size per stat)
+    player_stats = (injured_pre_stats, injured_post_stats, control_pre_stats, control_post_stats)
+    injured_pre_stats = StatAggregator.from_stats_dict(injured_pre_stats)
+    injured_post_stats = StatAggregator.from_stats_dict(injured_post_stats)
+    control_pre_stats = StatAggregator.from_stats_dict(control_pre_stats)
+    control_post_stats = StatAggregator.from_stats_dict(control_post_stats)
+
+    # Step 8: Analyze diff in diff, for every stat and mode at once
+    stat_names, means, stds, sizes = align(injured_pre_stats, injured_post_stats, control_pre_stats, control_post_stats)
+    results = diff_in_diff(stat_names, means, stds, sizes)
+
+    # Bootstrap / permutation inference over the per-player stats, free of the t approximation
+    if resamples:
+        matrices = [player_matrix(group, stat_names) for group in player_stats]
+        inference = resampling_inference(stat_names, *matrices, n_replicates=resamples, processes=processes)
+        print(inference.to_string())
+
+    # Season-by-season view of the same pairs: paired test of the changes and event-study coefficients
+    if event_window:
+        panel = EventPanel.build(event_pairs, window=event_window)
+        print(panel.paired_test().to_string())
+        print(panel.event_study().to_string())
 
     # Step 9: Plot diffs
-    def plot_diff_in_diff(results, p_vals, t_stats, normalized=True, significance_level=0.05, alt_diff=None):
+    def plot_diff_in_diff(results, normalized=True, significance_level=0.05, alt_diff=None):
         # Define a dictionary for human-readable labels and filter out non-performance stats
         stat_labels = {
             "games": "Games Played",
@@ -305,14 +200,14 @@ def main():
             "shots_on_target_per90": "Shots on Target per 90 Minutes"
         }
 
-        # Filter and prepare the stats and values for sorting
-        stats_with_vals = [(stat, results[stat], p_vals[stat], t_stats[stat]) 
-                        for stat in results.keys() if stat in stat_labels]
-        
+        # Filter and prepare the stats and values for sorting; stats without a p-value can't be ranked
+        rows = results[results['stat'].isin(list(stat_labels)) & results['p_value'].notna()]
+        stats_with_vals = list(zip(rows['stat'], rows['normalized' if normalized else 'raw'], rows['p_value'], rows['t_stat']))
+
         # Sort by p-value (smallest p-value first)
         stats_with_vals.sort(key=lambda x: x[2])
         stats_with_vals.reverse()  # Reverse to have smallest p-values at the top
-        
+
         sorted_stats = [stat_labels[stat] for stat, _, _, _ in stats_with_vals]
         sorted_results = [res for _, res, _, _ in stats_with_vals]
         sorted_p_vals = [p for _, _, p, _ in stats_with_vals]
@@ -334,10 +229,10 @@ def main():
         ax.set_yticklabels(y_labels, fontsize=8)  # Adjusted font size for readability
 
         
-        if alt_diff is 'injured':
+        if alt_diff == 'injured':
             ax.set_xlabel("Normalized Difference for Injured Players" if normalized else "Raw Difference for Injured Players")
             ax.set_title(f"{'Normalized' if normalized else 'Raw'} Statistical Changes for Injured Players (Ordered by P-Value)")
-        elif alt_diff is 'control':
+        elif alt_diff == 'control':
             ax.set_xlabel("Normalized Difference for Controls" if normalized else "Raw Difference for Controls")
             ax.set_title(f"{'Normalized' if normalized else 'Raw'} Statistical Changes for Controls (Ordered by P-Value)")
         else:
@@ -359,28 +254,43 @@ def main():
         plt.tight_layout()
         plt.show()
 
-    # # Assuming you have your stats objects defined
-    alt_diff = None
-    results, raw_results, t_stats, p_vals = analyze_diff_in_diff(injured_pre_stats, injured_post_stats, control_pre_stats, control_post_stats, alt_diff=alt_diff)
-
-    # Plot normalized differences
-    plot_diff_in_diff(results, p_vals, t_stats, normalized=True, alt_diff=alt_diff)
-    plot_diff_in_diff(raw_results, p_vals, t_stats, normalized=False, alt_diff=alt_diff)
-
-    alt_diff = 'injured'
-    results, raw_results, t_stats, p_vals = analyze_diff_in_diff(injured_pre_stats, injured_post_stats, control_pre_stats, control_post_stats, alt_diff=alt_diff)
-
-    # Plot normalized differences
-    plot_diff_in_diff(results, p_vals, t_stats, normalized=True, alt_diff=alt_diff)
-    plot_diff_in_diff(raw_results, p_vals, t_stats, normalized=False, alt_diff=alt_diff)
-
-    alt_diff = 'control'
-    results, raw_results, t_stats, p_vals = analyze_diff_in_diff(injured_pre_stats, injured_post_stats, control_pre_stats, control_post_stats, alt_diff=alt_diff)
+    for mode, alt_diff in MODES.items():
+        mode_results = results[results['mode'] == mode]
 
-    # Plot normalized differences
-    plot_diff_in_diff(results, p_vals, t_stats, normalized=True, alt_diff=alt_diff)
-    plot_diff_in_diff(raw_results, p_vals, t_stats, normalized=False, alt_diff=alt_diff)
+        # Plot normalized and raw differences
+        plot_diff_in_diff(mode_results, normalized=True, alt_diff=alt_diff)
+        plot_diff_in_diff(mode_results, normalized=False, alt_diff=alt_diff)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Injured vs. control difference-in-differences analysis.")
+    parser.add_argument('--matcher', choices=sorted(MATCHERS), default='euclidean', help="Control matching engine.")
+    parser.add_argument('--ratio', type=int, default=1, help="Controls matched per injured player.")
+    parser.add_argument('--caliper', type=float, default=None, help="Propensity caliper, in SDs of the logit score.")
+    parser.add_argument('--block-by', nargs='*', default=[], choices=BlockingScheme.KEYS,
+                        help="Only match within blocks sharing these keys.")
+    parser.add_argument('--recompute', action='store_true', help="Ignore stored control matches and recompute all.")
+    parser.add_argument('--snapshot', metavar='DIR', help="Memory-map the stats index from a snapshot.py export.")
+    parser.add_argument('--cohort', metavar='FILE', help="YAML / JSON cohort spec of the injured players (see cohort.py).")
+    parser.add_argument('--resamples', type=int, default=0, help="Bootstrap / permutation replicates (0: skip).")
+    parser.add_argument('--processes', type=int, default=None, help="Worker processes for the resampling.")
+    parser.add_argument('--event-window', type=int, default=0,
+                        help="Seasons around the anchor for the paired event-time analysis (0: skip).")
+    args = parser.parse_args()
+    if args.caliper is not None and args.matcher != 'propensity':
+        parser.error("--caliper only applies to --matcher propensity.")
+
+    if args.snapshot:
+        from snapshot import Snapshot
+        Snapshot.load(args.snapshot).install()
+
+    options = {'ratio': args.ratio, 'blocking': BlockingScheme(args.block_by) if args.block_by else None}
+    if args.matcher == 'propensity':
+        options['caliper'] = args.caliper
+    injured_cohort = Cohort.from_file(args.cohort) if args.cohort else None
+    main(
+        MaterializedMatcher(make_matcher(args.matcher, **options), force=args.recompute), injured_cohort,
+        resamples=args.resamples, processes=args.processes, event_window=args.event_window,
+    )
\ No newline at end of file
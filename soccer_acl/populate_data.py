@@ -1,12 +1,33 @@
 import csv
 import os
-from models import Player, Season, PlayerSeason, Session
+from itertools import islice
+from models import Player, Season, PlayerSeason, Session, unit_of_work
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import exc as orm_exc
 
 # Define the path to the CSV file
 csv_file_path = os.path.join(os.path.dirname(__file__), 'data/control_1.csv')
 
+# Rows read, written and committed together
+CHUNK_SIZE = 5000
+
+# PlayerSeason column: (CSV column, type)
+PLAYER_SEASON_FIELDS = {
+    'age': ('Age', int),
+    'gls': ('Gls', int),
+    'mp': ('MP', int),
+    'min': ('Min', int),
+    'n90s': ('90s', float),
+    'starts': ('Starts', int),
+    'subs': ('Subs', int),
+    'unsub': ('unSub', int),
+    'ast': ('Ast', int),
+    'g_a': ('G+A', int),
+    'g_pk': ('G-PK', int),
+    'pk': ('PK', int),
+    'pk_att': ('PKatt', int),
+    'pk_m': ('PKm', int),
+}
+
 def safe_convert(value, target_type, default=None):
     """Safely convert values to the target type, returning a default if conversion fails."""
     try:
@@ -14,74 +35,88 @@ def safe_convert(value, target_type, default=None):
     except ValueError:
         return default
 
-# Function to read the CSV and populate the database
-def populate_data(csv_file_path):
-    try:
-        with open(csv_file_path, mode='r') as file:
-            reader = csv.DictReader(file)
-            with Session.no_autoflush:
-                for row in reader:
-                    # Process each row in the CSV
+def read_chunks(csv_file_path, chunk_size=CHUNK_SIZE):
+    """Stream the CSV as lists of at most ``chunk_size`` rows."""
+    with open(csv_file_path, mode='r') as file:
+        reader = csv.DictReader(file)
+        while True:
+            chunk = list(islice(reader, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+def season_key(row):
+    return safe_convert(row['Season'].strip(), int), row['Team'].strip(), row['Comp'].strip()
 
-                    # Check if the player already exists in the database
-                    player = Session.query(Player).filter_by(name=row['Player'], unique_id=row['-9999']).first()
-                    if not player:
-                        player = Player(
-                            name=row['Player'].strip(),
-                            nation=row['Nation'].strip(),
-                            unique_id=row['-9999'].strip()
-                        )
-                        Session.add(player)
-                        Session.commit()  # Commit after adding the player to get the ID
+def load_chunk(chunk, player_ids, season_ids):
+    """
+    Write one chunk: new players and seasons first, then every player season upserted on
+    (player, season), so rows that are already loaded are overwritten rather than duplicated.
+    ``player_ids`` ({unique_id: id}) and ``season_ids`` ({(year, team, comp): id}) are updated in place.
+    """
+    # A season can't be keyed without its year
+    chunk = [row for row in chunk if season_key(row)[0] is not None]
 
-                    # Check if the season already exists in the database
-                    season = Session.query(Season).filter_by(year=row['Season'].strip(), team=row['Team'].strip(), comp=row['Comp'].strip()).first()
-                    if not season:
-                        season = Season(
-                            year=row['Season'].strip(),
-                            comp=row['Comp'].strip(),
-                            team=row['Team'].strip()
-                        )
-                        Session.add(season)
-                        Session.commit()  # Commit after adding the season to get the ID
+    new_players = {}
+    new_seasons = {}
+    for row in chunk:
+        unique_id = row['-9999'].strip()
+        if unique_id not in player_ids:
+            new_players.setdefault(unique_id, {
+                'name': row['Player'].strip(), 'nation': row['Nation'].strip(), 'unique_id': unique_id,
+            })
+        key = season_key(row)
+        if key not in season_ids:
+            new_seasons.setdefault(key, dict(zip(('year', 'team', 'comp'), key)))
 
-                    # Create a PlayerSeason record
-                    player_season = PlayerSeason(
-                        player_id=player.id,
-                        season_id=season.id,
-                        age=safe_convert(row['Age'], int),
-                        gls=safe_convert(row['Gls'], int),
-                        mp=safe_convert(row['MP'], int),
-                        min=safe_convert(row['Min'], int),
-                        n90s=safe_convert(row['90s'], float),
-                        starts=safe_convert(row['Starts'], int),
-                        subs=safe_convert(row['Subs'], int),
-                        unsub=safe_convert(row['unSub'], int),
-                        ast=safe_convert(row['Ast'], int),
-                        g_a=safe_convert(row['G+A'], int),
-                        g_pk=safe_convert(row['G-PK'], int),
-                        pk=safe_convert(row['PK'], int),
-                        pk_att=safe_convert(row['PKatt'], int),
-                        pk_m=safe_convert(row['PKm'], int),
-                        pos=row['Pos'].strip(),
-                        player_code=row['-9999'].strip()
-                    )
-                    Session.add(player_season)
+    if new_players:
+        Player.bulk_upsert(new_players.values(), index_elements=('unique_id',), update_columns=())
+        player_ids.update(Session.query(Player.unique_id, Player.id).filter(Player.unique_id.in_(list(new_players))))
+    if new_seasons:
+        Season.bulk_upsert(new_seasons.values(), index_elements=('year', 'team', 'comp'), update_columns=())
+        years = {year for year, _, _ in new_seasons}
+        season_ids.update(
+            ((year, team, comp), season_id)
+            for season_id, year, team, comp in Session.query(Season.id, Season.year, Season.team, Season.comp)
+            .filter(Season.year.in_(list(years)))
+        )
+
+    player_seasons = [
+        dict(
+            player_id=player_ids[row['-9999'].strip()],
+            season_id=season_ids[season_key(row)],
+            pos=row['Pos'].strip(),
+            player_code=row['-9999'].strip(),
+            **{column: safe_convert(row[field], target_type) for column, (field, target_type) in PLAYER_SEASON_FIELDS.items()}
+        )
+        for row in chunk
+    ]
+    PlayerSeason.bulk_upsert(player_seasons, index_elements=('player_id', 'season_id'))
+    return len(player_seasons)
+
+# Function to read the CSV and populate the database
+def populate_data(csv_file_path, chunk_size=CHUNK_SIZE):
+    try:
+        # Key maps loaded once, then extended with whatever each chunk inserts
+        player_ids = dict(Session.query(Player.unique_id, Player.id))
+        season_ids = {
+            (year, team, comp): season_id
+            for season_id, year, team, comp in Session.query(Season.id, Season.year, Season.team, Season.comp)
+        }
 
-            # Commit all player seasons at once
-            Session.commit()
+        total = 0
+        for chunk in read_chunks(csv_file_path, chunk_size):
+            # One transaction per chunk
+            with unit_of_work():
+                total += load_chunk(chunk, player_ids, season_ids)
+        print(f"Loaded {total} player seasons.")
 
     except FileNotFoundError:
         print(f"Error: The file {csv_file_path} was not found.")
-    except orm_exc.FlushError as e:
-        print(f"Flush error occurred: {str(e)}")
-        Session.rollback()  # Rollback in case of flush error
     except SQLAlchemyError as e:
         print(f"Database error occurred: {str(e)}")
-        Session.rollback()  # Rollback in case of SQLAlchemy error
     except Exception as e:
         print(f"An unexpected error occurred: {str(e)}")
-        Session.rollback()  # Rollback in case of unexpected error
     finally:
         Session.close()  # Close the session
 
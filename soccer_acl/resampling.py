@@ -0,0 +1,145 @@
+"""
+Bootstrap and label-permutation inference for the injured vs. control difference-in-differences.
+
+Replicates are drawn as NumPy index matrices and turned into (replicates, players) weight
+matrices, so every replicate's group means for every stat come out of one matrix product.
+Replicates are generated in chunks, each with its own child of one SeedSequence, so the
+result for a given seed is the same whether the chunks run in this process or a pool.
+"""
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from stat_aggregator import STATS_TABLES
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def player_matrix(stats_dict, columns, tables=STATS_TABLES):
+    """
+    (players, len(columns)) matrix of a {player: collect_fbref_stats_multiple() dict}, in dict
+    order, NaN where a player lacks a stat. A stat in several tables takes its first table's value.
+    """
+    rows = []
+    for stats in stats_dict.values():
+        merged = {}
+        for table in tables:
+            for column, value in ((stats or {}).get(table) or {}).items():
+                merged.setdefault(column, value)
+        rows.append([np.nan if merged.get(column) is None else merged[column] for column in columns])
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(columns))
+
+
+def _weighted_means(weights, values):
+    """Per-replicate nan-means: (replicates, players) weights @ (players, stats) values."""
+    present = ~np.isnan(values)
+    sums = weights @ np.where(present, values, 0.0)
+    counts = weights @ present.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _diff_in_diff(injured_weights, control_weights, injured, control):
+    """Difference-in-differences per replicate and stat; ``injured`` / ``control`` are (pre, post) pairs."""
+    injured_change = _weighted_means(injured_weights, injured[1]) - _weighted_means(injured_weights, injured[0])
+    control_change = _weighted_means(control_weights, control[1]) - _weighted_means(control_weights, control[0])
+    return injured_change - control_change
+
+
+def _counts(indices, size):
+    """Turn a (replicates, draws) index matrix into (replicates, size) draw counts."""
+    offsets = indices + size * np.arange(len(indices))[:, None]
+    return np.bincount(offsets.ravel(), minlength=len(indices) * size).reshape(len(indices), size).astype(np.float64)
+
+
+def _replicates(kind, injured, control, seed, size):
+    """One chunk of ``size`` bootstrap or permutation replicates, (size, stats)."""
+    rng = np.random.default_rng(seed)
+    n_injured, n_control = len(injured[0]), len(control[0])
+
+    if kind == 'bootstrap':
+        # Players are resampled with replacement within their group, keeping each player's pre/post pair
+        injured_weights = _counts(rng.integers(0, n_injured, (size, n_injured)), n_injured)
+        control_weights = _counts(rng.integers(0, n_control, (size, n_control)), n_control)
+        return _diff_in_diff(injured_weights, control_weights, injured, control)
+
+    # Shuffle the injured / control labels over the pooled players
+    pooled = tuple(np.vstack([injured[period], control[period]]) for period in (0, 1))
+    order = rng.permuted(np.tile(np.arange(n_injured + n_control), (size, 1)), axis=1)
+    injured_weights = np.zeros((size, n_injured + n_control))
+    np.put_along_axis(injured_weights, order[:, :n_injured], 1.0, axis=1)
+    return _diff_in_diff(injured_weights, 1.0 - injured_weights, pooled, pooled)
+
+
+def replicates(kind, injured_pre, injured_post, control_pre, control_post,
+               n_replicates=10000, seed=None, chunk_size=DEFAULT_CHUNK_SIZE, processes=None):
+    """
+    (n_replicates, stats) matrix of 'bootstrap' or 'permutation' difference-in-differences.
+
+    :param injured_pre: ... control_post: (players, stats) matrices; rows of pre and post pair up.
+    :param seed: int or SeedSequence; each chunk draws from its own spawned child.
+    :param processes: spread the chunks over a process pool of this size (default: run here).
+    """
+    if kind not in ('bootstrap', 'permutation'):
+        raise ValueError(f"Unknown resampling '{kind}'. Expected 'bootstrap' or 'permutation'.")
+    injured = (np.asarray(injured_pre, dtype=np.float64), np.asarray(injured_post, dtype=np.float64))
+    control = (np.asarray(control_pre, dtype=np.float64), np.asarray(control_post, dtype=np.float64))
+
+    sizes = [min(chunk_size, n_replicates - start) for start in range(0, n_replicates, chunk_size)]
+    seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seeds = seed.spawn(len(sizes))
+    arguments = [(kind, injured, control, child, size) for child, size in zip(seeds, sizes)]
+
+    if processes and processes > 1 and len(arguments) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunks = list(pool.map(_replicates, *zip(*arguments)))
+    else:
+        chunks = [_replicates(*chunk) for chunk in arguments]
+    return np.vstack(chunks) if chunks else np.empty((0, injured[0].shape[1]))
+
+
+def resampling_inference(stats, injured_pre, injured_post, control_pre, control_post,
+                         n_replicates=10000, confidence=0.95, seed=None,
+                         chunk_size=DEFAULT_CHUNK_SIZE, processes=None):
+    """
+    Bootstrap standard errors and percentile intervals plus permutation p-values of the
+    difference-in-differences of every stat.
+
+    :return: DataFrame with one row per stat: estimate, bootstrap se, ci_lower / ci_upper,
+        bootstrap_p (two-sided, from the share of replicates on either side of 0) and
+        permutation_p ((1 + replicates at least as extreme) / (1 + n_replicates)).
+    """
+    groups = tuple(np.asarray(group, dtype=np.float64) for group in (injured_pre, injured_post, control_pre, control_post))
+    seeds = np.random.SeedSequence(seed).spawn(2)
+    options = {'n_replicates': n_replicates, 'chunk_size': chunk_size, 'processes': processes}
+
+    identity = (np.ones((1, len(injured_pre))), np.ones((1, len(control_pre))))
+    estimate = _diff_in_diff(*identity, groups[:2], groups[2:])[0]
+    boot = replicates('bootstrap', *groups, seed=seeds[0], **options)
+    permuted = replicates('permutation', *groups, seed=seeds[1], **options)
+
+    alpha = (1 - confidence) / 2
+    valid = (~np.isnan(boot)).sum(axis=0)
+    # Stats with no usable values are all-NaN columns; they come out as NaN
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        below = np.where(valid > 0, (boot <= 0).sum(axis=0) / valid, np.nan)
+        above = np.where(valid > 0, (boot >= 0).sum(axis=0) / valid, np.nan)
+        se = np.nanstd(boot, axis=0, ddof=1)
+        ci_lower, ci_upper = np.nanquantile(boot, [alpha, 1 - alpha], axis=0)
+
+        # The tolerance keeps relabelings that reproduce the observed split from missing by rounding
+        extreme = (np.abs(permuted) >= np.abs(estimate) * (1 - 1e-9)).sum(axis=0)
+        permutation_p = (1 + extreme) / (1 + (~np.isnan(permuted)).sum(axis=0))
+
+    return pd.DataFrame({
+        'stat': list(stats),
+        'estimate': estimate,
+        'se': se,
+        'ci_lower': ci_lower,
+        'ci_upper': ci_upper,
+        'bootstrap_p': np.minimum(1.0, 2 * np.minimum(below, above)),
+        'permutation_p': np.where(np.isnan(estimate), np.nan, permutation_p),
+    })
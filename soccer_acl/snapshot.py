@@ -0,0 +1,187 @@
+"""
+Columnar, memory-mappable snapshot of the data the analyses read.
+
+    python snapshot.py export data/snapshot
+
+writes one .npy file per column plus a manifest.json. Snapshot.load() maps the arrays
+read-only (np.load(mmap_mode='r')), so loading is instant and processes reading the same
+snapshot share one page-cached copy. Strings are stored as fixed-width unicode so every
+array can be mapped.
+"""
+import json
+import os
+
+import numpy as np
+from sqlalchemy import Float, cast, func
+
+from models import FbrefSeasonStat, Player, PlayerInjury, PlayerSeason, Season, Session
+from models.fbref_season_stat import TABLE_STATS
+from models.stats_index import SeasonStatsIndex
+
+FORMAT_VERSION = 1
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'snapshot')
+
+# Every fbref stat column, in a fixed order
+FBREF_STATS = list(dict.fromkeys(stat for stats in TABLE_STATS.values() for stat in stats))
+
+
+def _strings(values):
+    return np.array([value or '' for value in values], dtype=str)
+
+
+def _dates(values):
+    return np.array([value if value is not None else 'NaT' for value in values], dtype='datetime64[D]')
+
+
+def _versions():
+    """Content hashes of the exported tables; the seasons entry matches PlayerSeason.stats_index()."""
+    return {
+        'seasons': [PlayerSeason.current_data_version(), Player.current_data_version(), Season.current_data_version()],
+        'injuries': PlayerInjury.current_data_version(),
+        'fbref': FbrefSeasonStat.current_data_version(),
+    }
+
+
+def _as_tuples(value):
+    # JSON turns the version tuples into lists
+    if isinstance(value, dict):
+        return {key: _as_tuples(item) for key, item in value.items()}
+    return tuple(_as_tuples(item) for item in value) if isinstance(value, (list, tuple)) else value
+
+
+def export_snapshot(directory=DEFAULT_DIRECTORY):
+    """Write the snapshot with one query per table. Returns the manifest."""
+    arrays = {}
+
+    players = Session.query(Player.id, Player.unique_id, Player.name, Player.nation).order_by(Player.id).all()
+    arrays['players.id'] = np.array([row[0] for row in players], dtype=np.int64)
+    arrays['players.unique_id'] = _strings(row[1] for row in players)
+    arrays['players.name'] = _strings(row[2] for row in players)
+    arrays['players.nation'] = _strings(row[3] for row in players)
+
+    # Same rows and values as SeasonStatsIndex.from_db
+    index = SeasonStatsIndex.from_db(Session(), PlayerSeason.stats_columns)
+    arrays['seasons.id'] = index.season_ids
+    arrays['seasons.player_id'] = index.player_ids
+    arrays['seasons.player_uid'] = _strings(index.player_uids)
+    arrays['seasons.stats'] = index.matrix
+    for name, values in index.attributes.items():
+        arrays[f'seasons.{name}'] = values if values.dtype != object else _strings(values)
+
+    injuries = (
+        Session.query(PlayerInjury.id, PlayerInjury.player_id, PlayerInjury.date_of_injury, PlayerInjury.return_date)
+        .order_by(PlayerInjury.id)
+        .all()
+    )
+    arrays['injuries.id'] = np.array([row[0] for row in injuries], dtype=np.int64)
+    arrays['injuries.player_id'] = np.array([row[1] for row in injuries], dtype=np.int64)
+    arrays['injuries.date_of_injury'] = _dates(row[2] for row in injuries)
+    arrays['injuries.return_date'] = _dates(row[3] for row in injuries)
+
+    # Parsed fbref rows, from their typed table; NULL cells are NaN
+    fbref = (
+        Session.query(
+            FbrefSeasonStat.player_id, FbrefSeasonStat.stats_table,
+            func.coalesce(FbrefSeasonStat.year, -1), func.coalesce(FbrefSeasonStat.age, -1),
+            *[cast(getattr(FbrefSeasonStat, stat), Float) for stat in FBREF_STATS]
+        )
+        .order_by(FbrefSeasonStat.player_id, FbrefSeasonStat.stats_table, FbrefSeasonStat.row_number)
+        .all()
+    )
+    arrays['fbref.player_id'] = np.array([row[0] for row in fbref], dtype=np.int64)
+    arrays['fbref.stats_table'] = _strings(row[1] for row in fbref)
+    arrays['fbref.year'] = np.array([row[2] for row in fbref], dtype=np.int64)
+    arrays['fbref.age'] = np.array([row[3] for row in fbref], dtype=np.int64)
+    arrays['fbref.stats'] = np.array(
+        [[np.nan if value is None else value for value in row[4:]] for row in fbref], dtype=np.float64
+    ).reshape(len(fbref), len(FBREF_STATS))
+
+    os.makedirs(directory, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(values))
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'arrays': sorted(arrays),
+        'columns': {'seasons.stats': list(index.columns), 'fbref.stats': FBREF_STATS},
+        'versions': _versions(),
+    }
+    with open(os.path.join(directory, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+class Snapshot:
+    """
+    A loaded snapshot. Arrays are read-only memory maps, accessed by name
+    (``snapshot['seasons.stats']``) or grouped by table (``snapshot.table('injuries')``).
+    """
+
+    def __init__(self, directory, manifest, arrays):
+        self.directory = directory
+        self.manifest = manifest
+        self.arrays = arrays
+
+    @classmethod
+    def load(cls, directory=DEFAULT_DIRECTORY, mmap_mode='r'):
+        with open(os.path.join(directory, 'manifest.json')) as file:
+            manifest = json.load(file)
+        if manifest.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Snapshot in {directory} has format {manifest.get('format')}, expected {FORMAT_VERSION}.")
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in manifest['arrays']
+        }
+        return cls(directory, manifest, arrays)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def table(self, table):
+        """{column: array} of one table, e.g. table('players')."""
+        prefix = f'{table}.'
+        return {name[len(prefix):]: values for name, values in self.arrays.items() if name.startswith(prefix)}
+
+    def columns(self, name):
+        return self.manifest['columns'][name]
+
+    @property
+    def stats_index_version(self):
+        return _as_tuples(self.manifest['versions']['seasons'])
+
+    def is_current(self):
+        """True when none of the exported tables changed since the export (hashed again only after a write)."""
+        return _as_tuples(self.manifest['versions']) == _as_tuples(_versions())
+
+    def stats_index(self):
+        """A SeasonStatsIndex over the mapped arrays; the stats matrix is not copied."""
+        seasons = self.table('seasons')
+        attributes = {
+            name: values.astype(object) if values.dtype.kind == 'U' else values
+            for name, values in seasons.items()
+            if name in ('year', 'comp', 'pos', 'age')
+        }
+        return SeasonStatsIndex(
+            seasons['id'], seasons['player_id'], seasons['player_uid'].astype(object), seasons['stats'],
+            self.columns('seasons.stats'), attributes=attributes, version=self.stats_index_version,
+        )
+
+    def install(self):
+        """
+        Serve PlayerSeason.stats_index() (and so every matcher) from this snapshot while the
+        database still matches it; once it changes the index is rebuilt from the DB as usual.
+        """
+        PlayerSeason.use_stats_index(self.stats_index())
+        return self
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a memory-mappable snapshot of the analysis data.")
+    parser.add_argument('command', choices=['export'])
+    parser.add_argument('directory', nargs='?', default=DEFAULT_DIRECTORY)
+    args = parser.parse_args()
+
+    manifest = export_snapshot(args.directory)
+    print(f"Wrote {len(manifest['arrays'])} arrays to {args.directory}.")
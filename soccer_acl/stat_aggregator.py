@@ -0,0 +1,129 @@
+"""
+Streaming mean / variance per stat name (Welford's update, Chan et al.'s merge).
+
+Aggregators take batches of rows and can be merged, so partial aggregates built in
+other processes combine into the same result as one pass over all the rows.
+"""
+import numpy as np
+
+# Stat tables of a collect_fbref_stats_multiple() dict, in the order they are aggregated
+STATS_TABLES = ('shooting_stats', 'playing_time_stats')
+
+
+class StatAggregator:
+    """
+    Count, mean and sum of squared deviations (M2) of every stat seen, stored as arrays in
+    ``columns`` order (first appearance). NaN / None values are skipped.
+
+    ``sample_size`` is the number of samples (players) fed in, whether or not they had every stat.
+    ``aggregated_stats``, ``std_dev_stats`` and ``sample_size`` are what diff_in_diff.align reads.
+    """
+
+    def __init__(self, columns=()):
+        self.columns = []
+        self._positions = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.sample_size = 0
+        self._positions_of(columns)
+
+    def _positions_of(self, columns):
+        """Array positions of ``columns``, adding any new ones."""
+        new = [column for column in dict.fromkeys(columns) if column not in self._positions]
+        if new:
+            self._positions.update((column, len(self.columns) + offset) for offset, column in enumerate(new))
+            self.columns.extend(new)
+            self.count = np.concatenate([self.count, np.zeros(len(new), dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros(len(new))])
+            self.m2 = np.concatenate([self.m2, np.zeros(len(new))])
+        return np.array([self._positions[column] for column in columns], dtype=np.int64)
+
+    def _combine(self, positions, count, mean, m2):
+        """Chan's parallel update of the given columns with another (count, mean, M2) summary."""
+        count_a, mean_a = self.count[positions], self.mean[positions]
+        total = count_a + count
+        delta = mean - mean_a
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(total > 0, count / total, 0.0)
+        self.mean[positions] = mean_a + delta * share
+        self.m2[positions] += m2 + delta ** 2 * count_a * share
+        self.count[positions] = total
+
+    def update_batch(self, matrix, columns, samples=None):
+        """
+        Add a batch of rows: ``matrix`` is (rows, len(columns)) with NaN for missing values.
+        ``samples`` is how much to add to sample_size (default: the number of rows).
+        """
+        matrix = np.asarray(matrix, dtype=np.float64).reshape(len(matrix), len(columns))
+        present = ~np.isnan(matrix)
+        count = present.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, np.where(present, matrix, 0.0).sum(axis=0) / count, 0.0)
+        m2 = np.where(present, (matrix - mean) ** 2, 0.0).sum(axis=0)
+
+        self._combine(self._positions_of(list(columns)), count, mean, m2)
+        self.sample_size += len(matrix) if samples is None else samples
+        return self
+
+    def update(self, values):
+        """Add one {stat: value} row."""
+        columns = list(values)
+        row = [np.nan if values[column] is None else values[column] for column in columns]
+        return self.update_batch([row], columns)
+
+    def merge(self, other):
+        """Fold another aggregator (e.g. from a worker process) into this one."""
+        self._combine(self._positions_of(other.columns), other.count, other.mean, other.m2)
+        self.sample_size += other.sample_size
+        return self
+
+    @classmethod
+    def combine(cls, aggregators):
+        combined = cls()
+        for aggregator in aggregators:
+            combined.merge(aggregator)
+        return combined
+
+    @classmethod
+    def from_stats_dict(cls, stats_dict, tables=STATS_TABLES):
+        """
+        Aggregate {player: collect_fbref_stats_multiple() dict} over the stats of ``tables``.
+        A stat present in several tables counts once per table; sample_size counts the players
+        with any stats dict.
+        """
+        players = [stats for stats in stats_dict.values() if stats]
+        # Columns in order of first appearance, player by player
+        aggregator = cls(dict.fromkeys(
+            column for stats in players for table in tables for column in (stats.get(table) or ())
+        ))
+        for table in tables:
+            rows = [stats[table] for stats in players if stats.get(table)]
+            columns = list(dict.fromkeys(column for row in rows for column in row))
+            matrix = np.array(
+                [[np.nan if row.get(column) is None else row[column] for column in columns] for row in rows],
+                dtype=np.float64,
+            )
+            aggregator.update_batch(matrix, columns, samples=0)
+        aggregator.sample_size = len(players)
+        return aggregator
+
+    def variance(self, ddof=0):
+        """Per-column variance (population by default); NaN with fewer than two values."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.count >= 2, self.m2 / (self.count - ddof), np.nan)
+
+    def std(self, ddof=0):
+        return np.sqrt(self.variance(ddof))
+
+    @property
+    def aggregated_stats(self):
+        """{stat: mean} of the stats with at least one value."""
+        return {column: mean for column, mean, count in zip(self.columns, self.mean.tolist(), self.count) if count}
+
+    @property
+    def std_dev_stats(self):
+        """{stat: population std}, NaN for stats with fewer than two values."""
+        return {
+            column: std for column, std, count in zip(self.columns, self.std().tolist(), self.count) if count
+        }
@@ -0,0 +1,174 @@
+"""
+Return-to-play survival curves over PlayerInjury.
+
+Time runs from ``date_of_injury`` to ``return_date``; injuries without a return date are
+censored at ``as_of`` (today by default). Curves are Kaplan–Meier estimates with Greenwood
+standard errors, computed for every stratum at once with NumPy cumulative sums.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from models import PlayerInjury, Session
+
+# Injury table snapshot for the current data version and censoring date
+_durations = None
+
+
+class InjuryDurations:
+    """
+    Time to return, event flag and the PlayerInjury columns of every dated injury, as arrays.
+
+    ``durations`` are in days; ``observed`` is False for censored injuries (no return yet).
+    ``columns`` holds every other PlayerInjury column (position, mechanism, ...) for stratifying.
+    """
+
+    def __init__(self, durations, observed, columns, version=None):
+        self.durations = np.asarray(durations, dtype=np.float64)
+        self.observed = np.asarray(observed, dtype=bool)
+        self.columns = columns
+        self.version = version
+
+    def __len__(self):
+        return len(self.durations)
+
+    @classmethod
+    def from_db(cls, as_of=None, version=None):
+        """Load every injury with one query."""
+        as_of = as_of or datetime.date.today()
+        table = PlayerInjury.__table__
+        rows = Session.execute(
+            table.select().where(table.c.date_of_injury.isnot(None)).order_by(table.c.id)
+        ).all()
+
+        names = list(table.columns.keys())
+        columns = {name: np.array([row[position] for row in rows], dtype=object) for position, name in enumerate(names)}
+        injured = columns['date_of_injury'].astype('datetime64[D]')
+        returned = columns['return_date']
+        observed = np.array([value is not None for value in returned], dtype=bool)
+        ends = np.where(observed, returned, as_of).astype('datetime64[D]')
+        durations = (ends - injured).astype(np.float64)
+
+        # A return recorded before the injury is a data error, not a duration
+        valid = durations >= 0
+        columns = {name: values[valid] for name, values in columns.items()}
+        return cls(durations[valid], observed[valid], columns, version=version)
+
+    @classmethod
+    def current(cls, as_of=None):
+        """Durations for the current injury table, cached until it changes."""
+        global _durations
+        as_of = as_of or datetime.date.today()
+        version = (PlayerInjury.current_data_version(), as_of)
+        if _durations is None or _durations.version != version:
+            _durations = cls.from_db(as_of=as_of, version=version)
+        return _durations
+
+    def subset(self, mask):
+        return InjuryDurations(
+            self.durations[mask], self.observed[mask],
+            {name: values[mask] for name, values in self.columns.items()}, version=self.version,
+        )
+
+    def for_players(self, player_ids):
+        """Injuries of the given players, e.g. cohort.Cohort(...).ids()."""
+        return self.subset(np.isin(self.columns['player_id'].astype(np.int64), list(player_ids)))
+
+
+def kaplan_meier(durations, observed, strata=None):
+    """
+    Kaplan–Meier survival curves for every stratum in one vectorized pass.
+
+    :param durations: time to event or censoring for each subject.
+    :param observed: True where the event (return to play) was observed, False if censored.
+    :param strata: optional label per subject; one curve is estimated per distinct label.
+    :return: DataFrame with one row per (stratum, distinct time): subjects at risk, events,
+        censored, survival, Greenwood standard error and a 95% log(-log) confidence interval.
+    """
+    durations = np.asarray(durations, dtype=np.float64)
+    observed = np.asarray(observed, dtype=bool)
+    strata = np.full(len(durations), 'all', dtype=object) if strata is None else np.asarray(strata, dtype=object)
+    labels, codes = np.unique(strata.astype(str), return_inverse=True)
+
+    # One row per distinct (stratum, time), in time order within each stratum
+    order = np.lexsort((durations, codes))
+    codes, times, events = codes[order], durations[order], observed[order]
+    boundary = np.ones(len(order), dtype=bool)
+    boundary[1:] = (codes[1:] != codes[:-1]) | (times[1:] != times[:-1])
+    starts = np.flatnonzero(boundary)
+    codes, times = codes[starts], times[starts]
+    removed = np.diff(np.r_[starts, len(order)])
+    deaths = np.add.reduceat(events.astype(np.float64), starts) if len(starts) else np.zeros(0)
+
+    # Running sums restart at every stratum: subtract the total reached before the stratum began
+    boundary = np.ones(len(codes), dtype=bool)
+    boundary[1:] = codes[1:] != codes[:-1]
+    first = np.flatnonzero(boundary)
+    stratum_start = np.repeat(first, np.diff(np.r_[first, len(codes)]))
+
+    def cumsum_by_stratum(values):
+        totals = np.cumsum(values)
+        offsets = np.r_[0.0, totals][stratum_start]
+        return totals - offsets
+
+    removed_before = cumsum_by_stratum(removed) - removed
+    sizes = np.bincount(codes, weights=removed)[codes]
+    at_risk = sizes - removed_before
+
+    # Once everyone left at risk has the event survival is 0 for the rest of the stratum;
+    # those terms are kept out of the sums (an infinity would leak into the next stratum's offset)
+    exhausted = deaths == at_risk
+    ended = cumsum_by_stratum(exhausted) > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        survival = np.where(ended, 0.0, np.exp(cumsum_by_stratum(np.where(exhausted, 0.0, np.log1p(-deaths / at_risk)))))
+        greenwood = cumsum_by_stratum(np.where(exhausted, 0.0, deaths / (at_risk * (at_risk - deaths))))
+        greenwood[ended] = np.nan
+        std_err = survival * np.sqrt(greenwood)
+
+        # log(-log S) interval stays inside [0, 1]
+        log_log_se = np.sqrt(greenwood) / np.abs(np.log(survival))
+        exponent = np.exp(1.959963984540054 * log_log_se)
+        ci_lower = survival ** exponent
+        ci_upper = survival ** (1 / exponent)
+
+    return pd.DataFrame({
+        'stratum': labels[codes],
+        'time': times,
+        'at_risk': at_risk.astype(np.int64),
+        'events': deaths.astype(np.int64),
+        'censored': (removed - deaths).astype(np.int64),
+        'survival': survival,
+        'std_err': std_err,
+        'ci_lower': ci_lower,
+        'ci_upper': ci_upper,
+    })
+
+
+def median_survival(curves):
+    """Per-stratum median time to return (first time survival drops to 0.5 or below; NaN if never)."""
+    reached = curves[curves['survival'] <= 0.5].groupby('stratum')['time'].min()
+    return reached.reindex(curves['stratum'].unique())
+
+
+def return_to_play(by=None, player_ids=None, as_of=None):
+    """
+    Return-to-play curves over the injury table, optionally stratified by PlayerInjury columns
+    (e.g. by=['mechanism', 'position']) and restricted to some players.
+    """
+    data = InjuryDurations.current(as_of=as_of)
+    if player_ids is not None:
+        data = data.for_players(player_ids)
+
+    strata = None
+    if by:
+        by = [by] if isinstance(by, str) else list(by)
+        for name in by:
+            if name not in data.columns:
+                raise ValueError(f"Unknown injury column '{name}'. Expected one of {sorted(data.columns)}.")
+        strata = np.array(
+            [', '.join(f"{name}={value}" for name, value in zip(by, values))
+             for values in zip(*(data.columns[name] for name in by))],
+            dtype=object,
+        ) if len(data) else np.zeros(0, dtype=object)
+    return kaplan_meier(data.durations, data.observed, strata)
@@ -0,0 +1,11 @@
+import pytest
+
+from models import Session, init_db
+
+
+@pytest.fixture
+def db():
+    """A fresh in-memory database with every table, bound to the models for one test."""
+    init_db('sqlite://', create_tables=True)
+    yield Session
+    Session.remove()
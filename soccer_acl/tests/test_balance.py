@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from balance import balance_statistics
+
+
+def test_balance_statistics():
+    treated = np.array([[1.0, 5.0], [2.0, np.nan], [3.0, 5.0]])
+    control = np.array([[2.0, np.nan], [3.0, np.nan], [4.0, np.nan]])
+
+    table = balance_statistics(treated, control, ['gls', 'xg'])
+    gls = table.loc['gls']
+    assert (gls['mean_treated'], gls['mean_control']) == (2.0, 3.0)
+    assert gls['smd'] == pytest.approx(-1 / np.sqrt(2 / 3))
+    assert gls['variance_ratio'] == pytest.approx(1.0)
+    assert gls['ecdf_mean'] == pytest.approx(0.25)
+    assert gls['ecdf_max'] == pytest.approx(1 / 3)
+
+    # A covariate the controls never have gives NaN diagnostics, not an error
+    assert table.loc['xg', 'weight_treated'] == 2 and table.loc['xg', 'weight_control'] == 0
+    assert np.isnan(table.loc['xg', 'mean_control'])
+
+
+def test_control_weights():
+    treated = np.array([[1.0], [1.0]])
+    control = np.array([[0.0], [2.0], [4.0]])
+
+    table = balance_statistics(treated, control, ['gls'], control_weights=[1.0, 0.5, 0.5])
+    assert table.loc['gls', 'mean_control'] == pytest.approx(1.5)
+    assert table.loc['gls', 'weight_control'] == pytest.approx(2.0)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from blocking import BlockingScheme, position_group
+from models import Player, PlayerSeason, Season
+from models.stats_index import SeasonStatsIndex
+
+
+def make_index():
+    attributes = {
+        'year': np.array([2019, 2019, 2020, 2019, 2019]),
+        'comp': np.array(['NWSL'] * 5, dtype=object),
+        'pos': np.array(['FW', 'FWMF', 'FW', 'MF', 'DF'], dtype=object),
+        'age': np.array([24, 26, 25, -1, 29]),
+    }
+    matrix = np.arange(10, dtype=np.float64).reshape(5, 2)
+    return SeasonStatsIndex([1, 2, 3, 4, 5], [1, 2, 3, 4, 5], list('abcde'), matrix, ['gls', 'mp'], attributes=attributes)
+
+
+def test_partition_by_year_and_position():
+    index = make_index()
+    blocks = index.blocks(BlockingScheme(('year', 'position')))
+
+    members = {blocks.label(code): blocks.members(code).tolist() for code in range(len(blocks))}
+    assert members == {(2019, 'DF'): [4], (2019, 'FW'): [0, 1], (2019, 'MF'): [3], (2020, 'FW'): [2]}
+    assert index.blocks(BlockingScheme(('year', 'position'))) is blocks  # cached per scheme
+
+
+def test_age_bands_keep_unknown_ages_apart():
+    blocks = make_index().blocks(BlockingScheme(('age_band',), age_band_width=3))
+    assert sorted(blocks.labels) == [(-1,), (24,), (27,)]
+
+
+def test_scheme_validation():
+    assert position_group('FWMF') == 'FW' and position_group(None) == ''
+    with pytest.raises(ValueError, match='Unknown blocking keys'):
+        BlockingScheme(('team',))
+
+
+def test_position_edits_move_seasons_between_blocks(db):
+    db.add_all([Player(id=player_id, name=f"Player {player_id}", unique_id=str(player_id)) for player_id in (1, 2, 3)])
+    db.add_all([
+        Season(id=1, year=2019, team='Thorns', comp='NWSL'),
+        PlayerSeason(id=1, player_id=1, season_id=1, pos='FW'),
+        PlayerSeason(id=2, player_id=2, season_id=1, pos='FW'),
+        PlayerSeason(id=3, player_id=3, season_id=1, pos='DF'),
+    ])
+    db.commit()
+    scheme = BlockingScheme(('year', 'position'))
+
+    def block_of(season_id):
+        index = PlayerSeason.stats_index()
+        blocks = index.blocks(scheme)
+        code = blocks.codes[index.positions([season_id])[0]]
+        return blocks.label(code), index.season_ids[blocks.members(code)].tolist()
+
+    assert block_of(2) == ((2019, 'FW'), [1, 2])
+
+    db.get(PlayerSeason, 2).pos = 'DF'
+    db.commit()
+    assert block_of(2) == ((2019, 'DF'), [2, 3])
+    assert block_of(1) == ((2019, 'FW'), [1])
@@ -0,0 +1,68 @@
+import datetime
+
+import pytest
+
+import cohort as cohort_module
+from cohort import Cohort
+from models import Player, PlayerInjury, PlayerSeason, Season
+
+
+@pytest.fixture
+def players(db):
+    db.add_all([
+        Player(id=1, name='Sam Kerr', nation='AUS'),
+        Player(id=2, name='Lindsey Horan', nation='USA'),
+        Player(id=3, name='Rose Lavelle', nation='USA'),
+        Player(id=4, name='Christine Sinclair', nation='CAN'),
+        Season(id=1, year=2015, team='Thorns', comp='NWSL'),
+        Season(id=2, year=2018, team='Thorns', comp='NWSL'),
+        PlayerSeason(player_id=2, season_id=2, pos='MF'),
+        PlayerSeason(player_id=3, season_id=1, pos='MF'),
+        PlayerSeason(player_id=4, season_id=2, pos='FW'),
+        PlayerInjury(player_id=2, date_of_injury=datetime.date(2019, 5, 1), mechanism=0),
+        PlayerInjury(player_id=3, date_of_injury=datetime.date(2019, 5, 1), mechanism=1),
+        PlayerInjury(player_id=4, date_of_injury=datetime.date(2019, 5, 1), mechanism=0, activity_type=3),
+    ])
+    db.commit()
+
+
+def test_cohort_compiles_every_section(players):
+    cohort = Cohort({
+        'players': {'nation': ['USA', 'CAN']},
+        'injuries': {'mechanism': 0},
+        'seasons': {'year': {'gte': 2016}},
+        'exclude': {'injuries': {'activity_type': 3}},
+    })
+    assert cohort.ids() == [2]
+    assert len(cohort) == 1
+
+
+def test_cohort_true_false_and_refine(players):
+    assert Cohort({'injuries': False}).ids() == [1]
+    assert Cohort({'injuries': True}).ids() == [2, 3, 4]
+    assert Cohort({'players': {'nation': 'USA'}}).refine(injuries={'mechanism': 1}).ids() == [3]
+    assert Cohort({'seasons': {'pos': {'like': 'F%'}}}).ids() == [4]
+
+
+def test_cohort_rejects_unknown_fields():
+    with pytest.raises(ValueError, match='Unknown cohort field'):
+        Cohort({'players': {'height': 170}})
+    with pytest.raises(ValueError, match='Unknown operator'):
+        Cohort({'players': {'nation': {'near': 'USA'}}})
+    with pytest.raises(ValueError, match='Unknown cohort sections'):
+        Cohort({'teams': {}})
+
+
+def test_cohort_ids_follow_same_length_edits(players):
+    cohort = Cohort({'players': {'nation': 'USA'}, 'injuries': True})
+    assert cohort.ids() == [2, 3]
+
+    Player.update(3, nation='CAN')
+    assert cohort.ids() == [2]
+    assert Cohort({'players': {'nation': 'USA'}, 'injuries': True}).ids() == [2]
+
+    # A spec keeps one cache entry, whatever the number of versions it has seen
+    entries = len(cohort_module._cohort_ids)
+    Player.update(2, nation='MEX')
+    assert cohort.ids() == []
+    assert len(cohort_module._cohort_ids) == entries
@@ -0,0 +1,57 @@
+import pytest
+
+from blocking import BlockingScheme
+from matching import EuclideanMatcher, MaterializedMatcher
+from models import ControlMatch, Player, PlayerSeason, Season, unit_of_work
+
+
+@pytest.fixture
+def seasons(db):
+    db.add_all([Player(id=player_id, name=f"Player {player_id}", unique_id=str(player_id)) for player_id in range(1, 5)])
+    db.add_all([
+        Season(id=1, year=2019, team='Thorns', comp='NWSL'),
+        Season(id=2, year=2020, team='Thorns', comp='NWSL'),
+        PlayerSeason(id=1, player_id=1, season_id=1, gls=10, pos='FW'),
+        PlayerSeason(id=2, player_id=2, season_id=1, gls=9, pos='FW'),
+        PlayerSeason(id=3, player_id=3, season_id=1, gls=2, pos='FW'),
+        PlayerSeason(id=4, player_id=1, season_id=2, gls=5, pos='FW'),
+        PlayerSeason(id=5, player_id=4, season_id=2, gls=6, pos='FW'),
+    ])
+    db.commit()
+    return [db.get(PlayerSeason, 1), db.get(PlayerSeason, 4)]
+
+
+def test_only_targets_whose_block_changed_are_recomputed(db, seasons):
+    matcher = MaterializedMatcher(EuclideanMatcher(blocking=BlockingScheme(('year',))))
+
+    matches = matcher.match(seasons)
+    assert {target: [control for control, _ in pairs] for target, pairs in matches.items()} == {1: [2], 4: [5]}
+    assert matcher.recomputed == [1, 4]
+    assert db.query(ControlMatch).count() == 2
+
+    assert matcher.match(seasons) == matches
+    assert matcher.recomputed == []
+
+    db.get(PlayerSeason, 3).gls = 8
+    db.commit()
+    matcher.match(seasons)
+    assert matcher.recomputed == [1]
+
+
+def test_store_joins_the_enclosing_unit_of_work(db, seasons):
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            ControlMatch.store({1: [(2, 1.0)]}, {1: 'v'}, '{}')
+            raise RuntimeError
+    assert db.query(ControlMatch).count() == 0
+
+
+def test_a_control_position_edit_recomputes_its_block(db, seasons):
+    matcher = MaterializedMatcher(EuclideanMatcher(blocking=BlockingScheme(('year', 'position'))))
+    assert matcher.match(seasons)[1][0][0] == 2
+
+    db.get(PlayerSeason, 2).pos = 'MF'
+    db.commit()
+    matches = matcher.match(seasons)
+    assert matcher.recomputed == [1]
+    assert matches[1][0][0] == 3
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from scipy import stats as scipy_stats
+
+from diff_in_diff import MODES, align, diff_in_diff
+from stat_aggregator import StatAggregator
+
+
+def test_diff_in_diff_every_mode():
+    means = np.array([[1.0, 10.0], [3.0, 10.0], [1.0, 5.0], [2.0, 5.0]])
+    stds = np.array([[1.0, 0.0], [2.0, 0.0], [1.0, 0.0], [2.0, 0.0]])
+    sizes = np.array([10, 10, 20, 20])
+
+    results = diff_in_diff(['goals', 'games'], means, stds, sizes).set_index(['mode', 'stat'])
+    assert list(results.index.get_level_values('mode').unique()) == list(MODES)
+    assert results.loc[('diff_in_diff', 'goals'), 'raw'] == pytest.approx(1.0)
+    assert results.loc[('injured', 'goals'), 'raw'] == pytest.approx(2.0)
+    assert results.loc[('control', 'goals'), 'raw'] == pytest.approx(1.0)
+
+    se = np.sqrt(1 / 10 + 4 / 10 + 1 / 20 + 4 / 20)
+    row = results.loc[('diff_in_diff', 'goals')]
+    assert row['se'] == pytest.approx(se)
+    assert row['t_stat'] == pytest.approx(1.0 / se)
+    assert row['p_value'] == pytest.approx(2 * scipy_stats.t.sf(1.0 / se, 56))
+    assert row['df'] == 56
+
+    # No spread: nothing to normalize by
+    assert np.isnan(results.loc[('diff_in_diff', 'games'), 'normalized'])
+
+
+def test_align_keeps_stats_present_in_every_group():
+    groups = [
+        StatAggregator().update_batch([[1.0, 2.0], [3.0, 4.0]], ['goals', 'shots']),
+        StatAggregator().update_batch([[2.0], [4.0]], ['goals']),
+        StatAggregator().update_batch([[1.0, 0.0]], ['goals', 'shots']),
+        StatAggregator().update_batch([[5.0, 1.0], [7.0, 1.0]], ['goals', 'shots']),
+    ]
+    stats, means, stds, sizes = align(*groups)
+
+    assert stats == ['goals']
+    assert means[:, 0].tolist() == [2.0, 3.0, 1.0, 6.0]
+    assert np.isnan(stds[2, 0])  # a single value has no standard deviation
+    assert sizes.tolist() == [2, 2, 1, 2]
@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pytest
+
+from event_panel import EventPanel
+from models import FbrefPlayerStats, FbrefSeasonStat, Player, get_engine
+
+
+def shooting(goals_by_season):
+    return json.dumps([{'season': season, 'goals': goals} for season, goals in goals_by_season.items()])
+
+
+@pytest.fixture
+def fbref(db):
+    goals = {
+        1: {'2018': '10', '2019': '10', '2020': '4'},
+        2: {'2018': '5', '2019': '6', '2020': '6'},
+        3: {'2017': '8', '2018': '9'},
+        4: {'2016': '3', '2017': '3', '2018': '5'},
+    }
+    db.add_all([Player(id=player_id, name=f"Player {player_id}") for player_id in goals])
+    db.add_all([
+        FbrefPlayerStats(id=player_id, player_id=player_id, shooting_stats=shooting(by_season))
+        for player_id, by_season in goals.items()
+    ])
+    db.commit()
+    with get_engine().begin() as connection:
+        FbrefSeasonStat.backfill(connection)
+
+
+def test_panel_lines_seasons_up_on_the_anchors(fbref):
+    panel = EventPanel.build([(1, 2019, 2, 2019), (3, 2017, 4, 2017)], window=1, stats=['goals'])
+
+    assert panel.relative.tolist() == [-1, 0, 1]
+    assert panel.values[0, :, :, 0].tolist() == [[10, 10, 4], [5, 6, 6]]
+    assert panel.values[1, 1, :, 0].tolist() == [3, 3, 5]
+    assert np.isnan(panel.values[1, 0, 0, 0]) and not panel.mask[1, 0, 0]
+
+    # Player 3 has no pre season inside the window, so only the first pair is tested (controls average both)
+    test = panel.paired_test().iloc[0]
+    assert (test['injured_change'], test['control_change'], test['diff_in_diff'], test['pairs']) == (-6, 1.5, -7, 1)
+
+    study = panel.event_study().set_index('relative_season')
+    assert study.loc[0, 'coefficient'] == 0
+    assert study.loc[1, 'coefficient'] == pytest.approx(((4 - 6) - (10 - 6) + (9 - 5) - (8 - 3)) / 2)
+
+
+def test_missing_fbref_rows_raise(db):
+    with pytest.raises(ValueError, match='migration 9'):
+        EventPanel.build([(1, 2019, 2, 2019)])
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from models import FbrefPlayerStats, FbrefSeasonStat, Player, get_engine
+
+
+def shooting(*rows):
+    return json.dumps([dict(zip(('season', 'team', 'goals', 'shots'), row)) for row in rows])
+
+
+@pytest.fixture
+def fbref(db):
+    db.add_all([
+        Player(id=1, name='Sam Kerr'),
+        Player(id=2, name='Rose Lavelle'),
+        FbrefPlayerStats(id=1, player_id=1, shooting_stats=shooting(('2018', 'Red Stars', '16', '60'), ('2019', 'Red Stars', '18', ''), ('2020', 'Chelsea', '1', '10'))),
+        FbrefPlayerStats(id=2, player_id=2, shooting_stats=shooting(('2019', 'Reign', '3', '20'))),
+        # A later record of the same player: ignored everywhere, as Player.fbref_stats[0] is
+        FbrefPlayerStats(id=3, player_id=1, shooting_stats=shooting(('2019', 'Red Stars', '100', '100'))),
+    ])
+    db.commit()
+    with get_engine().begin() as connection:
+        assert FbrefSeasonStat.backfill(connection) == 5
+        assert FbrefSeasonStat.backfill(connection) == 5  # rebuilds rather than duplicates
+
+
+def test_backfill_types_the_rows(db, fbref):
+    row = db.query(FbrefSeasonStat).filter_by(fbref_player_stats_id=1, row_number=1).one()
+    assert (row.year, row.team, row.goals, row.shots) == (2019, 'Red Stars', 18.0, None)
+
+
+def test_averages_use_each_players_first_record(fbref):
+    averages = FbrefSeasonStat.averages('shooting', start_year=2018, end_year=2019)
+    assert averages[1]['goals'] == 17.0
+    assert averages[1]['shots'] == 60.0  # the blank 2019 cell is skipped, not counted as 0
+    assert averages[2]['goals'] == 3.0
+
+    split = FbrefSeasonStat.split_averages('shooting', {1: 2019})
+    assert (split[1]['pre']['goals'], split[1]['pre']['shots'], split[1]['post']['goals']) == (16.0, 60.0, 1.0)
+
+
+def test_player_season_averages_count_blanks_as_zero(fbref, db):
+    parsed = db.get(Player, 1).fbref_stats[0].parsed()
+    assert parsed.season_averages('shooting_stats', ['2018', '2019']) == {'goals': 17.0, 'shots': 30.0}
@@ -0,0 +1,23 @@
+import numpy as np
+
+from helpers import average_stats, parse_stat, stat_matrix
+from models.fbref_player_stats import ParsedFbrefStats
+
+
+def test_stat_matrix_and_average_stats():
+    assert [parse_stat(cell) for cell in ('1,936', '+0.88', '-7', '', 'Chelsea')] == [1936.0, 0.88, -7.0, None, None]
+
+    matrix, columns = stat_matrix([{'goals': '3', 'shots': ''}, {'goals': '1', 'shots': '10'}])
+    assert columns == ['goals', 'shots']
+    assert np.isnan(matrix[0, 1])
+    assert average_stats(matrix, columns) == {'goals': 2.0, 'shots': 5.0}
+    assert average_stats(matrix, columns, fill_value=np.nan)['goals'] == 2.0
+
+
+def test_parsed_stats_only_keep_numeric_columns():
+    rows = [{'season': '2019', 'age': '26', 'team': 'Red Stars', 'comp_level': '1. NWSL', 'goals': '18', 'xg': '15.2'}]
+    parsed = ParsedFbrefStats(None, rows, [])
+
+    assert parsed.matrices['shooting_stats'][1] == ['goals', 'xg']
+    assert parsed.season_averages('shooting_stats', ['2019']) == {'goals': 18.0, 'xg': 15.2}
+    assert parsed.season_averages('playing_time_stats', ['2019']) == {}
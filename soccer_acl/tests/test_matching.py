@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from matching import assign_without_replacement, nearest_by_score
+
+
+def test_assign_without_replacement_minimises_total_cost():
+    costs = np.array([[1.0, 2.0, 9.0], [1.5, 9.0, 9.0]])
+    forbidden = np.zeros_like(costs, dtype=bool)
+
+    # Greedy would give target 0 column 0 (cost 1); the optimum moves it to column 1
+    assert assign_without_replacement(costs, forbidden) == [[(1, 2.0)], [(0, 1.5)]]
+
+
+def test_assign_without_replacement_uses_each_candidate_once():
+    costs = np.array([[1.0, 2.0, 3.0, 4.0], [1.0, 2.0, 3.0, 4.0]])
+    forbidden = np.zeros_like(costs, dtype=bool)
+
+    assignments = assign_without_replacement(costs, forbidden, ratio=2)
+    columns = [column for assigned in assignments for column, _ in assigned]
+    assert sorted(columns) == [0, 1, 2, 3]
+    assert all(len(assigned) == 2 for assigned in assignments)
+
+
+def test_assign_without_replacement_drops_forbidden_pairs():
+    costs = np.array([[1.0, 2.0], [1.0, 2.0]])
+    forbidden = np.array([[False, True], [False, True]])
+
+    # Only one target can have column 0; the other is left unmatched rather than forced
+    assignments = assign_without_replacement(costs, forbidden)
+    assert sorted(len(assigned) for assigned in assignments) == [0, 1]
+
+
+def test_nearest_by_score_serves_the_closest_pairs_first():
+    targets = np.array([0.50, 0.56])
+    candidates = np.array([0.55, 0.20])
+
+    # 0.56 claims 0.55 (distance 0.01) before 0.50 can (0.05), leaving 0.50 the far candidate
+    assignments = nearest_by_score(targets, candidates)
+    assert [[column for column, _ in assigned] for assigned in assignments] == [[1], [0]]
+    assert assignments[0][0][1] == pytest.approx(0.30)
+
+
+def test_nearest_by_score_respects_the_caliper_and_ratio():
+    targets = np.array([0.50, 0.90])
+    candidates = np.array([0.48, 0.53, 0.10, 0.47])
+
+    assignments = nearest_by_score(targets, candidates, ratio=2, caliper=0.05)
+    assert [column for column, _ in assignments[0]] == [0, 3]
+    assert assignments[1] == []
@@ -0,0 +1,29 @@
+from sqlalchemy import inspect, text
+
+from migrations import dedupe_player_seasons
+from models import get_engine
+
+
+def test_dedupe_player_seasons(db):
+    with get_engine().begin() as connection:
+        # The schema before migration 7 had no unique (player_id, season_id) index
+        connection.execute(text('DROP INDEX ix_player_seasons_player_season'))
+        connection.execute(text("INSERT INTO players (id, name) VALUES (1, 'Sam Kerr')"))
+        connection.execute(text("INSERT INTO seasons (id, year, team, comp) VALUES (1, 2019, 'Red Stars', 'NWSL')"))
+        connection.execute(text(
+            "INSERT INTO player_seasons (id, player_id, season_id, gls, ast) VALUES "
+            "(1, 1, 1, 18, ''), (2, 1, 1, 18, NULL), (3, 1, 1, 18, '')"
+        ))
+        connection.execute(text(
+            "INSERT INTO control_matches (target_season_id, control_season_id, rank, matcher_config, data_version) "
+            "VALUES (1, 2, 0, '{}', 'v'), (1, 1, 0, '{}', 'v')"
+        ))
+
+    with get_engine().begin() as connection:
+        dedupe_player_seasons(connection)
+        dedupe_player_seasons(connection)  # safe to re-run
+
+        assert connection.execute(text('SELECT id, gls, ast FROM player_seasons')).all() == [(1, 18, None)]
+        assert connection.execute(text('SELECT control_season_id FROM control_matches')).scalars().all() == [1]
+        indexes = {index['name']: index['unique'] for index in inspect(connection).get_indexes('player_seasons')}
+        assert indexes['ix_player_seasons_player_season']
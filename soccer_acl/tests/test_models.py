@@ -0,0 +1,54 @@
+import pytest
+
+from models import Player, PlayerSeason, Season, unit_of_work
+
+
+def add_players(db, count):
+    Player.bulk_insert({'id': player_id, 'name': f"Player {player_id}"} for player_id in range(1, count + 1))
+
+
+def test_find_each_pages_in_id_order(db):
+    add_players(db, 7)
+
+    assert [player.id for player in Player.find_each(batch_size=3)] == list(range(1, 8))
+
+    # The caller's ordering would break keyset paging; it is replaced by id
+    query = db.query(Player).filter(Player.id > 2).order_by(Player.name.desc())
+    assert [player.id for player in Player.find_each(batch_size=2, query=query)] == [3, 4, 5, 6, 7]
+
+
+def test_bulk_upsert_resolves_conflicts(db):
+    db.add(Season(id=1, year=2019, team='Thorns', comp='NWSL'))
+    add_players(db, 2)
+    PlayerSeason.bulk_insert([{'id': 1, 'player_id': 1, 'season_id': 1, 'gls': 3}])
+
+    rows = [{'player_id': 1, 'season_id': 1, 'gls': 5}, {'player_id': 2, 'season_id': 1, 'gls': 1}]
+    assert PlayerSeason.bulk_upsert(rows, index_elements=('player_id', 'season_id')) == 2
+    assert db.query(PlayerSeason.id, PlayerSeason.player_id, PlayerSeason.gls).order_by(PlayerSeason.id).all() == [
+        (1, 1, 5), (2, 2, 1),
+    ]
+
+    # update_columns=() keeps the existing rows as they are
+    PlayerSeason.bulk_upsert([{'player_id': 1, 'season_id': 1, 'gls': 9}], index_elements=('player_id', 'season_id'),
+                             update_columns=())
+    assert db.get(PlayerSeason, 1).gls == 5
+
+    PlayerSeason.bulk_update_by_id([{'id': 1, 'gls': 7}, {'id': 2, 'gls': 8}])
+    db.expire_all()
+    assert [season.gls for season in db.query(PlayerSeason).order_by(PlayerSeason.id)] == [7, 8]
+
+
+def test_unit_of_work_commits_once_and_rolls_back_on_error(db):
+    with unit_of_work():
+        Player(name='Sam Kerr').save()
+        with unit_of_work():
+            Player(name='Rose Lavelle').save()
+    assert db.query(Player).count() == 2
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            Player(name='Lindsey Horan').save()
+            Player.bulk_insert([{'name': 'Mallory Swanson'}])
+            raise RuntimeError
+    db.expire_all()
+    assert sorted(name for name, in db.query(Player.name)) == ['Rose Lavelle', 'Sam Kerr']
@@ -0,0 +1,26 @@
+from models import Player
+from name_resolver import NameResolver, normalize_name, repair_mojibake
+
+
+def test_repair_mojibake():
+    assert repair_mojibake('Dagn√Ω Brynjarsd√≥ttir') == 'Dagný Brynjarsdóttir'  # read as Mac Roman
+    assert repair_mojibake('DagnÃ½') == 'Dagný'  # read as cp1252
+    assert repair_mojibake('Dagný') == 'Dagný'
+    assert normalize_name('Ana-Maria  Crnogorčević') == 'ana-maria crnogorcevic'
+
+
+def test_resolves_mojibake_and_reports_ambiguous_names(db):
+    db.add_all([
+        Player(id=1, name='Dagný Brynjarsdóttir'),
+        Player(id=2, name='Sam Kerr'),
+        Player(id=3, name='Sam Mewis'),
+    ])
+    db.commit()
+
+    resolver = NameResolver.from_db()
+    resolution = resolver.resolve_all(['Dagn√Ω Brynjarsd√≥ttir', 'Sam K', 'Sam', 'Nobody Here'])
+
+    assert resolution.matches == {'Dagn√Ω Brynjarsd√≥ttir': 1, 'Sam K': 2}
+    assert resolution.ambiguous == {'Sam': [2, 3]}
+    assert resolution.unmatched == ['Nobody Here']
+    assert resolver.resolve('Sam') is None
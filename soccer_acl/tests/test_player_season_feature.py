@@ -0,0 +1,58 @@
+import warnings
+
+import numpy as np
+import pytest
+from sqlalchemy.exc import SAWarning
+
+from models import Player, PlayerSeason, PlayerSeasonFeature, Season
+
+
+@pytest.fixture
+def seasons(db):
+    db.add_all([Player(id=player_id, name=f"Player {player_id}") for player_id in range(1, 5)])
+    db.add_all([
+        Season(id=1, year=2019, team='Thorns', comp='NWSL'),
+        # Large values with a small spread: E[x^2] - E[x]^2 would cancel to noise
+        PlayerSeason(id=1, player_id=1, season_id=1, pos='FW', min=100_000_001, n90s=10.0),
+        PlayerSeason(id=2, player_id=2, season_id=1, pos='FWMF', min=100_000_002, n90s=20.0),
+        PlayerSeason(id=3, player_id=3, season_id=1, pos='FW', min=100_000_003, n90s=0.0),
+        PlayerSeason(id=4, player_id=4, season_id=1, pos='DF', min=5, n90s=1.0),
+    ])
+    db.commit()
+
+
+def test_features_are_relative_to_the_position_group(seasons):
+    features = PlayerSeasonFeature.for_season(1)['min']
+    assert features['percentile'] == 0.0
+    assert features['z_score'] == pytest.approx(-np.sqrt(1.5))
+    assert features['per90'] == pytest.approx(10_000_000.1)
+
+    matrix = PlayerSeasonFeature.matrix([2, 3, 4], kind='z_score', stats=['min'])
+    assert matrix[:, 0][:2] == pytest.approx([0.0, np.sqrt(1.5)])
+    assert np.isnan(matrix[2, 0])  # alone in its group: no spread
+    assert np.isnan(PlayerSeasonFeature.matrix([3], kind='per90', stats=['min'])[0, 0])
+
+
+def test_refresh_only_rebuilds_after_a_change(db, seasons):
+    assert PlayerSeasonFeature.refresh() == [2019]
+    assert PlayerSeasonFeature.refresh() == []
+
+    db.get(PlayerSeason, 4).min = 6
+    db.commit()
+    assert PlayerSeasonFeature.refresh() == [2019]
+    assert PlayerSeasonFeature.for_season(4)['min']['value'] == 6
+
+
+def test_a_position_change_rebuilds_the_year(db, seasons):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', SAWarning)  # e.g. percent_rank read back as a Decimal
+        PlayerSeasonFeature.refresh()
+
+        db.get(PlayerSeason, 3).pos = 'DF'
+        db.commit()
+        assert PlayerSeasonFeature.refresh() == [2019]
+
+    features = db.query(PlayerSeasonFeature).filter_by(player_season_id=3, stat='min').one()
+    assert features.position == 'DF'
+    assert features.percentile == 1.0
+    assert PlayerSeasonFeature.for_season(1)['min']['z_score'] == pytest.approx(-1.0)
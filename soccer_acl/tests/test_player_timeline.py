@@ -0,0 +1,65 @@
+import datetime
+import sqlite3
+
+from models import Player, PlayerInjury, PlayerSeason, Season, Session, init_db
+from models.player_timeline import PlayerTimeline
+
+
+def test_windows_around_the_first_injury(db):
+    db.add_all([
+        Player(id=1, name='Sam Kerr'),
+        Season(id=1, year=2018, team='Red Stars', comp='NWSL'),
+        Season(id=2, year=2019, team='Red Stars', comp='NWSL'),
+        Season(id=3, year=2020, team='Chelsea', comp='WSL'),
+        PlayerSeason(id=10, player_id=1, season_id=3),
+        PlayerSeason(id=11, player_id=1, season_id=1),
+        PlayerSeason(id=12, player_id=1, season_id=2),
+        PlayerInjury(player_id=1, date_of_injury=datetime.date(2021, 1, 5)),
+        PlayerInjury(player_id=1, date_of_injury=datetime.date(2019, 6, 1)),
+    ])
+    db.commit()
+
+    timeline = PlayerTimeline.for_player(1)
+    assert timeline.first_injury_year == 2019
+    assert timeline.before(2019) == [11]
+    assert timeline.after(2019) == [10]
+    assert timeline.after(2019, inclusive=True) == [12, 10]
+
+    player = db.get(Player, 1)
+    assert [season.id for season in player.pre_injury_seasons()] == [11]
+    assert [season.id for season in player.post_injury_seasons()] == [12, 10]
+    assert PlayerTimeline.for_player(99).season_ids.tolist() == []
+
+
+def test_flushes_and_bulk_writes_invalidate(db):
+    db.add_all([Player(id=1, name='Sam Kerr'), Season(id=1, year=2018, team='Red Stars', comp='NWSL')])
+    db.commit()
+    assert PlayerTimeline.for_player(1).season_ids.tolist() == []
+
+    db.add(PlayerSeason(id=10, player_id=1, season_id=1))
+    db.commit()
+    assert PlayerTimeline.for_player(1).season_ids.tolist() == [10]
+
+    db.query(PlayerSeason).filter(PlayerSeason.id == 10).delete(synchronize_session=False)
+    db.commit()
+    assert PlayerTimeline.for_player(1).season_ids.tolist() == []
+
+
+def test_writes_from_another_connection_invalidate(tmp_path):
+    path = tmp_path / 'timeline.db'
+    init_db(f'sqlite:///{path}', create_tables=True)
+    Session.add_all([
+        Player(id=1, name='Sam Kerr'),
+        Season(id=1, year=2018, team='Red Stars', comp='NWSL'),
+        PlayerSeason(id=10, player_id=1, season_id=1),
+    ])
+    Session.commit()
+    assert PlayerTimeline.for_player(1).season_ids.tolist() == [10]
+
+    # e.g. populate_data.py running in another process
+    connection = sqlite3.connect(path)
+    connection.execute("INSERT INTO player_injuries (player_id, date_of_injury) VALUES (1, '2018-04-01')")
+    connection.commit()
+    connection.close()
+    assert PlayerTimeline.for_player(1).first_injury_year == 2018
+    Session.remove()
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from resampling import replicates, resampling_inference
+
+
+@pytest.fixture
+def groups():
+    rng = np.random.default_rng(1)
+    injured_pre, control_pre = rng.normal(5, 1, (12, 2)), rng.normal(5, 1, (15, 2))
+    return injured_pre, injured_pre - 1.0, control_pre, control_pre + rng.normal(0, 0.1, (15, 2))
+
+
+@pytest.mark.parametrize('kind', ['bootstrap', 'permutation'])
+def test_replicates_are_reproducible_with_and_without_the_pool(groups, kind):
+    options = {'n_replicates': 250, 'seed': 42, 'chunk_size': 100}
+
+    here = replicates(kind, *groups, **options)
+    assert here.shape == (250, 2)
+    assert np.array_equal(here, replicates(kind, *groups, **options))
+    assert np.array_equal(here, replicates(kind, *groups, processes=2, **options))
+    assert not np.array_equal(here, replicates(kind, *groups, **{**options, 'seed': 43}))
+
+
+def test_resampling_inference(groups):
+    results = resampling_inference(['goals', 'shots'], *groups, n_replicates=500, seed=7)
+
+    assert results['estimate'].tolist() == pytest.approx([-1.0, -1.0], abs=0.1)
+    assert (results['ci_lower'] < results['estimate']).all() and (results['estimate'] < results['ci_upper']).all()
+    assert (results['permutation_p'] < 0.01).all()
+    assert results.equals(resampling_inference(['goals', 'shots'], *groups, n_replicates=500, seed=7))
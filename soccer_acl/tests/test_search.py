@@ -0,0 +1,54 @@
+import pytest
+
+from models import Player, PlayerInjury
+
+
+@pytest.fixture
+def players(db):
+    db.add_all([Player(id=1, name='Megan Rapinoe'), Player(id=2, name='Tuija Pikkujämsä'), Player(id=3, name='Sam Kerr')])
+    db.commit()
+
+
+def ids(model, terms, **options):
+    return [record_id for record_id, _ in model.search_ids(terms, **options)]
+
+
+def test_index_follows_inserts_updates_and_deletes(db, players):
+    assert ids(Player, 'meg rap') == [1]
+    assert ids(Player, 'pikkujamsa') == [2]
+
+    Player.bulk_insert([{'id': 4, 'name': 'Megan Klingenberg'}])
+    assert sorted(ids(Player, 'megan')) == [1, 4]
+
+    db.get(Player, 1).name = 'Alex Morgan'
+    db.commit()
+    assert ids(Player, 'megan') == [4]
+    assert ids(Player, 'morgan') == [1]
+
+    db.delete(db.get(Player, 4))
+    db.commit()
+    assert ids(Player, 'megan') == []
+    assert [player.name for player in Player.search('alex')] == ['Alex Morgan']
+
+
+def test_fts_syntax_in_user_input_is_literal(players):
+    # Quotes, stars, parentheses, column filters and negation are dropped rather than parsed
+    for terms in ('kerr"', '(kerr', 'kerr*', 'kerr:', '-kerr', '^sam + kerr', '"sam" {kerr}'):
+        assert ids(Player, terms) == [3], terms
+
+    # Operator keywords are searched as ordinary words, which every name must contain
+    assert ids(Player, 'sam OR megan') == []
+    assert ids(Player, 'sam NEAR kerr') == []
+    assert ids(Player, '"*:()') == []
+    assert ids(Player, 'ker', prefix=False) == []
+
+
+def test_search_columns_subset(db):
+    db.add_all([
+        Player(id=1, name='Sam Kerr'),
+        PlayerInjury(id=1, player_id=1, injury='ACL', notes='Turf at away venue'),
+        PlayerInjury(id=2, player_id=1, injury='Ankle', venue='Turf Field'),
+    ])
+    db.commit()
+    assert sorted(ids(PlayerInjury, 'turf')) == [1, 2]
+    assert ids(PlayerInjury, 'turf', columns=['venue']) == [2]
@@ -0,0 +1,58 @@
+import datetime
+
+import numpy as np
+
+from models import Player, PlayerInjury, PlayerSeason, Season
+from snapshot import Snapshot, export_snapshot
+
+
+def test_export_load_and_install(db, tmp_path):
+    db.add_all([
+        Player(id=1, name='Sam Kerr', unique_id='kerr', nation='AUS'),
+        Player(id=2, name='Rose Lavelle', unique_id='lavelle'),
+        Season(id=1, year=2019, team='Red Stars', comp='NWSL'),
+        PlayerSeason(id=1, player_id=1, season_id=1, gls=18, pos='FW'),
+        PlayerSeason(id=2, player_id=2, season_id=1, gls=4, pos='MF'),
+        PlayerInjury(player_id=2, date_of_injury=datetime.date(2020, 3, 1)),
+    ])
+    db.commit()
+
+    export_snapshot(str(tmp_path))
+    snapshot = Snapshot.load(str(tmp_path))
+    assert isinstance(snapshot['seasons.stats'], np.memmap)
+    assert snapshot.table('players')['name'].tolist() == ['Sam Kerr', 'Rose Lavelle']
+    assert np.isnat(snapshot['injuries.return_date'][0])
+    assert snapshot.is_current()
+
+    index = snapshot.install().stats_index()
+    assert PlayerSeason.stats_index().version == index.version
+    assert PlayerSeason.stats_index().vector(1)[0] == 18
+
+    db.get(PlayerSeason, 1).gls = 19
+    db.commit()
+    assert not snapshot.is_current()
+    assert PlayerSeason.stats_index().vector(1)[0] == 19
+
+
+def test_position_and_date_corrections_make_a_snapshot_stale(db, tmp_path):
+    db.add_all([
+        Player(id=1, name='Sam Kerr', unique_id='kerr'),
+        Season(id=1, year=2019, team='Red Stars', comp='NWSL'),
+        PlayerSeason(id=1, player_id=1, season_id=1, gls=18, pos='FW'),
+        PlayerInjury(id=1, player_id=1, date_of_injury=datetime.date(2020, 3, 1)),
+    ])
+    db.commit()
+    export_snapshot(str(tmp_path))
+    snapshot = Snapshot.load(str(tmp_path))
+
+    db.get(PlayerSeason, 1).pos = 'DF'
+    db.commit()
+    assert not snapshot.is_current()
+
+    db.get(PlayerSeason, 1).pos = 'FW'
+    db.commit()
+    assert snapshot.is_current()
+
+    db.get(PlayerInjury, 1).date_of_injury = datetime.date(2020, 9, 17)
+    db.commit()
+    assert not snapshot.is_current()
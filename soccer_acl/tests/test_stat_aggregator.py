@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from stat_aggregator import StatAggregator
+
+
+def test_merge_matches_a_single_pass():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(1000.0, 3.0, size=(60, 3))
+    matrix[rng.random(matrix.shape) < 0.2] = np.nan
+    columns = ['goals', 'shots', 'xg']
+
+    single = StatAggregator().update_batch(matrix, columns)
+    parts = [StatAggregator().update_batch(chunk, columns) for chunk in np.array_split(matrix, 4)]
+    merged = StatAggregator.combine(parts)
+
+    assert merged.sample_size == single.sample_size == 60
+    assert merged.count.tolist() == single.count.tolist()
+    assert merged.mean == pytest.approx(single.mean)
+    assert merged.m2 == pytest.approx(single.m2)
+    assert merged.mean == pytest.approx(np.nanmean(matrix, axis=0))
+    assert merged.std() == pytest.approx(np.nanstd(matrix, axis=0))
+
+
+def test_columns_are_added_as_they_appear():
+    aggregator = StatAggregator().update({'goals': 1.0, 'shots': None}).update({'shots': 4.0, 'xg': 0.5})
+    aggregator.update({'goals': 3.0, 'shots': 6.0})
+
+    assert aggregator.columns == ['goals', 'shots', 'xg']
+    assert aggregator.aggregated_stats == {'goals': 2.0, 'shots': 5.0, 'xg': 0.5}
+    assert aggregator.std_dev_stats['goals'] == pytest.approx(1.0)
+    assert np.isnan(aggregator.std_dev_stats['xg'])
+
+
+def test_from_stats_dict():
+    stats = {
+        'kerr': {'shooting_stats': {'goals': 10.0, 'minutes_90s': 20.0}, 'playing_time_stats': {'minutes_90s': 22.0}},
+        'lavelle': {'shooting_stats': {'goals': 4.0}, 'playing_time_stats': {}},
+        'mewis': {},
+    }
+    aggregator = StatAggregator.from_stats_dict(stats)
+
+    assert aggregator.sample_size == 2
+    assert aggregator.aggregated_stats == {'goals': 7.0, 'minutes_90s': 21.0}
@@ -0,0 +1,69 @@
+import datetime
+
+from models import Player, PlayerInjury, PlayerSeason, Season
+
+
+def add_seasons(db):
+    db.add_all([
+        Player(id=1, name='Sam Kerr', unique_id='kerr'),
+        Player(id=2, name='Rose Lavelle', unique_id='lavelle'),
+        Player(id=3, name='Lindsey Horan', unique_id='horan'),
+        Season(id=1, year=2019, team='Red Stars', comp='NWSL'),
+        Season(id=2, year=2020, team='Red Stars', comp='NWSL'),
+        PlayerSeason(id=1, player_id=1, season_id=1, gls=18, mp=21, pos='FW'),
+        PlayerSeason(id=2, player_id=1, season_id=2, gls=17, mp=21, pos='FW'),
+        PlayerSeason(id=3, player_id=2, season_id=1, gls=10, mp=20, pos='MF'),
+        PlayerSeason(id=4, player_id=3, season_id=1, gls=2, mp=20, pos='MF'),
+    ])
+    db.commit()
+
+
+def test_find_control_matches_skips_the_same_player(db):
+    add_seasons(db)
+    season = db.get(PlayerSeason, 1)
+
+    # Kerr's own 2020 season is the closest, but never a control for her
+    assert [match.id for match in season.find_control_matches(top_n=2)] == [3, 4]
+
+
+def test_stats_index_is_reused_until_the_tables_change(db):
+    add_seasons(db)
+    index = PlayerSeason.stats_index()
+    assert PlayerSeason.stats_index() is index
+
+    db.get(PlayerSeason, 4).gls = 12
+    db.commit()
+    rebuilt = PlayerSeason.stats_index()
+    assert rebuilt is not index
+    assert rebuilt.vector(4)[0] == 12
+
+    db.execute(PlayerSeason.__table__.update().where(PlayerSeason.id == 4).values(gls=3))
+    db.commit()
+    assert PlayerSeason.stats_index().vector(4)[0] == 3
+
+
+def test_edits_that_keep_column_totals_still_rebuild(db):
+    add_seasons(db)
+    index = PlayerSeason.stats_index()
+
+    # Swapping values between rows keeps every column total
+    db.get(PlayerSeason, 1).gls, db.get(PlayerSeason, 2).gls = 17, 18
+    db.commit()
+    index = PlayerSeason.stats_index()
+    assert (index.vector(1)[0], index.vector(2)[0]) == (17, 18)
+
+    # Same-length string edit
+    db.get(PlayerSeason, 1).pos = 'DF'
+    db.commit()
+    index = PlayerSeason.stats_index()
+    assert index.attributes['pos'][index.positions([1])[0]] == 'DF'
+
+
+def test_data_version_sees_date_edits(db):
+    db.add_all([Player(id=1, name='Sam Kerr'), PlayerInjury(id=1, player_id=1, date_of_injury=datetime.date(2020, 1, 1))])
+    db.commit()
+    version = PlayerInjury.current_data_version()
+
+    db.get(PlayerInjury, 1).date_of_injury = datetime.date(2020, 7, 19)
+    db.commit()
+    assert PlayerInjury.current_data_version() != version
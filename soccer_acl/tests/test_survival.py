@@ -0,0 +1,76 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from models import Player, PlayerInjury
+from survival import kaplan_meier, median_survival, return_to_play
+
+
+def test_kaplan_meier_with_greenwood_standard_errors():
+    curve = kaplan_meier([1, 2, 2, 3, 4], [True, True, False, True, False])
+
+    assert curve['time'].tolist() == [1, 2, 3, 4]
+    assert curve['at_risk'].tolist() == [5, 4, 2, 1]
+    assert curve['events'].tolist() == [1, 1, 1, 0]
+    assert curve['censored'].tolist() == [0, 1, 0, 1]
+    assert curve['survival'].tolist() == pytest.approx([0.8, 0.6, 0.3, 0.3])
+
+    # Greenwood: S(t)^2 * sum d / (n (n - d))
+    greenwood = np.cumsum([1 / (5 * 4), 1 / (4 * 3), 1 / (2 * 1), 0])
+    assert curve['std_err'].tolist() == pytest.approx((curve['survival'] * np.sqrt(greenwood)).tolist())
+    assert (curve['ci_lower'] <= curve['survival']).all() and (curve['survival'] <= curve['ci_upper']).all()
+    assert median_survival(curve)['all'] == 3
+
+
+def test_kaplan_meier_strata_match_separate_fits():
+    durations = [5, 3, 8, 3, 1, 9, 4, 4]
+    observed = [True, True, False, True, True, True, False, True]
+    strata = ['a', 'b', 'a', 'a', 'b', 'b', 'a', 'b']
+
+    together = kaplan_meier(durations, observed, strata)
+    for label in ('a', 'b'):
+        mask = np.array(strata) == label
+        alone = kaplan_meier(np.array(durations)[mask], np.array(observed)[mask])
+        part = together[together['stratum'] == label]
+        assert part['survival'].tolist() == pytest.approx(alone['survival'].tolist())
+        assert part['at_risk'].tolist() == alone['at_risk'].tolist()
+
+    # Stratum b ends with everyone returned: survival 0 and no standard error
+    assert together[together['stratum'] == 'b']['survival'].iloc[-1] == 0
+    assert np.isnan(together[together['stratum'] == 'b']['std_err'].iloc[-1])
+
+
+def test_return_to_play_censors_open_injuries(db):
+    db.add_all([Player(id=1, name='Sam Kerr'), Player(id=2, name='Rose Lavelle')])
+    db.add_all([
+        PlayerInjury(player_id=1, date_of_injury=datetime.date(2020, 1, 1), return_date=datetime.date(2020, 1, 11), mechanism=0),
+        PlayerInjury(player_id=2, date_of_injury=datetime.date(2020, 1, 1), mechanism=1),
+    ])
+    db.commit()
+
+    curves = return_to_play(by='mechanism', as_of=datetime.date(2020, 1, 31))
+    assert curves[['stratum', 'time', 'events', 'censored']].values.tolist() == [
+        ['mechanism=0', 10.0, 1, 0],
+        ['mechanism=1', 30.0, 0, 1],
+    ]
+    with pytest.raises(ValueError, match='Unknown injury column'):
+        return_to_play(by='surface')
+
+
+def test_date_corrections_invalidate_the_cached_durations(db):
+    db.add_all([
+        Player(id=1, name='Sam Kerr'),
+        PlayerInjury(id=1, player_id=1, date_of_injury=datetime.date(2020, 1, 1), return_date=datetime.date(2020, 1, 11)),
+    ])
+    db.commit()
+    as_of = datetime.date(2021, 1, 1)
+    assert return_to_play(as_of=as_of)['time'].tolist() == [10.0]
+
+    db.get(PlayerInjury, 1).date_of_injury = datetime.date(2020, 1, 2)
+    db.commit()
+    assert return_to_play(as_of=as_of)['time'].tolist() == [9.0]
+
+    db.get(PlayerInjury, 1).return_date = datetime.date(2020, 7, 20)
+    db.commit()
+    assert return_to_play(as_of=as_of)['time'].tolist() == [200.0]